@@ -1,31 +1,547 @@
 # api.py - FastAPI para predição de risco cardíaco (12 inputs, PT/EN, fallback de colunas via X_train.csv)
 # Execução: uvicorn api:app --host 0.0.0.0 --port 8000
 
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel, Field, field_validator, model_validator
-from typing import Optional, List, Literal, Dict, Any
-import pandas as pd
+from fastapi import Depends, FastAPI, HTTPException, Query, Request
+from fastapi.exception_handlers import request_validation_exception_handler
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from pydantic import BaseModel, ConfigDict, Field, ValidationError, field_validator, model_validator
+from typing import Annotated, Optional, List, Literal, Dict, Any
+from types import MappingProxyType
 import numpy as np
-import joblib
+from collections import OrderedDict, deque, namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor
+import anyio.to_thread
+import asyncio
+import bisect
+import codecs
+import contextvars
+import csv
+import datetime
+import glob
+import hashlib
+import hmac
+import json
+import logging
+import math
+import operator
 import os
+import queue
+import re
+import struct
+import sys
+import threading
+import time
 
 # ------------------------------------------------------------------------------
 # Config
 # ------------------------------------------------------------------------------
+# Artefato de serviço compacto (.npz gerado pelo main.py, sem pickle). Definido
+# explicitamente, sempre vence; no default, só vale se não for mais antigo que o par
+# .pkl e MODEL_PATH/SCALER_PATH não tiverem sido apontados para outro lugar
+SERVING_ARTIFACT_PATH = os.getenv("SERVING_ARTIFACT_PATH", "modelo_insuficiencia_cardiaca.npz")
 MODEL_PATH = os.getenv("MODEL_PATH", "modelo_insuficiencia_cardiaca.pkl")
 SCALER_PATH = os.getenv("SCALER_PATH", "scaler_dados.pkl")
+SERVING_ARTIFACT_EXPLICIT = "SERVING_ARTIFACT_PATH" in os.environ
+PICKLE_PATHS_EXPLICIT = "MODEL_PATH" in os.environ or "SCALER_PATH" in os.environ
+ARTIFACT_MTIME_SLACK_NS = 2_000_000_000
 # Fallback de colunas do treino (usa cabeçalho do CSV para recuperar ordem/nomes)
 FEATURE_COLUMNS_PATH = os.getenv("FEATURE_COLUMNS_PATH", "X_train.csv")
+# Linhas por bloco no endpoint de streaming (/predict-stream)
+STREAM_CHUNK_ROWS = int(os.getenv("STREAM_CHUNK_ROWS", "1000"))
+# Cache de predições do /predict (0 desativa; TTL em segundos)
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "4096"))
+PREDICTION_CACHE_TTL = float(os.getenv("PREDICTION_CACHE_TTL", "300"))
+# Micro-batching opcional do /predict: agrupa chamadas concorrentes em uma janela curta
+MICROBATCH_ENABLED = os.getenv("MICROBATCH_ENABLED", "0").lower() in {"1", "true", "yes", "sim"}
+MICROBATCH_WINDOW_MS = float(os.getenv("MICROBATCH_WINDOW_MS", "2"))
+MICROBATCH_MAX_ROWS = int(os.getenv("MICROBATCH_MAX_ROWS", "64"))
+# /predict-batch: colapsa pacientes repetidos antes de codificar/pontuar (~1 µs/linha)
+BATCH_DEDUP_ENABLED = os.getenv("BATCH_DEDUP_ENABLED", "1").lower() in {"1", "true", "yes", "sim"}
+# Pontos máximos de uma varredura what-if (/predict-sweep, produto das grades)
+SWEEP_MAX_POINTS = int(os.getenv("SWEEP_MAX_POINTS", "10000"))
+# Lotes acima deste tamanho são pontuados em blocos (libera o executor entre blocos)
+BATCH_CHUNK_ROWS = int(os.getenv("BATCH_CHUNK_ROWS", "10000"))
+# Controle de admissão: faixas "interactive" (/predict, /debug-vector) e "bulk" (lotes, streaming)
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "0").lower() in {"1", "true", "yes", "sim"}
+ADMISSION_INTERACTIVE_CONCURRENCY = int(os.getenv("ADMISSION_INTERACTIVE_CONCURRENCY", "64"))
+ADMISSION_INTERACTIVE_QUEUE = int(os.getenv("ADMISSION_INTERACTIVE_QUEUE", "256"))
+ADMISSION_INTERACTIVE_TIMEOUT_MS = float(os.getenv("ADMISSION_INTERACTIVE_TIMEOUT_MS", "500"))
+ADMISSION_BULK_CONCURRENCY = int(os.getenv("ADMISSION_BULK_CONCURRENCY", "2"))
+ADMISSION_BULK_QUEUE = int(os.getenv("ADMISSION_BULK_QUEUE", "8"))
+ADMISSION_BULK_TIMEOUT_MS = float(os.getenv("ADMISSION_BULK_TIMEOUT_MS", "2000"))
+ADMISSION_MAX_BATCH_ROWS = int(os.getenv("ADMISSION_MAX_BATCH_ROWS", "0"))    # 0 = sem limite
+ADMISSION_MAX_BODY_MB = float(os.getenv("ADMISSION_MAX_BODY_MB", "0"))        # 0 = sem limite
+# Limites por rota, dentro da faixa: "/predict-ensemble=1,/predict-stream=1"
+ADMISSION_ROUTE_CONCURRENCY = os.getenv("ADMISSION_ROUTE_CONCURRENCY", "")
+# Rotas async: lotes até este tamanho são pontuados direto no event loop;
+# acima disso vão para um executor dedicado de SCORING_WORKERS threads
+ASYNC_INLINE_MAX_ROWS = int(os.getenv("ASYNC_INLINE_MAX_ROWS", "256"))
+SCORING_WORKERS = int(os.getenv("SCORING_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Limite do threadpool padrão do anyio/Starlette (rotas síncronas); vazio = padrão (40)
+THREADPOOL_LIMIT = os.getenv("THREADPOOL_LIMIT")
+# Registro de modelos: intervalo (s) de verificação de MODEL_PATH/SCALER_PATH (0 desativa),
+# versões mantidas em memória e validação obrigatória antes de cada troca
+MODEL_WATCH_INTERVAL = float(os.getenv("MODEL_WATCH_INTERVAL", "5"))
+MODEL_REGISTRY_KEEP = int(os.getenv("MODEL_REGISTRY_KEEP", "3"))
+VALIDATION_X_PATH = os.getenv("VALIDATION_X_PATH", "X_test_raw.csv")  # teste SEM escala (main.py)
+VALIDATION_Y_PATH = os.getenv("VALIDATION_Y_PATH", "y_test.csv")
+MODEL_MIN_ACCURACY = float(os.getenv("MODEL_MIN_ACCURACY", "0.75"))
+# Token das rotas que trocam o modelo ativo (/models/reload, /models/{versão}/activate);
+# vazio = rotas desligadas (404). O watcher de arquivos continua funcionando.
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+# Pesos compartilhados entre workers (definido pelo serve.py; vazio = cada worker carrega os seus)
+SHARED_WEIGHTS_DIR = os.getenv("SHARED_WEIGHTS_DIR", "")
+SHARED_WEIGHTS_POLL = float(os.getenv("SHARED_WEIGHTS_POLL", "0.1"))  # s entre checagens do ponteiro
+# Modelo sombra: pontua o tráfego real em segundo plano, sem afetar a resposta
+SHADOW_ARTIFACT_PATH = os.getenv("SHADOW_ARTIFACT_PATH", "")
+SHADOW_MODEL_PATH = os.getenv("SHADOW_MODEL_PATH", "")
+SHADOW_SCALER_PATH = os.getenv("SHADOW_SCALER_PATH", "")
+SHADOW_QUEUE_SIZE = int(os.getenv("SHADOW_QUEUE_SIZE", "1024"))     # lotes pendentes
+SHADOW_BATCH_ROWS = int(os.getenv("SHADOW_BATCH_ROWS", "512"))      # linhas por escore sombra
+# Ensemble: diretório com membros (.npz de serviço ou .pkl sklearn sobre SCALER_PATH); vazio desliga
+ENSEMBLE_DIR = os.getenv("ENSEMBLE_DIR", "ensemble")
+ENSEMBLE_INCLUDE_ACTIVE = os.getenv("ENSEMBLE_INCLUDE_ACTIVE", "1").lower() in {"1", "true", "yes", "sim"}
+# Monitor de drift das entradas (estatísticas em memória constante, agregadas por lote)
+DRIFT_ENABLED = os.getenv("DRIFT_ENABLED", "1").lower() in {"1", "true", "yes", "sim"}
+DRIFT_FLUSH_ROWS = int(os.getenv("DRIFT_FLUSH_ROWS", "256"))  # linhas acumuladas antes de agregar
+DRIFT_REFERENCE_PATH = os.getenv("DRIFT_REFERENCE_PATH", "X_train.csv")  # treino escalonado (histogramas)
+# Auditoria das predições: "" (desligada), "sqlite" ou "jsonl"; gravação em lotes fora da requisição
+AUDIT_BACKEND = os.getenv("AUDIT_BACKEND", "").lower()
+AUDIT_PATH = os.getenv("AUDIT_PATH", "audit.db" if AUDIT_BACKEND == "sqlite" else "audit")
+AUDIT_FLUSH_INTERVAL = float(os.getenv("AUDIT_FLUSH_INTERVAL", "1.0"))  # s entre gravações
+AUDIT_BUFFER_ROWS = int(os.getenv("AUDIT_BUFFER_ROWS", "100000"))       # linhas pendentes (cheio = descarta as mais antigas)
+AUDIT_DURABILITY = os.getenv("AUDIT_DURABILITY", "normal").lower()      # off | normal | full
+AUDIT_ROTATE_MB = float(os.getenv("AUDIT_ROTATE_MB", "64"))             # tamanho de cada arquivo JSONL
+# Profiler por amostragem (/admin/profile): sem token o endpoint não existe (404)
+PROFILER_TOKEN = os.getenv("PROFILER_TOKEN", "")
+PROFILER_INTERVAL_MS = float(os.getenv("PROFILER_INTERVAL_MS", "5"))
+PROFILER_MAX_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", "60"))
 
 app = FastAPI(title="Heart Failure Predictor API", version="1.2.0")
+logger = logging.getLogger("heart_api")
+
+
+# ------------------------------------------------------------------------------
+# Métricas (formato texto do Prometheus)
+# ------------------------------------------------------------------------------
+# Latência por estágio (s) e tamanho de lote (linhas)
+LATENCY_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+)
+BATCH_SIZE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+# Rotas com rótulo próprio nas métricas (demais viram "other" para limitar a cardinalidade)
+METRIC_ROUTES = frozenset({
+    "/predict", "/predict-strict", "/predict-batch", "/predict-batch-strict",
+    "/predict-stream", "/predict-sweep", "/predict-ensemble", "/predict-vector", "/predict-columnar",
+    "/debug-vector",
+})
+# Rota da requisição corrente, usada pelos validadores e pelo kernel para rotular os estágios
+_CURRENT_ROUTE: contextvars.ContextVar[str] = contextvars.ContextVar("heart_api_route", default="other")
+
+
+class Histogram:
+    """Histograma de limites fixos (contagens cumulativas calculadas no snapshot)."""
+
+    def __init__(self, bounds):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)  # último = +Inf
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        i = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.count += 1
+            self.sum += value
+
+    def observe_many(self, values) -> None:
+        """Versão vetorizada de observe para um array numpy."""
+        idx = np.bincount(np.searchsorted(self.bounds, values, side="left"), minlength=len(self.counts))
+        with self._lock:
+            for i, c in enumerate(idx.tolist()):
+                self.counts[i] += c
+            self.count += len(values)
+            self.sum += float(np.sum(values))
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        cumulative, acc = {}, 0
+        for b, c in zip(self.bounds + (float("inf"),), counts):
+            acc += c
+            cumulative["+Inf" if b == float("inf") else f"{b:g}"] = acc
+        return {"count": count, "sum": total, "buckets": cumulative}
+
+
+def _labels(**labels) -> str:
+    return ",".join(f'{k}="{str(v)}"' for k, v in labels.items())
+
+
+class Metrics:
+    """
+    Contadores e histogramas em memória, atualizados no caminho da requisição
+    com custo de uma busca binária + um lock curto; o texto do Prometheus só é
+    montado quando /metrics é consultado.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stages: Dict[tuple, Histogram] = {}      # (rota, estágio) -> latência
+        self.batch_sizes: Dict[str, Histogram] = {}   # rota -> linhas por requisição
+        self.requests: Dict[tuple, int] = {}          # (rota, status) -> total
+        self.rows: Dict[str, int] = {}                # rota -> linhas pontuadas
+        self.errors: Dict[tuple, int] = {}            # (rota, causa) -> total
+        self.deduplicated: Dict[str, int] = {}        # rota -> linhas repetidas não pontuadas
+        self.shed: Dict[tuple, int] = {}              # (faixa, motivo) -> requisições recusadas
+
+    def _histogram(self, table, key, bounds) -> Histogram:
+        h = table.get(key)
+        if h is None:
+            with self._lock:
+                h = table.setdefault(key, Histogram(bounds))
+        return h
+
+    def _inc(self, table, key, n: int = 1) -> None:
+        with self._lock:
+            table[key] = table.get(key, 0) + n
+
+    def observe_stage(self, stage: str, seconds: float, route: Optional[str] = None) -> None:
+        self._histogram(self.stages, (route or _CURRENT_ROUTE.get(), stage), LATENCY_BUCKETS).observe(seconds)
+
+    def observe_rows(self, n: int, route: Optional[str] = None) -> None:
+        route = route or _CURRENT_ROUTE.get()
+        self._inc(self.rows, route, n)
+        self._histogram(self.batch_sizes, route, BATCH_SIZE_BUCKETS).observe(n)
+
+    def count_request(self, route: str, status: int) -> None:
+        self._inc(self.requests, (route, status))
+
+    def count_deduplicated(self, n: int, route: Optional[str] = None) -> None:
+        self._inc(self.deduplicated, route or _CURRENT_ROUTE.get(), n)
+
+    def count_shed(self, lane: str, reason: str) -> None:
+        self._inc(self.shed, (lane, reason))
+
+    def count_error(self, cause: str, route: Optional[str] = None) -> None:
+        self._inc(self.errors, (route or _CURRENT_ROUTE.get(), cause))
+
+    @staticmethod
+    def _render_histogram(lines, name, labels, h: Histogram) -> None:
+        snap = h.snapshot()
+        for le, c in snap["buckets"].items():
+            lines.append(f'{name}_bucket{{{labels},le="{le}"}} {c}')
+        lines.append(f"{name}_sum{{{labels}}} {snap['sum']}")
+        lines.append(f"{name}_count{{{labels}}} {snap['count']}")
+
+    def render(self, extra_lines=()) -> str:
+        with self._lock:
+            stages, batch_sizes = dict(self.stages), dict(self.batch_sizes)
+            requests, rows, errors = dict(self.requests), dict(self.rows), dict(self.errors)
+            deduplicated, shed = dict(self.deduplicated), dict(self.shed)
+        lines = [
+            "# HELP heart_api_stage_seconds Latência por estágio do processamento.",
+            "# TYPE heart_api_stage_seconds histogram",
+        ]
+        for (route, stage), h in sorted(stages.items()):
+            self._render_histogram(lines, "heart_api_stage_seconds", _labels(route=route, stage=stage), h)
+        lines += ["# HELP heart_api_batch_size Linhas por requisição.", "# TYPE heart_api_batch_size histogram"]
+        for route, h in sorted(batch_sizes.items()):
+            self._render_histogram(lines, "heart_api_batch_size", _labels(route=route), h)
+        lines += ["# HELP heart_api_requests_total Requisições por rota e status.", "# TYPE heart_api_requests_total counter"]
+        lines += [f"heart_api_requests_total{{{_labels(route=r, status=st)}}} {n}" for (r, st), n in sorted(requests.items())]
+        lines += ["# HELP heart_api_rows_total Linhas pontuadas por rota.", "# TYPE heart_api_rows_total counter"]
+        lines += [f"heart_api_rows_total{{{_labels(route=r)}}} {n}" for r, n in sorted(rows.items())]
+        lines += ["# HELP heart_api_deduplicated_rows_total Linhas repetidas colapsadas em lotes.",
+                  "# TYPE heart_api_deduplicated_rows_total counter"]
+        lines += [f"heart_api_deduplicated_rows_total{{{_labels(route=r)}}} {n}" for r, n in sorted(deduplicated.items())]
+        lines += ["# HELP heart_api_shed_total Requisições recusadas pelo controle de admissão.",
+                  "# TYPE heart_api_shed_total counter"]
+        lines += [f"heart_api_shed_total{{{_labels(lane=l, reason=r)}}} {n}" for (l, r), n in sorted(shed.items())]
+        lines += ["# HELP heart_api_errors_total Erros por rota e causa.", "# TYPE heart_api_errors_total counter"]
+        lines += [f"heart_api_errors_total{{{_labels(route=r, cause=c)}}} {n}" for (r, c), n in sorted(errors.items())]
+        lines += list(extra_lines)
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Metrics()
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI puro (sem BaseHTTPMiddleware): marca a rota corrente para os
+    estágios internos e registra latência total, status e erros por causa.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        route = scope["path"] if scope["path"] in METRIC_ROUTES else "other"
+        token = _CURRENT_ROUTE.set(route)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            METRICS.observe_stage("total", time.perf_counter() - started, route)
+            METRICS.count_request(route, status)
+            if status >= 500 and not scope.get("heart_api.shed"):
+                METRICS.count_error("internal", route)
+            if PROFILER is not None and route != "other":
+                PROFILER.request_done()
+            _CURRENT_ROUTE.reset(token)
+
+
+# ------------------------------------------------------------------------------
+# Controle de admissão (faixas de prioridade, limites e descarte rápido)
+# ------------------------------------------------------------------------------
+ROUTE_LANES = {
+    "/predict": "interactive", "/predict-strict": "interactive", "/debug-vector": "interactive",
+    "/predict-sweep": "interactive",
+    "/predict-batch": "bulk", "/predict-batch-strict": "bulk", "/predict-stream": "bulk",
+    "/predict-ensemble": "bulk", "/predict-vector": "bulk", "/predict-columnar": "bulk",
+}
+
+
+class Lane:
+    """
+    Faixa com `limit` requisições em execução e até `queue_max` esperando no máximo
+    `timeout_s` por uma vaga. Fora disso, a requisição é recusada na hora.
+    """
+
+    def __init__(self, name: str, limit: int, queue_max: int, timeout_s: float, reject_status: int):
+        self.name = name
+        self.limit = max(1, limit)
+        self.queue_max = max(0, queue_max)
+        self.timeout_s = max(0.0, timeout_s)
+        self.reject_status = reject_status
+        self._sem = asyncio.Semaphore(self.limit)
+        self.in_flight = 0
+        self.waiting = 0
+        self.service_s = 0.05  # média móvel do tempo de serviço (estimativa do Retry-After)
+
+    def retry_after(self) -> int:
+        backlog = (self.in_flight + self.waiting) / self.limit
+        return int(min(60, max(1, math.ceil(self.service_s * max(1.0, backlog)))))
+
+    async def acquire(self) -> Optional[str]:
+        """Retorna None quando admitida; senão o motivo da recusa."""
+        if self.in_flight < self.limit and self.waiting == 0:
+            await self._sem.acquire()  # vaga livre: não bloqueia
+        else:
+            if self.waiting >= self.queue_max:
+                return "queue_full"
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._sem.acquire(), self.timeout_s)
+            except asyncio.TimeoutError:
+                return "queue_timeout"
+            finally:
+                self.waiting -= 1
+        self.in_flight += 1
+        return None
+
+    def release(self, elapsed_s: Optional[float]) -> None:
+        """Libera a vaga; `elapsed_s` None = não atendida (não entra na média de serviço)."""
+        self.in_flight -= 1
+        if elapsed_s is not None:
+            self.service_s = 0.9 * self.service_s + 0.1 * elapsed_s
+        self._sem.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"limit": self.limit, "queue_max": self.queue_max, "timeout_ms": self.timeout_s * 1000.0,
+                "in_flight": self.in_flight, "waiting": self.waiting, "service_ms": self.service_s * 1000.0}
+
+
+LANES = {
+    # Interativo sobrecarregado = servidor sem capacidade (503); lote acima da cota = 429
+    "interactive": Lane("interactive", ADMISSION_INTERACTIVE_CONCURRENCY, ADMISSION_INTERACTIVE_QUEUE,
+                        ADMISSION_INTERACTIVE_TIMEOUT_MS / 1000.0, 503),
+    "bulk": Lane("bulk", ADMISSION_BULK_CONCURRENCY, ADMISSION_BULK_QUEUE, ADMISSION_BULK_TIMEOUT_MS / 1000.0, 429),
+}
+
+
+def _route_limits(spec: str) -> Dict[str, Lane]:
+    """
+    Limites por rota ("rota=limite,..."): cada rota limitada ganha uma faixa própria,
+    com a fila, a espera e o status de recusa da faixa a que pertence. A requisição
+    precisa de vaga nas duas (rota e faixa).
+    """
+    limits = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        route, _, limit = part.partition("=")
+        route = route.strip()
+        if route not in ROUTE_LANES or not limit.strip().isdigit():
+            raise RuntimeError(f"ADMISSION_ROUTE_CONCURRENCY inválido: {part!r} (use rota=limite).")
+        lane = LANES[ROUTE_LANES[route]]
+        limits[route] = Lane(route, int(limit), lane.queue_max, lane.timeout_s, lane.reject_status)
+    return limits
+
+
+ROUTE_LIMITS = _route_limits(ADMISSION_ROUTE_CONCURRENCY)
+
+
+async def _reject(send, status: int, detail: str, retry_after: Optional[int] = None) -> None:
+    body = json.dumps({"detail": detail}, ensure_ascii=False).encode("utf-8")
+    headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    if retry_after is not None:
+        headers.append((b"retry-after", str(retry_after).encode()))
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+class AdmissionMiddleware:
+    """
+    Aplica as faixas antes de ler o corpo: um lote gigante não chega a ser
+    validado se não houver vaga, e corpos acima de ADMISSION_MAX_BODY_MB são
+    recusados pelo Content-Length (413). Recusas respondem na hora com Retry-After.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.max_body = int(ADMISSION_MAX_BODY_MB * 1024 * 1024)
+
+    async def __call__(self, scope, receive, send):
+        lane = LANES.get(ROUTE_LANES.get(scope.get("path"))) if scope["type"] == "http" else None
+        if lane is None or scope.get("method") != "POST":
+            return await self.app(scope, receive, send)
+        if self.max_body:
+            length = dict(scope.get("headers") or ()).get(b"content-length")
+            if length is not None and length.isdigit() and int(length) > self.max_body:
+                METRICS.count_shed(lane.name, "body_too_large")
+                scope["heart_api.shed"] = True
+                return await _reject(send, 413, f"Corpo acima de {ADMISSION_MAX_BODY_MB:g} MB; divida o lote.")
+        # Limite da rota (se houver) antes do da faixa: uma rota saturada não ocupa vagas da faixa
+        held = []
+        for gate in (ROUTE_LIMITS.get(scope.get("path")), lane):
+            if gate is None:
+                continue
+            reason = await gate.acquire()
+            if reason is not None:
+                for acquired in held:
+                    acquired.release(None)
+                METRICS.count_shed(gate.name, reason)
+                scope["heart_api.shed"] = True
+                kind = "Rota" if gate is not lane else "Faixa"
+                return await _reject(send, gate.reject_status, f"{kind} '{gate.name}' sem capacidade ({reason}).",
+                                     gate.retry_after())
+            held.append(gate)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            elapsed = time.perf_counter() - started
+            for gate in held:
+                gate.release(elapsed)
+
+
+# Ordem: o último adicionado é o mais externo; métricas envolvem a admissão para ver as recusas
+if ADMISSION_ENABLED:
+    app.add_middleware(AdmissionMiddleware)
+app.add_middleware(MetricsMiddleware)
+
+
+async def validation_clock(request: Request) -> None:
+    """
+    Dependência das rotas com corpo Patient/StrictPatient. O FastAPI resolve as
+    dependências antes de validar parâmetros e corpo, então o estágio "validate"
+    vai daqui até o início do handler: uma observação por requisição (ou lote).
+    """
+    request.state.validation_started = time.perf_counter()
+
+
+def observe_validation(request: Request) -> None:
+    started = getattr(request.state, "validation_started", None)
+    if started is not None:
+        request.state.validation_started = None
+        METRICS.observe_stage("validate", time.perf_counter() - started)
+
+
+@app.exception_handler(RequestValidationError)
+async def _count_validation_errors(request: Request, exc: RequestValidationError):
+    observe_validation(request)
+    # Lista de itens acima do teto (max_length dos modelos de lote): mesma recusa 413 do check_batch_rows
+    if ADMISSION_MAX_BATCH_ROWS and any(
+        err["type"] == "too_long" and err["loc"][:2] in (("body", "items"), ("body", "columns"))
+        for err in exc.errors()
+    ):
+        METRICS.count_shed("bulk", "too_many_rows")
+        return JSONResponse(status_code=413, content={
+            "detail": f"Lote acima de {ADMISSION_MAX_BATCH_ROWS} linhas (ADMISSION_MAX_BATCH_ROWS); divida o lote."
+        })
+    METRICS.count_error("validation")
+    return await request_validation_exception_handler(request, exc)
 
 
 # ------------------------------------------------------------------------------
 # Schemas
 # ------------------------------------------------------------------------------
+# Tabelas de sinônimos (PT/EN), compiladas uma única vez e compartilhadas pelos
+# validadores: chaves já em minúsculas/sem espaços nas bordas
+SEX_MAP = MappingProxyType({
+    **dict.fromkeys(('m', 'masc', 'masculino', 'male', 'homem'), 'M'),
+    **dict.fromkeys(('f', 'fem', 'feminino', 'female', 'mulher'), 'F'),
+})
+CHEST_PAIN_MAP = MappingProxyType({
+    'ta':'TA','típica':'TA','tipica':'TA','typical angina':'TA',
+    'ata':'ATA','atípica':'ATA','atipica':'ATA','atypical angina':'ATA',
+    'nap':'NAP','não anginosa':'NAP','nao anginosa':'NAP','non-anginal pain':'NAP',
+    'asy':'ASY','assintomática':'ASY','assintomatica':'ASY','asymptomatic':'ASY'
+})
+RESTING_ECG_MAP = MappingProxyType({
+    'normal':'Normal',
+    'st':'ST','st-t wave abnormality':'ST','anormalidade st-t':'ST',
+    'lvh':'LVH','left ventricular hypertrophy':'LVH','hipertrofia ventricular esquerda':'LVH'
+})
+ST_SLOPE_MAP = MappingProxyType({
+    'up':'Up','ascendente':'Up','asc':'Up',
+    'flat':'Flat','plano':'Flat',
+    'down':'Down','descendente':'Down','desc':'Down'
+})
+THAL_MAP = MappingProxyType({
+    'normal':'Normal',
+    'fixed defect':'Fixed defect','defeito fixo':'Fixed defect',
+    'reversible defect':'Reversible defect','defeito reversível':'Reversible defect','defeito reversivel':'Reversible defect'
+})
+EXERCISE_ANGINA_MAP = MappingProxyType({
+    **dict.fromkeys(('y', 'yes', 'sim'), 'Y'),
+    **dict.fromkeys(('n', 'no', 'nao', 'não'), 'N'),
+})
+# FastingBS / Exang (sim/não, 1/0, true/false)
+BINARY_MAP = MappingProxyType({
+    **dict.fromkeys(('1', 'true', 'sim', 'yes'), 1),
+    **dict.fromkeys(('0', 'false', 'nao', 'não', 'no'), 0),
+})
+
+# Faixas dos validadores numéricos do Patient (reusadas pela validação colunar)
+NUMERIC_RANGES = MappingProxyType({
+    "Age": (0, 120), "RestingBP": (70, 250), "Cholesterol": (100, 600), "MaxHR": (40, 250), "Oldpeak": (0.0, 10.0),
+})
+
+
+def _to_float(v) -> float:
+    """float já validado passa direto; strings aceitam vírgula decimal."""
+    if type(v) is float:
+        return v
+    return float(str(v).replace(',', '.'))
+
+
 class Patient(BaseModel):
     # 12 entradas (com normalização PT/EN via validadores)
-    Age: int = Field(..., ge=0, le=120)
+    Age: int = Field(..., ge=NUMERIC_RANGES["Age"][0], le=NUMERIC_RANGES["Age"][1])
     Sex: str  # M/F ou masculino/feminino
     ChestPainType: str  # TA/ATA/NAP/ASY + sinônimos
     RestingBP: float  # 70–250
@@ -45,31 +561,26 @@ class Patient(BaseModel):
     @field_validator('Sex')
     @classmethod
     def norm_sex(cls, v: str) -> str:
-        s = str(v).strip().lower()
-        if s in {'m','masc','masculino','male','homem'}: return 'M'
-        if s in {'f','fem','feminino','female','mulher'}: return 'F'
-        raise ValueError("Sexo inválido. Use M/F ou masculino/feminino.")
+        out = SEX_MAP.get(str(v).strip().lower())
+        if out is None:
+            raise ValueError("Sexo inválido. Use M/F ou masculino/feminino.")
+        return out
 
     @field_validator('ChestPainType')
     @classmethod
     def norm_cpt(cls, v: str) -> str:
         s = str(v).strip().lower()
-        mapping = {
-            'ta':'TA','típica':'TA','tipica':'TA','typical angina':'TA',
-            'ata':'ATA','atípica':'ATA','atipica':'ATA','atypical angina':'ATA',
-            'nap':'NAP','não anginosa':'NAP','nao anginosa':'NAP','non-anginal pain':'NAP',
-            'asy':'ASY','assintomática':'ASY','assintomatica':'ASY','asymptomatic':'ASY'
-        }
-        return mapping.get(s, s.upper())
+        return CHEST_PAIN_MAP.get(s) or s.upper()
 
     @field_validator('RestingBP')
     @classmethod
     def check_bp(cls, v) -> float:
         try:
-            bp = float(str(v).replace(',', '.'))
+            bp = _to_float(v)
         except Exception:
             raise ValueError("RestingBP inválido.")
-        if not (70 <= bp <= 250):
+        lo, hi = NUMERIC_RANGES["RestingBP"]
+        if not (lo <= bp <= hi):
             raise ValueError("RestingBP fora do intervalo recomendado (70–250 mmHg).")
         return bp
 
@@ -77,10 +588,11 @@ class Patient(BaseModel):
     @classmethod
     def check_chol(cls, v) -> float:
         try:
-            c = float(str(v).replace(',', '.'))
+            c = _to_float(v)
         except Exception:
             raise ValueError("Cholesterol inválido.")
-        if not (100 <= c <= 600):
+        lo, hi = NUMERIC_RANGES["Cholesterol"]
+        if not (lo <= c <= hi):
             raise ValueError("Cholesterol fora do intervalo recomendado (100–600 mg/dL).")
         return c
 
@@ -88,8 +600,9 @@ class Patient(BaseModel):
     @classmethod
     def norm_fbs(cls, v) -> int:
         s = str(v).strip().lower()
-        if s in {'1','true','sim','yes'}: return 1
-        if s in {'0','false','nao','não','no'}: return 0
+        out = BINARY_MAP.get(s)
+        if out is not None:
+            return out
         try:
             n = int(float(s))
             return 1 if n >= 1 else 0
@@ -100,21 +613,17 @@ class Patient(BaseModel):
     @classmethod
     def norm_ecg(cls, v: str) -> str:
         s = str(v).strip().lower()
-        mapping = {
-            'normal':'Normal',
-            'st':'ST','st-t wave abnormality':'ST','anormalidade st-t':'ST',
-            'lvh':'LVH','left ventricular hypertrophy':'LVH','hipertrofia ventricular esquerda':'LVH'
-        }
-        return mapping.get(s, s.capitalize())
+        return RESTING_ECG_MAP.get(s) or s.capitalize()
 
     @field_validator('MaxHR')
     @classmethod
     def check_hr(cls, v) -> int:
         try:
-            hr = int(float(str(v).replace(',', '.')))
+            hr = v if type(v) is int else int(float(str(v).replace(',', '.')))
         except Exception:
             raise ValueError("MaxHR inválido.")
-        if not (40 <= hr <= 250):
+        lo, hi = NUMERIC_RANGES["MaxHR"]
+        if not (lo <= hr <= hi):
             raise ValueError("MaxHR fora do intervalo recomendado (40–250 bpm).")
         return hr
 
@@ -122,10 +631,11 @@ class Patient(BaseModel):
     @classmethod
     def norm_oldpeak(cls, v) -> float:
         try:
-            op = float(str(v).replace(',', '.'))
+            op = _to_float(v)
         except Exception:
             raise ValueError("Oldpeak inválido (use número, aceita vírgula).")
-        if not (0.0 <= op <= 10.0):
+        lo, hi = NUMERIC_RANGES["Oldpeak"]
+        if not (lo <= op <= hi):
             raise ValueError("Oldpeak fora do intervalo (0.0–10.0).")
         return op
 
@@ -133,29 +643,23 @@ class Patient(BaseModel):
     @classmethod
     def norm_slope(cls, v: str) -> str:
         s = str(v).strip().lower()
-        mapping = {
-            'up':'Up','ascendente':'Up','asc':'Up',
-            'flat':'Flat','plano':'Flat',
-            'down':'Down','descendente':'Down','desc':'Down'
-        }
-        return mapping.get(s, s.capitalize())
+        return ST_SLOPE_MAP.get(s) or s.capitalize()
 
     @field_validator('ExerciseAngina', mode='before')
     @classmethod
     def norm_exang1(cls, v):
         if v is None: return None
         s = str(v).strip().lower()
-        if s in {'y','yes','sim'}: return 'Y'
-        if s in {'n','no','nao','não'}: return 'N'
-        return s.upper()
+        return EXERCISE_ANGINA_MAP.get(s) or s.upper()
 
     @field_validator('Exang', mode='before')
     @classmethod
     def norm_exang2(cls, v):
         if v is None: return None
         s = str(v).strip().lower()
-        if s in {'1','true','yes','sim'}: return 1
-        if s in {'0','false','no','nao','não'}: return 0
+        out = BINARY_MAP.get(s)
+        if out is not None:
+            return out
         try:
             return 1 if int(float(s))>=1 else 0
         except Exception:
@@ -166,12 +670,7 @@ class Patient(BaseModel):
     def norm_thal(cls, v):
         if v is None: return None
         s = str(v).strip().lower()
-        mapping = {
-            'normal':'Normal',
-            'fixed defect':'Fixed defect','defeito fixo':'Fixed defect',
-            'reversible defect':'Reversible defect','defeito reversível':'Reversible defect','defeito reversivel':'Reversible defect'
-        }
-        return mapping.get(s, s.title())
+        return THAL_MAP.get(s) or s.title()
 
     @model_validator(mode='after')
     def combine_exang(self):
@@ -184,37 +683,211 @@ class Patient(BaseModel):
         return self
 
 
+class StrictPatient(BaseModel):
+    """
+    Esquema estrito para chamadores internos que já enviam os códigos canônicos
+    (ex.: o frontend): sem sinônimos nem normalização, só tipos e faixas.
+    """
+    model_config = ConfigDict(extra='forbid')
+
+    Age: int = Field(..., ge=0, le=120)
+    Sex: Literal['M', 'F']
+    ChestPainType: Literal['TA', 'ATA', 'NAP', 'ASY']
+    RestingBP: float = Field(..., ge=70, le=250)
+    Cholesterol: float = Field(..., ge=100, le=600)
+    FastingBS: Literal[0, 1]
+    RestingECG: Literal['Normal', 'ST', 'LVH']
+    MaxHR: int = Field(..., ge=40, le=250)
+    ExerciseAngina: Literal['Y', 'N']
+    Oldpeak: float = Field(..., ge=0.0, le=10.0)
+    ST_Slope: Literal['Up', 'Flat', 'Down']
+    Thal: Optional[Literal['Normal', 'Fixed defect', 'Reversible defect']] = None
+
+
 class PredictResponse(BaseModel):
     prediction: Literal[0,1]
     label: Literal["BAIXO_RISCO","ALTO_RISCO"]
     probability_positive: float
     model_info: Dict[str, Any]
     warnings: List[str] = []
+    explanation: Optional[Dict[str, Any]] = None
 
 
 # ------------------------------------------------------------------------------
 # Carregar artefatos
 # ------------------------------------------------------------------------------
-def _load_artifacts():
-    if not (os.path.exists(MODEL_PATH) and os.path.exists(SCALER_PATH)):
+def _load_artifacts(model_path: str = MODEL_PATH, scaler_path: str = SCALER_PATH):
+    if not (os.path.exists(model_path) and os.path.exists(scaler_path)):
         raise FileNotFoundError("Modelo e/ou scaler não encontrados. Treine e salve os arquivos .pkl.")
-    model = joblib.load(MODEL_PATH)
-    scaler = joblib.load(SCALER_PATH)
+    # Import tardio: joblib/sklearn só são carregados no fallback via pickle
+    import joblib
+
+    model = joblib.load(model_path)
+    scaler = joblib.load(scaler_path)
+    return model, scaler
+
+
+class ArtifactScaler:
+    """StandardScaler reconstruído do artefato .npz (mesmas operações de transform)."""
+    with_mean = True
+    with_std = True
+
+    def __init__(self, mean: np.ndarray, scale: np.ndarray):
+        self.mean_ = mean
+        self.scale_ = scale
+        self.n_features_in_ = mean.shape[0]
+
+    def transform(self, X: np.ndarray) -> np.ndarray:
+        X = np.array(X, dtype=np.float64)
+        X -= self.mean_
+        X /= self.scale_
+        return X
+
+    def inverse_transform(self, X: np.ndarray) -> np.ndarray:
+        return np.asarray(X, dtype=np.float64) * self.scale_ + self.mean_
+
+
+class ArtifactLinearModel:
+    """Modelo linear binário reconstruído do artefato .npz (coeficientes no espaço escalonado)."""
+
+    def __init__(self, columns, coef: np.ndarray, intercept: np.ndarray, classes: np.ndarray, model_class: str):
+        self.feature_names_in_ = np.asarray(columns, dtype=object)
+        self.n_features_in_ = len(columns)
+        self.coef_ = coef.reshape(1, -1)
+        self.intercept_ = intercept.reshape(1)
+        self.classes_ = classes
+        self.model_class = model_class
+
+    def decision_function(self, X: np.ndarray) -> np.ndarray:
+        return X @ self.coef_[0] + self.intercept_[0]
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return self.classes_[(self.decision_function(X) > 0).astype(np.intp)]
+
+
+def load_serving_artifact(path: str):
+    """
+    Lê o artefato de serviço (.npz sem pickle): ordem das colunas, média/escala
+    do scaler e coeficientes do modelo. Retorna (modelo, scaler) compatíveis com
+    o restante do pipeline.
+    """
+    with np.load(path, allow_pickle=False) as data:
+        if int(data["format_version"]) != 1:
+            raise RuntimeError(f"Formato de artefato não suportado em {path}.")
+        columns = [str(c) for c in data["columns"]]
+        scaler = ArtifactScaler(data["scaler_mean"].astype(np.float64), data["scaler_scale"].astype(np.float64))
+        model = ArtifactLinearModel(
+            columns,
+            data["coef"].astype(np.float64),
+            data["intercept"].astype(np.float64),
+            data["classes"],
+            str(data["model_class"]),
+        )
     return model, scaler
 
-MODEL, SCALER = _load_artifacts()
+# ------------------------------------------------------------------------------
+# Segmento de pesos compartilhado (arquivo mapeado em memória, ex.: /dev/shm)
+# ------------------------------------------------------------------------------
+# Layout: MAGIC | uint64 tamanho do cabeçalho | cabeçalho JSON | arrays float64
+# alinhados em 64 bytes. Os workers mapeiam o arquivo só para leitura e montam o
+# scaler/modelo sobre views do mapa, sem cópia; páginas do tmpfs são compartilhadas.
+SHARED_MAGIC = b"HRTSHM01"
+SHARED_POINTER = "current"
+
+
+def write_shared_segment(directory: str, bundle) -> str:
+    """Publica o par modelo/scaler de `bundle` em um novo segmento e aponta `current` para ele."""
+    model, scaler = bundle.model, bundle.scaler
+    if not _is_foldable(model, scaler):
+        raise RuntimeError(f"Modelo {bundle.model_class} não cabe no segmento compartilhado (só lineares binários).")
+    arrays = {
+        "scaler_mean": np.asarray(scaler.mean_, dtype=np.float64),
+        "scaler_scale": np.asarray(scaler.scale_, dtype=np.float64),
+        "coef": np.asarray(model.coef_, dtype=np.float64).ravel(),
+        "intercept": np.asarray(model.intercept_, dtype=np.float64).ravel(),
+        "classes": np.asarray(model.classes_, dtype=np.float64),
+    }
+    layout, offset = {}, 0
+    for name, arr in arrays.items():
+        layout[name] = [offset, arr.shape[0]]
+        offset += -(-arr.nbytes // 64) * 64
+    header = json.dumps({
+        "version": bundle.version,
+        "model_class": bundle.model_class,
+        "columns": bundle.encoder.columns,
+        "validation": bundle.validation,
+        "arrays": layout,
+    }).encode("utf-8")
+    data_start = -(-(len(SHARED_MAGIC) + 8 + len(header)) // 64) * 64
+
+    name = f"weights-{bundle.version}-{time.time_ns()}.bin"
+    tmp = os.path.join(directory, "." + name)
+    with open(tmp, "wb") as f:
+        f.write(SHARED_MAGIC + len(header).to_bytes(8, "little") + header)
+        for key, arr in arrays.items():
+            f.seek(data_start + layout[key][0])
+            f.write(arr.tobytes())
+        f.truncate(data_start + offset)
+    os.replace(tmp, os.path.join(directory, name))
+    # Troca atômica do ponteiro: todos os workers passam a ver o novo segmento
+    pointer_tmp = os.path.join(directory, "." + SHARED_POINTER)
+    with open(pointer_tmp, "w") as f:
+        f.write(name)
+    os.replace(pointer_tmp, os.path.join(directory, SHARED_POINTER))
+    return os.path.join(directory, name)
+
+
+def shared_segment_path(directory: str) -> Optional[str]:
+    """Segmento apontado por `current`, ou None se ainda não publicado."""
+    try:
+        with open(os.path.join(directory, SHARED_POINTER)) as f:
+            return os.path.join(directory, f.read().strip())
+    except OSError:
+        return None
+
+
+def load_shared_segment(path: str):
+    """Mapeia um segmento só para leitura: retorna (modelo, scaler, cabeçalho) sem copiar os pesos."""
+    mm = np.memmap(path, dtype=np.uint8, mode="r")
+    if bytes(mm[:len(SHARED_MAGIC)]) != SHARED_MAGIC:
+        raise RuntimeError(f"Segmento de pesos inválido: {path}.")
+    n = int.from_bytes(bytes(mm[len(SHARED_MAGIC):len(SHARED_MAGIC) + 8]), "little")
+    start = len(SHARED_MAGIC) + 8
+    header = json.loads(bytes(mm[start:start + n]).decode("utf-8"))
+    data_start = -(-(start + n) // 64) * 64
+
+    def view(name):
+        offset, count = header["arrays"][name]
+        return np.frombuffer(mm, dtype=np.float64, count=count, offset=data_start + offset)
+
+    scaler = ArtifactScaler(view("scaler_mean"), view("scaler_scale"))
+    model = ArtifactLinearModel(
+        header["columns"], view("coef"), view("intercept"), view("classes").astype(np.int64), header["model_class"]
+    )
+    return model, scaler, header
+
+
+def _artifact_fingerprint(*paths) -> str:
+    """Hash curto do conteúdo dos artefatos; muda sempre que modelo ou scaler mudam."""
+    h = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+    return h.hexdigest()[:12]
+
 
 
 # ------------------------------------------------------------------------------
 # Colunas esperadas (robusto com fallback para CSV)
 # ------------------------------------------------------------------------------
-def get_expected_columns() -> List[str]:
+def get_expected_columns(model) -> List[str]:
     """
     Retorna a lista/ordem de colunas esperadas pelo modelo.
     1) Se o modelo tiver feature_names_in_ com nomes de colunas, usa.
     2) Caso contrário, carrega do cabeçalho do X_train.csv (FEATURE_COLUMNS_PATH).
     """
-    names = getattr(MODEL, "feature_names_in_", None)
+    names = getattr(model, "feature_names_in_", None)
     if names is not None:
         are_strings = all(isinstance(c, (str, bytes)) for c in names)
         if are_strings:
@@ -226,143 +899,2621 @@ def get_expected_columns() -> List[str]:
             "Não foi possível determinar as colunas esperadas. "
             "Defina FEATURE_COLUMNS_PATH para um CSV com o cabeçalho correto (ex.: X_train.csv)."
         )
-    header = pd.read_csv(FEATURE_COLUMNS_PATH, nrows=0)
-    cols = list(header.columns)
+    with open(FEATURE_COLUMNS_PATH, newline="", encoding="utf-8-sig") as f:
+        cols = [c.strip() for c in next(csv.reader(f), [])]
     if len(cols) == 0:
         raise RuntimeError(f"O arquivo {FEATURE_COLUMNS_PATH} não possui cabeçalho de colunas.")
     return cols
 
 
 # ------------------------------------------------------------------------------
-# Pré-processamento de uma linha e escala
+# Encoder de features (pré-compilado a partir das colunas esperadas)
 # ------------------------------------------------------------------------------
-def encode_align_scale(df_row: pd.DataFrame):
+# Campos do Patient que viraram dummies no treino (pd.get_dummies(drop_first=True))
+CATEGORICAL_FIELDS = ("Sex", "ChestPainType", "RestingECG", "ExerciseAngina", "ST_Slope", "Thal")
+
+
+class FeatureEncoder:
     """
-    Normaliza entradas, faz get_dummies(drop_first=True), alinha para as colunas do treino
-    e aplica o scaler.
+    Codificador montado uma única vez a partir da lista de colunas esperadas
+    (ex.: Sex_M, ChestPainType_ATA, ..., ST_Slope_Up). Escreve os campos já
+    validados do Patient direto em uma linha NumPy, reproduzindo o one-hot com
+    drop_first=True + alinhamento do treino sem passar pelo pandas.
     """
-    # Se houver Exang mas não ExerciseAngina, inferir
-    if 'Exang' in df_row.columns and 'ExerciseAngina' not in df_row.columns:
-        df_row = df_row.copy()
-        df_row['ExerciseAngina'] = df_row['Exang'].apply(lambda x: 'Y' if int(x)==1 else 'N')
 
-    expected_cols = get_expected_columns()
+    def __init__(self, columns: List[str]):
+        self.columns = list(columns)
+        self.n_features = len(self.columns)
+        self.numeric: List[tuple] = []               # (campo, índice)
+        self.onehot: Dict[str, Dict[str, int]] = {}  # campo -> {categoria: índice}
+        for idx, col in enumerate(self.columns):
+            for field in CATEGORICAL_FIELDS:
+                if col.startswith(field + "_"):
+                    self.onehot.setdefault(field, {})[col[len(field) + 1:]] = idx
+                    break
+            else:
+                # Colunas que não correspondem a nenhum campo ficam em 0,
+                # como no alinhamento anterior (colunas faltantes = 0)
+                if col in Patient.model_fields:
+                    self.numeric.append((col, idx))
+        # Agrupamento coluna -> campo de entrada (explicações somam o one-hot por campo)
+        self.fields: List[str] = []
+        for idx, col in enumerate(self.columns):
+            field = next((f for f in self.onehot if col.startswith(f + "_")), col)
+            if field not in self.fields:
+                self.fields.append(field)
+        self.field_matrix = np.zeros((self.n_features, len(self.fields)))
+        self._field_columns: Dict[str, List[int]] = {}
+        for idx, col in enumerate(self.columns):
+            field = next((f for f in self.onehot if col.startswith(f + "_")), col)
+            self.field_matrix[idx, self.fields.index(field)] = 1.0
+            self._field_columns.setdefault(field, []).append(idx)
 
-    # One-Hot consistente com o treino (drop_first=True)
-    dummies = pd.get_dummies(df_row, drop_first=True)
+    def field_columns(self, field: str) -> List[int]:
+        """Índices das colunas escritas por um campo de entrada (vazio se o modelo não o usa)."""
+        return self._field_columns.get(field, [])
 
-    # Adiciona colunas faltantes
-    for col in expected_cols:
-        if col not in dummies.columns:
-            dummies[col] = 0
+    def encode_into(self, patient, row: np.ndarray) -> np.ndarray:
+        """Preenche `row` (já zerada, tamanho n_features) com o paciente codificado."""
+        for field, idx in self.numeric:
+            row[idx] = getattr(patient, field)
+        for field, levels in self.onehot.items():
+            idx = levels.get(getattr(patient, field))
+            if idx is not None:
+                row[idx] = 1.0
+        return row
 
-    # Remove extras e reordena
-    dummies = dummies[expected_cols]
+    def encode(self, patients) -> np.ndarray:
+        """Codifica uma sequência de pacientes em uma matriz (n, n_features) float64."""
+        X = np.zeros((len(patients), self.n_features), dtype=np.float64)
+        for i, patient in enumerate(patients):
+            self.encode_into(patient, X[i])
+        return X
 
-    # Checagem opcional de consistência com o scaler
-    n_expected = len(expected_cols)
-    n_scaler = getattr(SCALER, "n_features_in_", None)
-    if n_scaler is not None and n_scaler != n_expected:
-        raise RuntimeError(
-            f"Incompatibilidade de features: scaler espera {n_scaler} colunas, "
-            f"mas o alinhamento gerou {n_expected}. Verifique FEATURE_COLUMNS_PATH."
-        )
 
-    # Escala
-    scaled = SCALER.transform(dummies.values)
-    return scaled, expected_cols
+def schema_hash(columns: List[str]) -> bytes:
+    """Impressão digital (8 bytes) da lista/ordem de colunas, usada pelo /predict-vector."""
+    return hashlib.sha256("\n".join(columns).encode("utf-8")).digest()[:8]
 
 
 # ------------------------------------------------------------------------------
-# Rotas
+# Pré-processamento (codificação) e escala
 # ------------------------------------------------------------------------------
-@app.get("/health")
-def health():
-    return {
-        "status": "ok",
-        "model_loaded": os.path.exists(MODEL_PATH),
-        "scaler_loaded": os.path.exists(SCALER_PATH),
-        "feature_columns_source": (
-            "model.feature_names_in_" if getattr(MODEL, "feature_names_in_", None) is not None else FEATURE_COLUMNS_PATH
-        )
-    }
+def encode_align_scale(patients, bundle=None):
+    """
+    Codifica os pacientes já validados com o encoder da versão ativa (one-hot
+    drop_first=True alinhado às colunas do treino) e aplica o scaler.
+    """
+    bundle = bundle or REGISTRY.active
+    scaled = bundle.scaler.transform(bundle.encoder.encode(patients))
+    return scaled, bundle.encoder.columns
 
 
-@app.post("/predict", response_model=PredictResponse)
-def predict(patient: Patient):
-    warnings = []
-    try:
-        # Aviso se Thal vier mas o modelo não usar
-        thal_used = False
-        if patient.Thal is not None and getattr(MODEL, "feature_names_in_", None) is not None:
-            thal_used = any(c.startswith("Thal_") or c == "Thal" for c in MODEL.feature_names_in_)
-        if patient.Thal is not None and not thal_used:
-            warnings.append("Campo 'Thal' recebido, mas não foi utilizado pelo modelo treinado.")
-
-        df = pd.DataFrame([patient.dict()])
-        x_scaled, cols = encode_align_scale(df)
-
-        if hasattr(MODEL, "predict_proba"):
-            proba = float(MODEL.predict_proba(x_scaled)[:, 1][0])
+# ------------------------------------------------------------------------------
+# Kernel de escore (scaler + modelo linear dobrados em um único passo)
+# ------------------------------------------------------------------------------
+# Tolerância da checagem de paridade (probabilidades) entre o kernel fundido e o sklearn
+KERNEL_PARITY_ATOL = float(os.getenv("KERNEL_PARITY_ATOL", "1e-9"))
+
+
+class SklearnKernel:
+    """Caminho de referência: SCALER.transform + predict_proba/decision_function + predict."""
+    fused = False
+
+    def __init__(self, model, scaler):
+        self.model = model
+        self.scaler = scaler
+
+    def score(self, X: np.ndarray):
+        """Retorna (predições, probabilidades da classe positiva) para a matriz não escalada X."""
+        x_scaled = self.scaler.transform(X)
+        if hasattr(self.model, "predict_proba"):
+            probas = self.model.predict_proba(x_scaled)[:, 1]
         else:
-            raw = MODEL.decision_function(x_scaled)[0]
-            proba = float(1 / (1 + np.exp(-raw)))
+            raw = self.model.decision_function(x_scaled)
+            probas = 1 / (1 + np.exp(-raw))
+        preds = self.model.predict(x_scaled)
+        return preds.astype(int), probas.astype(float)
 
-        pred = int(MODEL.predict(x_scaled)[0])
-        label = "ALTO_RISCO" if pred == 1 else "BAIXO_RISCO"
+    def contributions(self, X: np.ndarray) -> Optional[np.ndarray]:
+        """coef × valor escalado por coluna; None se o modelo não for linear binário."""
+        coef = getattr(self.model, "coef_", None)
+        if coef is None or np.ndim(coef) != 2 or coef.shape[0] != 1:
+            return None
+        return self.scaler.transform(X) * np.asarray(coef, dtype=np.float64)[0]
 
-        return {
-            "prediction": pred,
-            "label": label,
-            "probability_positive": proba,
-            "model_info": {
-                "features_expected": cols,
-                "model_class": type(MODEL).__name__,
-            },
-            "warnings": warnings,
-        }
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
 
+class LinearKernel:
+    """
+    StandardScaler seguido de LogisticRegression binária é um mapa afim:
+    logit = ((X - mean) / scale) @ coef + intercept = X @ w + b.
+    Os pesos w/b são dobrados uma vez no carregamento; cada lote vira um
+    produto matriz-vetor + sigmoide, e o rótulo sai do limiar de probabilidade.
+    """
+    fused = True
+
+    def __init__(self, model, scaler):
+        coef = np.asarray(model.coef_, dtype=np.float64).ravel()
+        n = coef.shape[0]
+        mean = scaler.mean_ if scaler.with_mean else None
+        scale = scaler.scale_ if scaler.with_std else None
+        mean = np.zeros(n) if mean is None else np.asarray(mean, dtype=np.float64)
+        scale = np.ones(n) if scale is None else np.asarray(scale, dtype=np.float64)
+        self.weights = coef / scale
+        self.offsets = self.weights * mean  # coef * (x - mean) / scale = x * w - offset
+        self.bias = float(np.asarray(model.intercept_, dtype=np.float64).ravel()[0] - self.weights @ mean)
+        self.classes = np.asarray(model.classes_)
 
-class BatchRequest(BaseModel):
-    items: List[Patient]
+    def score(self, X: np.ndarray):
+        """Retorna (predições, probabilidades da classe positiva) para a matriz não escalada X."""
+        logit = X @ self.weights + self.bias
+        probas = 1 / (1 + np.exp(-logit))
+        # proba > 0.5  <=>  logit > 0 (evita empates por arredondamento da sigmoide)
+        preds = self.classes[(logit > 0).astype(np.intp)]
+        return preds.astype(int), probas
 
+    def contributions(self, X: np.ndarray) -> np.ndarray:
+        """Contribuição exata de cada coluna para o logit (coef × valor escalado)."""
+        return X * self.weights - self.offsets
 
-@app.post("/predict-batch")
-def predict_batch(payload: BatchRequest):
-    try:
-        df = pd.DataFrame([p.dict() for p in payload.items])
-        x_scaled, _ = encode_align_scale(df)
-        preds = MODEL.predict(x_scaled).astype(int).tolist()
-        if hasattr(MODEL, "predict_proba"):
-            probas = MODEL.predict_proba(x_scaled)[:, 1].astype(float).tolist()
-        else:
-            raw = MODEL.decision_function(x_scaled)
-            probas = (1 / (1 + np.exp(-raw))).astype(float).tolist()
-        labels = ["ALTO_RISCO" if p == 1 else "BAIXO_RISCO" for p in preds]
-        return {"predictions": preds, "labels": labels, "probabilities_positive": probas}
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+
+def _is_foldable(model, scaler) -> bool:
+    """Modelo linear binário com coeficientes + scaler no formato do StandardScaler."""
+    coef = getattr(model, "coef_", None)
+    classes = getattr(model, "classes_", None)
+    if coef is None or getattr(model, "intercept_", None) is None or classes is None:
+        return False
+    if np.ndim(coef) != 2 or coef.shape[0] != 1 or len(classes) != 2:
+        return False
+    return all(hasattr(scaler, a) for a in ("mean_", "scale_", "with_mean", "with_std"))
+
+
+def build_kernel(model, scaler, n_features: int):
+    """
+    Monta o kernel fundido quando o par modelo/scaler é linear e confere a
+    paridade com o caminho sklearn em um lote sintético; caso contrário (ou se
+    a paridade falhar), usa o caminho sklearn.
+    """
+    reference = SklearnKernel(model, scaler)
+    if not _is_foldable(model, scaler):
+        return reference
+
+    fused = LinearKernel(model, scaler)
+    # Lote de prova em torno da distribuição do treino (determinístico)
+    rng = np.random.default_rng(0)
+    mean = np.asarray(scaler.mean_, dtype=np.float64)
+    scale = np.asarray(scaler.scale_, dtype=np.float64)
+    probe = mean + 2.0 * scale * rng.standard_normal((256, n_features))
+    ref_preds, ref_probas = reference.score(probe)
+    preds, probas = fused.score(probe)
+    if not (np.array_equal(preds, ref_preds) and np.allclose(probas, ref_probas, rtol=0, atol=KERNEL_PARITY_ATOL)):
+        logger.warning(
+            "Kernel fundido divergiu do sklearn (max |dp| = %.3g); usando caminho sklearn.",
+            float(np.max(np.abs(probas - ref_probas))),
+        )
+        return reference
+    return fused
 
 
 # ------------------------------------------------------------------------------
-# Endpoint de debug para inspecionar o vetor alinhado/escalado
+# Registro de modelos (versões, validação, hot reload com troca atômica)
 # ------------------------------------------------------------------------------
-@app.post("/debug-vector")
-def debug_vector(patient: Patient):
-    try:
-        df = pd.DataFrame([patient.dict()])
-        x_scaled, cols = encode_align_scale(df)
-        # Retorna apenas uma amostra (primeiros 12 valores) para não poluir
-        sample = x_scaled[0][:min(12, x_scaled.shape[1])].tolist()
-        return {
-            "n_features": len(cols),
-            "cols_sample": cols[:min(12, len(cols))],
-            "vector_sample": sample,
-            "feature_columns_source": (
-                "model.feature_names_in_" if getattr(MODEL, "feature_names_in_", None) is not None else FEATURE_COLUMNS_PATH
+class ModelBundle:
+    """
+    Par modelo/scaler carregado + tudo que deriva dele (encoder, kernel).
+    Imutável depois de montado: uma requisição que capturou o bundle usa
+    sempre o mesmo par do início ao fim.
+    """
+
+    def __init__(self, version: str, model, scaler, artifact_format: str, paths):
+        self.version = version
+        self.model = model
+        self.scaler = scaler
+        self.artifact_format = artifact_format
+        self.paths = list(paths)
+        self.model_class = getattr(model, "model_class", type(model).__name__)
+        self.encoder = FeatureEncoder(get_expected_columns(model))
+
+        # Checagem de consistência com o scaler
+        n_expected = self.encoder.n_features
+        n_scaler = getattr(scaler, "n_features_in_", None)
+        if n_scaler is not None and n_scaler != n_expected:
+            raise RuntimeError(
+                f"Incompatibilidade de features: scaler espera {n_scaler} colunas, "
+                f"mas o alinhamento gerou {n_expected}. Verifique FEATURE_COLUMNS_PATH."
             )
+
+        self.kernel = build_kernel(model, scaler, n_expected)
+        self.thal_used = "Thal" in self.encoder.onehot or "Thal" in self.encoder.columns
+        self.schema_hash = schema_hash(self.encoder.columns)
+        self.feature_columns_source = (
+            "model.feature_names_in_" if getattr(model, "feature_names_in_", None) is not None else FEATURE_COLUMNS_PATH
+        )
+        self.loaded_at = time.time()
+        self.load_seconds = 0.0
+        self.validation: Dict[str, Any] = {}
+        self.drift_reference = None  # (bins de referência, origem), preenchido pelo registro
+
+    def _observe(self, X, preds, probas, weights) -> None:
+        """Entrega a matriz codificada aos observadores (modelo sombra, drift)."""
+        if SHADOW is not None:
+            SHADOW.submit(self, X, preds, probas)
+        if DRIFT is not None:
+            DRIFT.observe(self, X, weights)
+
+    def score(self, patients, weights=None):
+        """
+        Codifica e pontua pacientes validados: retorna (predições, probabilidades).
+        `weights` (opcional) = quantas linhas originais cada paciente representa
+        (lotes deduplicados), usado só pelas estatísticas de drift.
+        """
+        return self.score_encoded(self.encode(patients), weights)
+
+    def encode(self, patients) -> np.ndarray:
+        """Matriz codificada (layout de encoder.columns, sem escala), com a métrica do estágio."""
+        started = time.perf_counter()
+        X = self.encoder.encode(patients)
+        METRICS.observe_stage("encode", time.perf_counter() - started)
+        return X
+
+    def score_encoded(self, X: np.ndarray, weights=None):
+        """Pontua uma matriz já codificada (layout de encoder.columns, sem escala)."""
+        started = time.perf_counter()
+        out = self.kernel.score(X)
+        METRICS.observe_stage("score", time.perf_counter() - started)
+        self._observe(X, out[0], out[1], weights)
+        return out
+
+    def explain(self, patients, top_k: int, weights=None):
+        """
+        Pontua e explica: retorna (predições, probabilidades, explicações). Cada
+        explicação traz os `top_k` campos de entrada com maior |contribuição| para
+        o logit (coef × valor escalado, one-hot somado por campo). Para modelos não
+        lineares, explicações = None.
+        """
+        return self.explain_encoded(self.encode(patients), patients, top_k, weights)
+
+    def explain_encoded(self, X: np.ndarray, patients, top_k: int, weights=None):
+        """explain() sobre a matriz já codificada dos mesmos `patients`."""
+        preds, probas = self.kernel.score(X)
+        self._observe(X, preds, probas, weights)
+        started = time.perf_counter()
+        contrib = self.kernel.contributions(X)
+        if contrib is None:
+            return preds, probas, None
+        by_field = contrib @ self.encoder.field_matrix
+        k = max(1, min(top_k, by_field.shape[1]))
+        order = np.argsort(-np.abs(by_field), axis=1, kind="stable")[:, :k]
+        fields = self.encoder.fields
+        explanations = []
+        for patient, row, idx in zip(patients, by_field.tolist(), order.tolist()):
+            explanations.append({
+                "method": "linear_contribution",
+                "top_features": [
+                    {"feature": fields[j], "value": getattr(patient, fields[j], None), "contribution": row[j]}
+                    for j in idx
+                ],
+            })
+        METRICS.observe_stage("explain", time.perf_counter() - started)
+        return preds, probas, explanations
+
+    def sweep(self, patient, axes):
+        """
+        Varredura what-if: `axes` = [(colunas, tabela)], onde tabela[i] são os valores
+        dessas colunas no i-ésimo ponto da grade. Monta a matriz perturbada inteira a
+        partir da linha codificada do paciente (uma atribuição vetorizada por eixo) e
+        pontua tudo em uma chamada ao kernel. Retorna (probabilidades com o formato da
+        grade, probabilidade do paciente original). Pontos sintéticos não alimentam
+        sombra/drift/auditoria.
+        """
+        started = time.perf_counter()
+        base = self.encoder.encode([patient])
+        shape = tuple(len(table) for _, table in axes)
+        X = np.repeat(base, math.prod(shape), axis=0)
+        for (cols, table), idx in zip(axes, np.indices(shape).reshape(len(shape), -1)):
+            X[:, cols] = table[idx]
+        encoded = time.perf_counter()
+        _, probas = self.kernel.score(np.vstack([base, X]))
+        METRICS.observe_stage("encode", encoded - started)
+        METRICS.observe_stage("score", time.perf_counter() - encoded)
+        return probas[1:].reshape(shape), float(probas[0])
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "model_class": self.model_class,
+            "artifact_format": self.artifact_format,
+            "paths": self.paths,
+            "scoring_kernel": "fused" if self.kernel.fused else "sklearn",
+            "loaded_at": self.loaded_at,
+            "load_seconds": self.load_seconds,
+            "validation": self.validation,
         }
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _read_csv_matrix(path: str):
+    """Lê um CSV numérico com cabeçalho: retorna (colunas, matriz float64)."""
+    with open(path, newline="") as f:
+        header = next(csv.reader(f))
+    return [h.strip() for h in header], np.loadtxt(path, delimiter=",", skiprows=1, ndmin=2)
+
+
+# Bins fixos do monitor de drift, em unidades de desvio-padrão do treino (z = (x - média) / escala)
+DRIFT_Z_EDGES = np.array([-2.0, -1.5, -1.0, -0.5, 0.0, 0.5, 1.0, 1.5, 2.0])
+
+
+def _normal_bin_probs(edges) -> np.ndarray:
+    """Proporções esperadas por bin de z para uma normal padrão (fallback sem X_train.csv)."""
+    cdf = [0.0] + [0.5 * (1 + math.erf(e / math.sqrt(2))) for e in edges] + [1.0]
+    return np.diff(cdf)
+
+
+def drift_reference_bins(bundle: ModelBundle, path: str):
+    """
+    Proporções de treino por bin de z de cada coluna numérica: do X_train.csv
+    escalonado ou, sem ele, da normal padrão. Retorna (matriz n_numéricas × n_bins,
+    origem). Calculado na carga da versão, fora do caminho das requisições.
+    """
+    numeric_idx = np.array([idx for _, idx in bundle.encoder.numeric], dtype=np.intp)
+    n_bins = len(DRIFT_Z_EDGES) + 1
+    if path and os.path.exists(path):
+        try:
+            cols, Z = _read_csv_matrix(path)
+            if cols == bundle.encoder.columns:
+                idx = np.searchsorted(DRIFT_Z_EDGES, Z[:, numeric_idx], side="right")
+                counts = np.stack([np.bincount(idx[:, k], minlength=n_bins) for k in range(idx.shape[1])])
+                return counts / len(Z), os.path.basename(path)
+        except (OSError, ValueError):
+            logger.warning("Referência de drift %s ilegível; usando a normal padrão.", path)
+    return np.tile(_normal_bin_probs(DRIFT_Z_EDGES), (len(numeric_idx), 1)), "normal"
+
+
+def validate_bundle(bundle: ModelBundle) -> Dict[str, Any]:
+    """
+    Valida uma versão antes de ativá-la: colunas do X_test_raw.csv devem coincidir
+    com as do encoder e a acurácia no conjunto de teste (X_test_raw.csv sem escala
+    + y_test.csv) deve ser >= MODEL_MIN_ACCURACY. O conjunto passa pelo kernel de
+    produção, que aplica o scaler da própria versão: um par retreinado com outro
+    scaler é avaliado no espaço em que foi treinado. Sem os arquivos de teste, só as
+    checagens estruturais (encoder/kernel) valem.
+    """
+    if not (os.path.exists(VALIDATION_X_PATH) and os.path.exists(VALIDATION_Y_PATH)):
+        return {"status": "skipped", "reason": f"{VALIDATION_X_PATH}/{VALIDATION_Y_PATH} não encontrados"}
+
+    cols, X = _read_csv_matrix(VALIDATION_X_PATH)
+    _, y = _read_csv_matrix(VALIDATION_Y_PATH)
+    if cols != bundle.encoder.columns:
+        raise RuntimeError(f"Colunas de {VALIDATION_X_PATH} não coincidem com as colunas esperadas pelo modelo.")
+    preds, probas = bundle.kernel.score(X)
+    accuracy = float(np.mean(preds == y.ravel().astype(int)))
+    if not np.all(np.isfinite(probas)):
+        raise RuntimeError("Validação falhou: probabilidades não finitas no conjunto de teste.")
+    if accuracy < MODEL_MIN_ACCURACY:
+        raise RuntimeError(
+            f"Validação falhou: acurácia {accuracy:.4f} abaixo do mínimo {MODEL_MIN_ACCURACY:.4f}."
+        )
+    return {"status": "passed", "accuracy": accuracy, "n_samples": int(len(y))}
+
+
+class ModelRegistry:
+    """
+    Mantém até `keep` versões carregadas e aponta `active` para a versão em uso.
+    Novas versões são carregadas e validadas fora do caminho das requisições;
+    a troca é uma única atribuição de referência, então uma requisição nunca vê
+    um par modelo/scaler pela metade.
+    """
+
+    def __init__(self, artifact_path: str, model_path: str, scaler_path: str, keep: int,
+                 artifact_explicit: bool = False, pickle_explicit: bool = False):
+        self.artifact_path = artifact_path
+        self.artifact_explicit = artifact_explicit
+        self.pickle_explicit = pickle_explicit
+        self.model_path = model_path
+        self.scaler_path = scaler_path
+        self.keep = max(1, keep)
+        self.active: Optional[ModelBundle] = None
+        self._versions: "OrderedDict[str, ModelBundle]" = OrderedDict()
+        self._lock = threading.Lock()  # serializa cargas e trocas
+        self._seen_stat = None
+        self._pending_stat = None
+        self.last_error: Optional[str] = None
+        self._watcher: Optional[threading.Thread] = None
+
+    def _sources(self):
+        """
+        Segmento compartilhado (workers do serve.py); senão o .npz, se escolhido
+        (ver _use_artifact); senão o par .pkl.
+        """
+        if SHARED_WEIGHTS_DIR:
+            segment = shared_segment_path(SHARED_WEIGHTS_DIR)
+            if segment is not None:
+                return "shared", (segment,)
+        if self._use_artifact():
+            return "npz", (self.artifact_path,)
+        return "pickle", (self.model_path, self.scaler_path)
+
+    def _use_artifact(self) -> bool:
+        """
+        O .npz vale quando SERVING_ARTIFACT_PATH foi definido explicitamente ou, no
+        default, quando MODEL_PATH/SCALER_PATH não foram alterados e o .npz é pelo
+        menos tão novo quanto o par .pkl. Assim um .pkl retreinado (sem novo .npz)
+        volta a ser servido em vez de ser ignorado.
+        """
+        if not self.artifact_path:
+            return False
+        try:
+            artifact_mtime = os.stat(self.artifact_path).st_mtime_ns
+        except OSError:
+            return False
+        if self.artifact_explicit:
+            return True
+        if self.pickle_explicit:
+            return False
+        try:
+            pickle_mtime = max(os.stat(p).st_mtime_ns for p in (self.model_path, self.scaler_path))
+        except OSError:
+            return True  # par .pkl incompleto: o .npz é a única fonte utilizável
+        # Folga para arquivos gravados juntos (checkout, main.py): só um .pkl
+        # claramente mais novo tira o .npz de cena
+        return artifact_mtime + ARTIFACT_MTIME_SLACK_NS >= pickle_mtime
+
+    def _stat(self):
+        _, paths = self._sources()
+        try:
+            stats = [os.stat(p) for p in paths]
+        except OSError:
+            return None
+        return tuple((p, st.st_mtime_ns, st.st_size) for p, st in zip(paths, stats))
+
+    def load(self, activate: bool = True) -> ModelBundle:
+        """Carrega, valida e (opcionalmente) ativa a versão atual dos artefatos."""
+        with self._lock:
+            stat = self._stat()
+            fmt, paths = self._sources()
+            if fmt == "shared":
+                # Já validado pelo processo pai; a versão vem do cabeçalho do segmento
+                started = time.perf_counter()
+                model, scaler, header = load_shared_segment(paths[0])
+                version = header["version"]
+                bundle = self._versions.get(version)
+                if bundle is None:
+                    bundle = ModelBundle(version, model, scaler, fmt, paths)
+                    bundle.load_seconds = time.perf_counter() - started
+                    bundle.validation = header["validation"]
+                    if DRIFT_ENABLED:
+                        bundle.drift_reference = drift_reference_bins(bundle, DRIFT_REFERENCE_PATH)
+                    self._versions[version] = bundle
+            else:
+                version = _artifact_fingerprint(*paths)
+                bundle = self._versions.get(version)
+            if bundle is None:
+                started = time.perf_counter()
+                if fmt == "npz":
+                    model, scaler = load_serving_artifact(paths[0])
+                else:
+                    model, scaler = _load_artifacts(*paths)
+                bundle = ModelBundle(version, model, scaler, fmt, paths)
+                bundle.load_seconds = time.perf_counter() - started
+                bundle.validation = validate_bundle(bundle)
+                if DRIFT_ENABLED:
+                    bundle.drift_reference = drift_reference_bins(bundle, DRIFT_REFERENCE_PATH)
+                self._versions[version] = bundle
+            self._versions.move_to_end(version)
+            if activate:
+                self.active = bundle
+            self._trim()
+            self._seen_stat = stat
+            self.last_error = None
+            return bundle
+
+    def get(self, version: str) -> Optional[ModelBundle]:
+        return self._versions.get(version)
+
+    def activate(self, version: str) -> ModelBundle:
+        """Reativa uma versão já carregada (rollback)."""
+        with self._lock:
+            bundle = self._versions.get(version)
+            if bundle is None:
+                raise KeyError(version)
+            self._versions.move_to_end(version)
+            self.active = bundle
+            return bundle
+
+    def _trim(self) -> None:
+        while len(self._versions) > self.keep:
+            oldest = next(iter(self._versions))
+            if self._versions[oldest] is self.active:
+                self._versions.move_to_end(oldest)
+                continue
+            del self._versions[oldest]
+
+    def check_for_updates(self) -> bool:
+        """
+        Recarrega quando os arquivos mudam. Exige o mesmo stat em duas checagens
+        seguidas para não ler um .pkl ainda sendo escrito.
+        """
+        stat = self._stat()
+        if stat is None or stat == self._seen_stat:
+            self._pending_stat = None
+            return False
+        # Segmentos compartilhados são escritos por completo antes da troca do ponteiro
+        if stat != self._pending_stat and not SHARED_WEIGHTS_DIR:
+            self._pending_stat = stat
+            return False
+        self._pending_stat = None
+        try:
+            bundle = self.load()
+            logger.info("Modelo %s ativado (%s).", bundle.version, bundle.validation.get("status"))
+            return True
+        except Exception as e:
+            # Mantém a versão atual; tenta de novo só quando os arquivos mudarem outra vez
+            self._seen_stat = stat
+            self.last_error = f"{type(e).__name__}: {e}"
+            logger.warning("Nova versão do modelo rejeitada: %s", self.last_error)
+            return False
+
+    def start_watcher(self, interval: float) -> None:
+        if interval <= 0 or self._watcher is not None:
+            return
+
+        def loop():
+            while True:
+                time.sleep(interval)
+                self.check_for_updates()
+
+        self._watcher = threading.Thread(target=loop, name="model-watcher", daemon=True)
+        self._watcher.start()
+
+    def describe(self) -> Dict[str, Any]:
+        with self._lock:
+            versions = [b.describe() for b in self._versions.values()]
+        return {
+            "active": self.active.version if self.active else None,
+            "versions": versions,
+            "watch_interval_s": SHARED_WEIGHTS_POLL if SHARED_WEIGHTS_DIR else MODEL_WATCH_INTERVAL,
+            "shared_weights_dir": SHARED_WEIGHTS_DIR or None,
+            "last_error": self.last_error,
+        }
+
+
+REGISTRY = ModelRegistry(SERVING_ARTIFACT_PATH, MODEL_PATH, SCALER_PATH, MODEL_REGISTRY_KEEP,
+                         SERVING_ARTIFACT_EXPLICIT, PICKLE_PATHS_EXPLICIT)
+REGISTRY.load()
+
+
+def score_patients(patients, bundle=None):
+    """Codifica e pontua pacientes validados: retorna (predições, probabilidades)."""
+    return (bundle or REGISTRY.active).score(patients)
+
+
+# ------------------------------------------------------------------------------
+# Cache LRU/TTL de predições (chave = paciente canônico pós-validadores)
+# ------------------------------------------------------------------------------
+# Campos que determinam a resposta do /predict (Exang já foi consolidado em ExerciseAngina)
+CANONICAL_FIELDS = (
+    "Age", "Sex", "ChestPainType", "RestingBP", "Cholesterol", "FastingBS",
+    "RestingECG", "MaxHR", "ExerciseAngina", "Oldpeak", "ST_Slope", "Thal",
+)
+
+
+# Tupla canônica do paciente já normalizado pelos validadores (attrgetter: leitura em C)
+canonical_key = operator.attrgetter(*CANONICAL_FIELDS)
+
+
+def dedupe_patients(patients):
+    """
+    Colapsa pacientes repetidos (mesma tupla canônica) de um lote.
+    Retorna (únicos, inverso) com únicos[inverso[i]] equivalente a patients[i];
+    os resultados dos únicos voltam à ordem original com `resultado[inverso]`.
+    """
+    index: Dict[tuple, int] = {}
+    unique, inverse = [], []
+    for patient, key in zip(patients, map(canonical_key, patients)):
+        j = index.setdefault(key, len(unique))
+        if j == len(unique):
+            unique.append(patient)
+        inverse.append(j)
+    return unique, np.array(inverse, dtype=np.intp)
+
+
+class PredictionCache:
+    """
+    LRU limitado com TTL, seguro entre threads. Cada entrada pertence a uma
+    versão de artefatos: ao consultar com outra versão (modelo/scaler trocados)
+    o cache inteiro é descartado.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+        self.hits = self.misses = self.evictions = self.expirations = self.invalidations = 0
+
+    def _check_version(self, version):
+        if version != self._version:
+            if self._data:
+                self.invalidations += 1
+            self._data.clear()
+            self._version = version
+
+    def get(self, key, version):
+        if self.maxsize <= 0:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            self._check_version(version)
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at < now:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, version, value) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._check_version(version)
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.maxsize > 0,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "artifact_version": self._version,
+            }
+
+
+PREDICTION_CACHE = PredictionCache(PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL)
+
+
+# ------------------------------------------------------------------------------
+# Micro-batching de chamadas concorrentes ao /predict
+# ------------------------------------------------------------------------------
+class MicroBatcher:
+    """
+    Agrupa chamadas individuais que chegam dentro de `window_s` (ou até
+    `max_rows` linhas), pontua todas como uma única matriz pelo mesmo caminho
+    encoder/kernel e devolve cada resultado ao chamador que o aguarda.
+    """
+
+    def __init__(self, bundle_fn, window_s: float, max_rows: int):
+        self.bundle_fn = bundle_fn
+        self.window_s = window_s
+        self.max_rows = max(1, max_rows)
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="microbatcher", daemon=True)
+        self._thread.start()
+        self.batch_size = Histogram((1, 2, 4, 8, 16, 32, 64, 128, 256))
+        self.queue_wait_ms = Histogram((0.1, 0.25, 0.5, 1, 2, 5, 10, 25, 50, 100))
+
+    def submit(self, patient) -> Future:
+        """
+        Enfileira um paciente validado; o Future resolve em (predição, probabilidade,
+        versão, (linha codificada, predições, probabilidades)) — a tupla final como
+        arrays de uma linha, para o cache reapresentá-la aos observadores.
+        """
+        fut: Future = Future()
+        self._queue.put((patient, fut, time.perf_counter()))
+        return fut
+
+    def _run(self) -> None:
+        _CURRENT_ROUTE.set("/predict")
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.perf_counter() + self.window_s
+            while len(batch) < self.max_rows:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._flush(batch)
+
+    def _flush(self, batch) -> None:
+        started = time.perf_counter()
+        self.batch_size.observe(len(batch))
+        for _, _, enqueued in batch:
+            self.queue_wait_ms.observe((started - enqueued) * 1000.0)
+        bundle = self.bundle_fn()
+        try:
+            X = bundle.encode([patient for patient, _, _ in batch])
+            preds, probas = bundle.score_encoded(X)
+        except Exception as e:
+            for _, fut, _ in batch:
+                fut.set_exception(e)
+            return
+        for i, ((_, fut, _), pred, proba) in enumerate(zip(batch, preds.tolist(), probas.tolist())):
+            fut.set_result((pred, proba, bundle.version, (X[i:i + 1], preds[i:i + 1], probas[i:i + 1])))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": True,
+            "window_ms": self.window_s * 1000.0,
+            "max_rows": self.max_rows,
+            "batch_size": self.batch_size.snapshot(),
+            "queue_wait_ms": self.queue_wait_ms.snapshot(),
+        }
+
+
+MICROBATCHER = (
+    MicroBatcher(lambda: REGISTRY.active, MICROBATCH_WINDOW_MS / 1000.0, MICROBATCH_MAX_ROWS)
+    if MICROBATCH_ENABLED else None
+)
+
+
+# ------------------------------------------------------------------------------
+# Modelo sombra (comparação com o modelo ativo fora do caminho da requisição)
+# ------------------------------------------------------------------------------
+def load_shadow_bundle(artifact_path: str, model_path: str, scaler_path: str) -> Optional[ModelBundle]:
+    """Carrega o par sombra (.npz ou .pkl). Sem caminhos configurados, retorna None."""
+    if artifact_path:
+        fmt, paths = "npz", (artifact_path,)
+        model, scaler = load_serving_artifact(artifact_path)
+    elif model_path and scaler_path:
+        fmt, paths = "pickle", (model_path, scaler_path)
+        model, scaler = _load_artifacts(model_path, scaler_path)
+    else:
+        return None
+    bundle = ModelBundle(_artifact_fingerprint(*paths), model, scaler, fmt, paths)
+    try:
+        bundle.validation = validate_bundle(bundle)
+    except Exception as e:
+        # Um candidato reprovado ainda pode ser observado; o resultado fica registrado
+        bundle.validation = {"status": "failed", "error": str(e)}
+    return bundle
+
+
+class ShadowScorer:
+    """
+    Recebe as matrizes já codificadas pelo modelo ativo (com as predições dele),
+    pontua em lotes numa thread própria com o modelo sombra e acumula concordância
+    e diferenças de probabilidade. A fila é limitada: cheia, a amostra é descartada
+    (nunca bloqueia a requisição). As estatísticas recomeçam quando a versão ativa muda.
+    """
+
+    def __init__(self, bundle: ModelBundle, queue_size: int, batch_rows: int):
+        self.bundle = bundle
+        self.batch_rows = max(1, batch_rows)
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max(1, queue_size))
+        self._lock = threading.Lock()
+        self.abs_delta = Histogram((0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5))
+        self._reset(None)
+        self.dropped_rows = 0
+        self.skipped_rows = 0
+        self._thread = threading.Thread(target=self._run, name="shadow-scorer", daemon=True)
+        self._thread.start()
+
+    def _reset(self, version: Optional[str]) -> None:
+        self.primary_version = version
+        self.rows = 0
+        self.agree = 0
+        self.primary_only_positive = 0
+        self.shadow_only_positive = 0
+        self.delta_sum = 0.0
+        self.abs_delta_sum = 0.0
+        self.max_abs_delta = 0.0
+        self.abs_delta = Histogram(self.abs_delta.bounds)
+
+    def submit(self, primary: ModelBundle, X, preds, probas) -> None:
+        """Chamado no caminho da requisição: só um put_nowait (O(1))."""
+        if primary.encoder.columns != self.bundle.encoder.columns:
+            with self._lock:
+                self.skipped_rows += len(X)  # layouts diferentes: a matriz não serve ao sombra
+            return
+        # Sem cópia: a matriz codificada é nova a cada chamada e não é mais alterada
+        try:
+            self._queue.put_nowait((primary.version, X, preds, probas))
+        except queue.Full:
+            with self._lock:
+                self.dropped_rows += len(X)
+
+    def _run(self) -> None:
+        while True:
+            items = [self._queue.get()]
+            rows = len(items[0][1])
+            while rows < self.batch_rows:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                items.append(item)
+                rows += len(item[1])
+            try:
+                self._score(items)
+            except Exception:
+                logger.exception("Falha ao pontuar lote no modelo sombra.")
+
+    def _score(self, items) -> None:
+        # Agrupa itens consecutivos da mesma versão ativa em uma única matriz
+        start = 0
+        while start < len(items):
+            version = items[start][0]
+            end = start
+            while end < len(items) and items[end][0] == version:
+                end += 1
+            group = items[start:end]
+            X = np.vstack([it[1] for it in group])
+            primary_preds = np.concatenate([it[2] for it in group])
+            primary_probas = np.concatenate([it[3] for it in group])
+            preds, probas = self.bundle.kernel.score(X)
+            delta = probas - primary_probas
+            abs_delta = np.abs(delta)
+            with self._lock:
+                if version != self.primary_version:
+                    self._reset(version)
+                self.rows += len(X)
+                self.agree += int(np.count_nonzero(preds == primary_preds))
+                self.primary_only_positive += int(np.count_nonzero((primary_preds == 1) & (preds == 0)))
+                self.shadow_only_positive += int(np.count_nonzero((primary_preds == 0) & (preds == 1)))
+                self.delta_sum += float(delta.sum())
+                self.abs_delta_sum += float(abs_delta.sum())
+                self.max_abs_delta = max(self.max_abs_delta, float(abs_delta.max()))
+                self.abs_delta.observe_many(abs_delta)
+            start = end
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            n = self.rows
+            return {
+                "enabled": True,
+                "shadow_version": self.bundle.version,
+                "shadow_model_class": self.bundle.model_class,
+                "shadow_validation": self.bundle.validation,
+                "primary_version": self.primary_version,
+                "rows_scored": n,
+                "agreement_rate": self.agree / n if n else None,
+                "primary_only_positive": self.primary_only_positive,
+                "shadow_only_positive": self.shadow_only_positive,
+                "mean_delta": self.delta_sum / n if n else None,
+                "mean_abs_delta": self.abs_delta_sum / n if n else None,
+                "max_abs_delta": self.max_abs_delta,
+                "abs_delta": self.abs_delta.snapshot(),
+                "queue_depth": self._queue.qsize(),
+                "dropped_rows": self.dropped_rows,
+                "skipped_rows": self.skipped_rows,
+            }
+
+
+_shadow_bundle = load_shadow_bundle(SHADOW_ARTIFACT_PATH, SHADOW_MODEL_PATH, SHADOW_SCALER_PATH)
+SHADOW = ShadowScorer(_shadow_bundle, SHADOW_QUEUE_SIZE, SHADOW_BATCH_ROWS) if _shadow_bundle is not None else None
+
+
+# ------------------------------------------------------------------------------
+# Ensemble: membros lineares empilhados em uma única matriz de coeficientes
+# ------------------------------------------------------------------------------
+def load_ensemble_members(directory: str) -> List[tuple]:
+    """
+    Membros do ensemble em `directory`: `*.npz` (artefato de serviço, com o próprio
+    scaler) e `*.pkl` (modelo sklearn treinado sobre o scaler de SCALER_PATH).
+    Retorna [(nome, modelo, scaler)]; arquivos ilegíveis são ignorados com aviso.
+    """
+    members = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.npz")) + glob.glob(os.path.join(directory, "*.pkl"))):
+        name = os.path.splitext(os.path.basename(path))[0]
+        try:
+            if path.endswith(".npz"):
+                model, scaler = load_serving_artifact(path)
+            else:
+                model, scaler = _load_artifacts(path, SCALER_PATH)
+        except Exception as e:
+            logger.warning("Membro do ensemble %s ignorado: %s", path, e)
+            continue
+        members.append((name, model, scaler))
+    return members
+
+
+class EnsembleScorer:
+    """
+    Pontua todos os membros sobre a matriz codificada pelo modelo ativo. Membros
+    lineares (scaler + regressão logística) são dobrados como no LinearKernel e
+    empilhados em W (n_features × m): um lote inteiro vira uma única GEMM
+    `X @ W + b`. Membros não lineares caem no caminho sklearn, um por vez. A pilha
+    é remontada quando a versão ativa muda (o modelo ativo pode ser um membro).
+    """
+
+    def __init__(self, members: List[tuple], include_active: bool):
+        self.members = members
+        self.include_active = include_active
+        self._lock = threading.Lock()
+        self._stack = None
+        self.skipped: Dict[str, str] = {}
+
+    def _build(self, bundle: ModelBundle) -> Dict[str, Any]:
+        columns = bundle.encoder.columns
+        members = ([(f"ativo-{bundle.version}", bundle.model, bundle.scaler)] if self.include_active else [])
+        names, weights, biases, linear, fallback = [], [], [], [], []
+        skipped = {}
+        for name, model, scaler in members + self.members:
+            member_cols = get_expected_columns(model)
+            if sorted(member_cols) != sorted(columns):
+                skipped[name] = "colunas diferentes das do modelo ativo"
+                continue
+            # order[k] = coluna do layout ativo que alimenta a k-ésima entrada do membro
+            order = np.array([columns.index(c) for c in member_cols], dtype=np.intp)
+            pos = len(names)
+            names.append(name)
+            if _is_foldable(model, scaler):
+                kernel = LinearKernel(model, scaler)
+                w = np.empty(len(columns))
+                w[order] = kernel.weights
+                weights.append(w)
+                biases.append(kernel.bias)
+                linear.append(pos)
+            else:
+                fallback.append((pos, SklearnKernel(model, scaler), order))
+        if not names:
+            raise RuntimeError("Nenhum membro do ensemble é compatível com o modelo ativo.")
+        self.skipped = skipped
+        return {
+            "version": bundle.version,
+            "names": names,
+            "W": np.column_stack(weights) if weights else np.zeros((len(columns), 0)),
+            "b": np.asarray(biases, dtype=np.float64),
+            "linear": np.asarray(linear, dtype=np.intp),
+            "fallback": fallback,
+        }
+
+    def _current(self, bundle: ModelBundle) -> Dict[str, Any]:
+        stack = self._stack
+        if stack is None or stack["version"] != bundle.version:
+            with self._lock:
+                stack = self._stack
+                if stack is None or stack["version"] != bundle.version:
+                    stack = self._stack = self._build(bundle)
+        return stack
+
+    def score(self, bundle: ModelBundle, patients):
+        """Retorna (nomes dos membros, matriz P (n × m) de probabilidades da classe positiva)."""
+        stack = self._current(bundle)
+        started = time.perf_counter()
+        X = bundle.encoder.encode(patients)
+        encoded = time.perf_counter()
+        P = np.empty((len(X), len(stack["names"])))
+        if len(stack["linear"]):
+            P[:, stack["linear"]] = 1 / (1 + np.exp(-(X @ stack["W"] + stack["b"])))
+        for pos, kernel, order in stack["fallback"]:
+            P[:, pos] = kernel.score(X[:, order])[1]
+        METRICS.observe_stage("encode", encoded - started)
+        METRICS.observe_stage("ensemble", time.perf_counter() - encoded)
+        return stack["names"], P
+
+    def describe(self) -> Dict[str, Any]:
+        stack = self._stack
+        return {
+            "enabled": True,
+            "directory": ENSEMBLE_DIR,
+            "include_active": self.include_active,
+            "members": stack["names"] if stack else [name for name, _, _ in self.members],
+            "stacked_linear": int(len(stack["linear"])) if stack else None,
+            "sklearn_fallback": len(stack["fallback"]) if stack else None,
+            "skipped": self.skipped,
+        }
+
+
+_ensemble_members = load_ensemble_members(ENSEMBLE_DIR) if ENSEMBLE_DIR and os.path.isdir(ENSEMBLE_DIR) else []
+ENSEMBLE = EnsembleScorer(_ensemble_members, ENSEMBLE_INCLUDE_ACTIVE) if _ensemble_members else None
+
+
+# ------------------------------------------------------------------------------
+# Monitor de drift das entradas (comparação com a distribuição de treino)
+# ------------------------------------------------------------------------------
+# Níveis conhecidos de cada campo categórico (o nível base do drop_first não tem coluna)
+CATEGORY_LEVELS = {
+    "Sex": list(dict.fromkeys(SEX_MAP.values())),
+    "ChestPainType": list(dict.fromkeys(CHEST_PAIN_MAP.values())),
+    "RestingECG": list(dict.fromkeys(RESTING_ECG_MAP.values())),
+    "ExerciseAngina": list(dict.fromkeys(EXERCISE_ANGINA_MAP.values())),
+    "ST_Slope": list(dict.fromkeys(ST_SLOPE_MAP.values())),
+    "Thal": list(dict.fromkeys(THAL_MAP.values())),
+}
+PSI_EPS = 1e-4
+
+
+def psi(observed: np.ndarray, expected: np.ndarray) -> float:
+    """Population Stability Index entre duas distribuições de proporções."""
+    o = np.maximum(observed, PSI_EPS)
+    e = np.maximum(expected, PSI_EPS)
+    return float(np.sum((o - e) * np.log(o / e)))
+
+
+def _psi_status(value: float) -> str:
+    return "stable" if value < 0.1 else "moderate" if value < 0.25 else "significant"
+
+
+class DriftMonitor:
+    """
+    Estatísticas acumuladas das matrizes codificadas que chegam ao modelo: média e
+    variância (Welford/Chan, por lote) de cada coluna, histogramas de z das colunas
+    numéricas e frequências das categorias (médias das colunas one-hot). Memória
+    constante; as linhas ficam num buffer curto e são agregadas em blocos de
+    DRIFT_FLUSH_ROWS com operações vetorizadas. A referência é o scaler da versão
+    ativa (média/escala; a média de uma coluna one-hot é a frequência no treino) e
+    as proporções por bin calculadas na carga da versão (drift_reference_bins).
+    """
+
+    def __init__(self, flush_rows: int):
+        self.flush_rows = max(1, flush_rows)
+        self._lock = threading.Lock()
+        self.version: Optional[str] = None
+
+    def _reset(self, bundle) -> None:
+        enc = bundle.encoder
+        self.version = bundle.version
+        self.columns = enc.columns
+        self.ref_mean = np.asarray(bundle.scaler.mean_, dtype=np.float64)
+        self.ref_scale = np.asarray(bundle.scaler.scale_, dtype=np.float64)
+        self.numeric = [(field, idx) for field, idx in enc.numeric]
+        self.numeric_idx = np.array([idx for _, idx in self.numeric], dtype=np.intp)
+        self.onehot = enc.onehot
+        n_bins = len(DRIFT_Z_EDGES) + 1
+        # Bundles fora do registro (sem referência pronta) usam a normal padrão: nada de I/O aqui
+        self.ref_bins, self.reference = bundle.drift_reference or (
+            np.tile(_normal_bin_probs(DRIFT_Z_EDGES), (len(self.numeric), 1)), "normal")
+        self.n = 0.0
+        self.mean = np.zeros(len(self.columns))
+        self.m2 = np.zeros(len(self.columns))
+        self.bins = np.zeros((len(self.numeric), n_bins))
+        self._pending: List[np.ndarray] = []
+        self._pending_w: List[np.ndarray] = []
+        self._pending_rows = 0
+
+    def observe(self, bundle, X: np.ndarray, weights=None) -> None:
+        """Chamado no caminho da requisição: só acumula (agregação a cada flush_rows linhas)."""
+        w = np.ones(len(X)) if weights is None else np.asarray(weights, dtype=np.float64)
+        if len(X) == 0 or not w.sum() > 0:
+            return  # lote vazio: nada a agregar (e n_b = 0 dividiria por zero no flush)
+        with self._lock:
+            if bundle.version != self.version:
+                self._reset(bundle)
+            self._pending.append(X)
+            self._pending_w.append(w)
+            self._pending_rows += len(X)
+            if self._pending_rows >= self.flush_rows:
+                self._flush()
+
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+        X = self._pending[0] if len(self._pending) == 1 else np.vstack(self._pending)
+        w = self._pending_w[0] if len(self._pending_w) == 1 else np.concatenate(self._pending_w)
+        self._pending, self._pending_w, self._pending_rows = [], [], 0
+        # Combinação de Chan: (n, média, M2) do acumulado com os do bloco
+        n_b = float(w.sum())
+        if not n_b > 0:
+            return
+        mean_b = w @ X / n_b
+        m2_b = w @ (X - mean_b) ** 2
+        n = self.n + n_b
+        delta = mean_b - self.mean
+        self.mean = self.mean + delta * (n_b / n)
+        self.m2 = self.m2 + m2_b + delta ** 2 * (self.n * n_b / n)
+        self.n = n
+        # Histogramas de z: índice de bin por coluna + deslocamento por coluna -> um bincount
+        z = (X[:, self.numeric_idx] - self.ref_mean[self.numeric_idx]) / self.ref_scale[self.numeric_idx]
+        n_bins = self.bins.shape[1]
+        idx = np.searchsorted(DRIFT_Z_EDGES, z, side="right") + np.arange(z.shape[1]) * n_bins
+        self.bins += np.bincount(
+            idx.ravel(), weights=np.repeat(w, z.shape[1]), minlength=self.bins.size
+        ).reshape(self.bins.shape)
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            if self.version is None:
+                return {"enabled": True, "rows_observed": 0}
+            self._flush()
+            n, mean, m2, bins = self.n, self.mean.copy(), self.m2.copy(), self.bins.copy()
+        std = np.sqrt(m2 / n) if n else np.zeros_like(mean)
+        numeric = {}
+        for k, (field, idx) in enumerate(self.numeric):
+            observed = bins[k] / n if n else bins[k]
+            value = psi(observed, self.ref_bins[k]) if n else 0.0
+            numeric[field] = {
+                "mean": float(mean[idx]),
+                "std": float(std[idx]),
+                "ref_mean": float(self.ref_mean[idx]),
+                "ref_std": float(self.ref_scale[idx]),
+                "mean_shift_sd": float((mean[idx] - self.ref_mean[idx]) / self.ref_scale[idx]),
+                "std_ratio": float(std[idx] / self.ref_scale[idx]),
+                "psi": value,
+                "status": _psi_status(value),
+                "z_bins": {"edges": DRIFT_Z_EDGES.tolist(), "observed": observed.tolist(),
+                           "reference": self.ref_bins[k].tolist()},
+            }
+        categorical = {}
+        for field, levels in self.onehot.items():
+            names = CATEGORY_LEVELS.get(field, list(levels))
+            base = [lv for lv in names if lv not in levels]
+            obs = {lv: float(mean[i]) for lv, i in levels.items()}
+            ref = {lv: float(self.ref_mean[i]) for lv, i in levels.items()}
+            # Nível base (sem coluna) = complemento das demais categorias
+            base_name = base[0] if len(base) == 1 else "outros"
+            obs[base_name] = max(0.0, 1.0 - sum(obs.values()))
+            ref[base_name] = max(0.0, 1.0 - sum(ref.values()))
+            keys = list(ref)
+            value = psi(np.array([obs[k] for k in keys]), np.array([ref[k] for k in keys])) if n else 0.0
+            categorical[field] = {"observed": obs, "reference": ref, "psi": value, "status": _psi_status(value)}
+        max_psi = max([v["psi"] for v in numeric.values()] + [v["psi"] for v in categorical.values()] + [0.0])
+        return {
+            "enabled": True,
+            "model_version": self.version,
+            "rows_observed": int(n),
+            "histogram_reference": self.reference,
+            "max_psi": max_psi,
+            "status": _psi_status(max_psi) if n else "no_data",
+            "numeric": numeric,
+            "categorical": categorical,
+        }
+
+
+DRIFT = DriftMonitor(DRIFT_FLUSH_ROWS) if DRIFT_ENABLED else None
+
+
+# ------------------------------------------------------------------------------
+# Auditoria das predições (buffer em memória + gravação em lotes)
+# ------------------------------------------------------------------------------
+class _SqliteAuditStore:
+    """Tabela append-only com índices por timestamp e por (versão, timestamp)."""
+
+    SYNCHRONOUS = {"off": "OFF", "normal": "NORMAL", "full": "FULL"}
+
+    def __init__(self, path: str, durability: str):
+        import sqlite3
+
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(f"PRAGMA synchronous={self.SYNCHRONOUS.get(durability, 'NORMAL')}")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS predictions (
+                id INTEGER PRIMARY KEY,
+                ts REAL NOT NULL,
+                route TEXT NOT NULL,
+                model_version TEXT NOT NULL,
+                prediction INTEGER NOT NULL,
+                probability REAL NOT NULL,
+                input TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_predictions_ts ON predictions (ts);
+            CREATE INDEX IF NOT EXISTS idx_predictions_version_ts ON predictions (model_version, ts);
+        """)
+
+    def write(self, rows) -> None:
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO predictions (ts, route, model_version, prediction, probability, input) "
+                "VALUES (?, ?, ?, ?, ?, ?)", rows,
+            )
+
+    def query(self, since: float, until: float, model_version: Optional[str], limit: int):
+        sql = "SELECT ts, route, model_version, prediction, probability, input FROM predictions WHERE ts >= ? AND ts < ?"
+        args: List[Any] = [since, until]
+        if model_version:
+            sql += " AND model_version = ?"
+            args.append(model_version)
+        sql += " ORDER BY ts DESC LIMIT ?"
+        args.append(limit)
+        return self.conn.execute(sql, args).fetchall()
+
+
+class _JsonlAuditStore:
+    """
+    Arquivos JSONL rotacionados por tamanho (audit-<epoch_ms>.jsonl). O nome traz o
+    instante do primeiro registro, que serve de índice grosso por tempo na consulta.
+    """
+
+    def __init__(self, directory: str, durability: str, rotate_bytes: int):
+        self.directory = directory
+        self.durability = durability
+        self.rotate_bytes = max(1, rotate_bytes)
+        os.makedirs(directory, exist_ok=True)
+        self._file = None
+
+    _FILE_NAME = re.compile(r"^audit-(\d+)\.jsonl$")
+
+    def _files(self):
+        # Outros arquivos no diretório (ex.: audit-old.jsonl de uma cópia manual) são ignorados
+        matches = filter(None, map(self._FILE_NAME.match, os.listdir(self.directory)))
+        return sorted((int(m.group(1)) / 1000.0, os.path.join(self.directory, m.group(0))) for m in matches)
+
+    def write(self, rows) -> None:
+        if self._file is None or self._file.tell() >= self.rotate_bytes:
+            if self._file is not None:
+                self._file.close()
+            path = os.path.join(self.directory, f"audit-{int(rows[0][0] * 1000):013d}.jsonl")
+            self._file = open(path, "a", encoding="utf-8")
+        self._file.write("".join(
+            json.dumps({"ts": ts, "route": route, "model_version": version, "prediction": pred,
+                        "probability": proba, "input": json.loads(inp)}, ensure_ascii=False) + "\n"
+            for ts, route, version, pred, proba, inp in rows
+        ))
+        self._file.flush()
+        if self.durability == "full":
+            os.fsync(self._file.fileno())
+
+    def query(self, since: float, until: float, model_version: Optional[str], limit: int):
+        files = self._files()
+        out = []
+        # Do arquivo mais recente para o mais antigo; pula arquivos iniciados depois de `until`
+        for i in range(len(files) - 1, -1, -1):
+            start, path = files[i]
+            if start >= until:
+                continue
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    rec = json.loads(line)
+                    if since <= rec["ts"] < until and (not model_version or rec["model_version"] == model_version):
+                        out.append((rec["ts"], rec["route"], rec["model_version"], rec["prediction"],
+                                    rec["probability"], json.dumps(rec["input"], ensure_ascii=False)))
+            if start < since:
+                break  # arquivos anteriores só têm registros mais antigos
+        out.sort(key=lambda r: r[0], reverse=True)
+        return out[:limit]
+
+
+class AuditLog:
+    """
+    Registro de toda predição (entrada normalizada, versão, probabilidade, instante).
+    No caminho da requisição só há um append em memória; uma thread grava os lotes
+    pendentes a cada `flush_interval` s. O buffer é limitado a `max_rows` linhas: se
+    a gravação não acompanhar, as entradas mais antigas são descartadas e contadas.
+    """
+
+    def __init__(self, store, flush_interval: float, max_rows: int):
+        self.store = store
+        self.flush_interval = max(0.01, flush_interval)
+        self.max_rows = max(1, max_rows)
+        self._buffer: "deque" = deque()
+        self._buffered_rows = 0
+        self._lock = threading.Lock()        # buffer
+        self._write_lock = threading.Lock()  # store (flush da thread x flush da consulta)
+        self.written_rows = 0
+        self.dropped_rows = 0
+        self.last_error: Optional[str] = None
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+
+    def record(self, patients, preds, probas, version: str) -> None:
+        """Enfileira um lote já pontuado (arrays ou listas alinhados com `patients`)."""
+        n = len(patients)
+        entry = (time.time(), _CURRENT_ROUTE.get(), version, patients, preds, probas)
+        with self._lock:
+            self._buffer.append(entry)
+            self._buffered_rows += n
+            while self._buffered_rows > self.max_rows and len(self._buffer) > 1:
+                dropped = self._buffer.popleft()
+                self._buffered_rows -= len(dropped[3])
+                self.dropped_rows += len(dropped[3])
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            entries, self._buffer, self._buffered_rows = self._buffer, deque(), 0
+        if not entries:
+            return
+        rows = []
+        for ts, route, version, patients, preds, probas in entries:
+            preds = preds.tolist() if isinstance(preds, np.ndarray) else list(preds)
+            probas = probas.tolist() if isinstance(probas, np.ndarray) else list(probas)
+            for patient, pred, proba in zip(patients, preds, probas):
+                inp = json.dumps(dict(zip(CANONICAL_FIELDS, canonical_key(patient))), ensure_ascii=False)
+                rows.append((ts, route, version, int(pred), float(proba), inp))
+        with self._write_lock:
+            try:
+                self.store.write(rows)
+                self.written_rows += len(rows)
+                self.last_error = None
+            except Exception as e:
+                self.dropped_rows += len(rows)
+                self.last_error = f"{type(e).__name__}: {e}"
+                logger.error("Falha ao gravar auditoria (%d linhas): %s", len(rows), self.last_error)
+
+    def query(self, since: float, until: float, model_version: Optional[str], limit: int):
+        self.flush()  # inclui o que ainda está no buffer
+        with self._write_lock:
+            rows = self.store.query(since, until, model_version, limit)
+        return [
+            {"ts": ts, "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(ts)) + f".{int(ts % 1 * 1000):03d}Z",
+             "route": route, "model_version": version, "prediction": pred, "probability_positive": proba,
+             "input": json.loads(inp)}
+            for ts, route, version, pred, proba, inp in rows
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pending = self._buffered_rows
+        return {
+            "enabled": True,
+            "backend": AUDIT_BACKEND,
+            "path": AUDIT_PATH,
+            "pending_rows": pending,
+            "written_rows": self.written_rows,
+            "dropped_rows": self.dropped_rows,
+            "last_error": self.last_error,
+        }
+
+
+def _build_audit_log() -> Optional[AuditLog]:
+    if AUDIT_BACKEND == "sqlite":
+        store = _SqliteAuditStore(AUDIT_PATH, AUDIT_DURABILITY)
+    elif AUDIT_BACKEND == "jsonl":
+        store = _JsonlAuditStore(AUDIT_PATH, AUDIT_DURABILITY, int(AUDIT_ROTATE_MB * 1024 * 1024))
+    elif AUDIT_BACKEND:
+        raise RuntimeError(f"AUDIT_BACKEND inválido: {AUDIT_BACKEND!r} (use sqlite ou jsonl).")
+    else:
+        return None
+    return AuditLog(store, AUDIT_FLUSH_INTERVAL, AUDIT_BUFFER_ROWS)
+
+
+AUDIT = _build_audit_log()
+
+
+# ------------------------------------------------------------------------------
+# Execução assíncrona (event loop + executor dimensionado para lotes grandes)
+# ------------------------------------------------------------------------------
+SCORING_EXECUTOR = ThreadPoolExecutor(max_workers=SCORING_WORKERS, thread_name_prefix="scoring")
+
+
+async def run_scoring(fn, *args):
+    """Executa `fn(*args)` no executor de escore, sem ocupar o threadpool do Starlette."""
+    ctx = contextvars.copy_context()  # preserva a rota corrente para as métricas
+    return await asyncio.get_running_loop().run_in_executor(SCORING_EXECUTOR, ctx.run, fn, *args)
+
+
+async def score_patients_async(patients, bundle, weights=None):
+    """Lotes pequenos são pontuados no próprio event loop (microssegundos); grandes, no executor."""
+    if len(patients) <= ASYNC_INLINE_MAX_ROWS:
+        return bundle.score(patients, weights)
+    return await run_scoring(bundle.score, patients, weights)
+
+
+@app.on_event("startup")
+async def _configure_threadpool():
+    if THREADPOOL_LIMIT:
+        anyio.to_thread.current_default_thread_limiter().total_tokens = int(THREADPOOL_LIMIT)
+
+
+@app.on_event("shutdown")
+def _flush_audit_log():
+    if AUDIT is not None:
+        AUDIT.flush()
+
+
+@app.on_event("startup")
+async def _start_model_watcher():
+    # Workers do serve.py acompanham o ponteiro do segmento compartilhado de perto
+    REGISTRY.start_watcher(SHARED_WEIGHTS_POLL if SHARED_WEIGHTS_DIR else MODEL_WATCH_INTERVAL)
+
+
+# ------------------------------------------------------------------------------
+# Respostas compactas (?slim=true) e serialização rápida
+# ------------------------------------------------------------------------------
+# Dependências opcionais: sem orjson, cai no json da stdlib; sem msgpack, o formato
+# binário responde 406.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+
+
+def _plain(content):
+    """Arrays NumPy -> listas (para json da stdlib e msgpack)."""
+    return {k: v.tolist() if isinstance(v, np.ndarray) else v for k, v in content.items()}
+
+
+def dumps_json(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(_plain(content), separators=(",", ":")).encode("utf-8")
+
+
+def slim_response(content, request: Request) -> Response:
+    """
+    Devolve `content` já serializado, sem passar pelo response_model nem pelo
+    jsonable_encoder. `Accept: application/msgpack` seleciona MessagePack.
+    """
+    if MSGPACK_MEDIA_TYPE in request.headers.get("accept", ""):
+        if msgpack is None:
+            raise HTTPException(status_code=406, detail="MessagePack indisponível (pip install msgpack).")
+        return Response(msgpack.packb(_plain(content)), media_type=MSGPACK_MEDIA_TYPE)
+    return Response(dumps_json(content), media_type="application/json")
+
+
+# ------------------------------------------------------------------------------
+# Rotas
+# ------------------------------------------------------------------------------
+@app.get("/health")
+def health():
+    bundle = REGISTRY.active
+    return {
+        "status": "ok",
+        "model_loaded": bundle.model is not None,
+        "scaler_loaded": bundle.scaler is not None,
+        "model_version": bundle.version,
+        "artifact_format": bundle.artifact_format,
+        "artifact_paths": bundle.paths,
+        "scoring_kernel": "fused" if bundle.kernel.fused else "sklearn",
+        "prediction_cache": PREDICTION_CACHE.stats(),
+        "microbatch": MICROBATCHER.stats() if MICROBATCHER is not None else {"enabled": False},
+        "shadow": {"enabled": SHADOW is not None},
+        "drift": {"enabled": DRIFT is not None},
+        "ensemble": ENSEMBLE.describe() if ENSEMBLE is not None else {"enabled": False},
+        "audit": AUDIT.stats() if AUDIT is not None else {"enabled": False},
+        "admission": ({name: lane.stats() for name, lane in {**LANES, **ROUTE_LIMITS}.items()} if ADMISSION_ENABLED
+                      else {"enabled": False}),
+        "scoring_workers": SCORING_WORKERS,
+        "feature_columns_source": bundle.feature_columns_source,
+    }
+
+
+async def _predict_one(patient, explain: bool = False, top_k: int = 3):
+    """Predição individual (cache + micro-batching opcional), comum aos esquemas Patient e StrictPatient."""
+    bundle = REGISTRY.active
+    METRICS.observe_rows(1)
+    if explain:
+        return _explain_one(patient, bundle, top_k)
+    try:
+        started = time.perf_counter()
+        key = canonical_key(patient)
+        cached = PREDICTION_CACHE.get(key, bundle.version)
+        METRICS.observe_stage("cache", time.perf_counter() - started)
+        if cached is None:
+            warnings = []
+            # Aviso se Thal vier mas o modelo não usar
+            if patient.Thal is not None and not bundle.thal_used:
+                warnings.append("Campo 'Thal' recebido, mas não foi utilizado pelo modelo treinado.")
+
+            if MICROBATCHER is not None:
+                pred, proba, version, observed = await asyncio.wrap_future(MICROBATCHER.submit(patient))
+                # O micro-lote usa a versão ativa no momento do flush
+                if version != bundle.version:
+                    bundle = REGISTRY.get(version) or bundle
+            else:
+                X = bundle.encode([patient])
+                preds, probas = bundle.score_encoded(X)
+                pred, proba = int(preds[0]), float(probas[0])
+                observed = (X, preds, probas)
+            # A linha codificada fica na entrada: acertos seguintes também alimentam drift/sombra
+            cached = (pred, proba, tuple(warnings), observed)
+            PREDICTION_CACHE.put(key, bundle.version, cached)
+        else:
+            bundle._observe(*cached[3], None)
+        pred, proba, warnings, _ = cached
+        if AUDIT is not None:
+            AUDIT.record((patient,), (pred,), (proba,), bundle.version)
+        label = "ALTO_RISCO" if pred == 1 else "BAIXO_RISCO"
+
+        return {
+            "prediction": pred,
+            "label": label,
+            "probability_positive": proba,
+            "model_info": {
+                "features_expected": bundle.encoder.columns,
+                "model_class": bundle.model_class,
+                "model_version": bundle.version,
+            },
+            "warnings": list(warnings),
+        }
+    except Exception as e:
+        METRICS.count_error(type(e).__name__)
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _explain_one(patient, bundle, top_k: int):
+    """
+    Caminho com explicação: sem micro-batching (precisa da matriz codificada), mas com
+    cache próprio — chave canônica + top_k, na mesma LRU/TTL do /predict.
+    """
+    try:
+        started = time.perf_counter()
+        key = (canonical_key(patient), top_k)
+        cached = PREDICTION_CACHE.get(key, bundle.version)
+        METRICS.observe_stage("cache", time.perf_counter() - started)
+        if cached is None:
+            X = bundle.encode([patient])
+            preds, probas, explanations = bundle.explain_encoded(X, [patient], top_k)
+            warnings = []
+            if patient.Thal is not None and not bundle.thal_used:
+                warnings.append("Campo 'Thal' recebido, mas não foi utilizado pelo modelo treinado.")
+            if explanations is None:
+                warnings.append(f"Explicação indisponível para o modelo {bundle.model_class} (não linear).")
+            cached = (int(preds[0]), float(probas[0]), tuple(warnings), (X, preds, probas),
+                      explanations[0] if explanations is not None else None)
+            PREDICTION_CACHE.put(key, bundle.version, cached)
+        else:
+            bundle._observe(*cached[3], None)
+        pred, proba, warnings, _, explanation = cached
+        if AUDIT is not None:
+            AUDIT.record((patient,), (pred,), (proba,), bundle.version)
+        return {
+            "prediction": pred,
+            "label": "ALTO_RISCO" if pred == 1 else "BAIXO_RISCO",
+            "probability_positive": proba,
+            "model_info": {
+                "features_expected": bundle.encoder.columns,
+                "model_class": bundle.model_class,
+                "model_version": bundle.version,
+            },
+            "warnings": list(warnings),
+            "explanation": explanation,
+        }
+    except Exception as e:
+        METRICS.count_error(type(e).__name__)
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    bundle = REGISTRY.active
+    extra = [
+        "# HELP heart_api_model_info Versão do modelo ativo.",
+        "# TYPE heart_api_model_info gauge",
+        f"heart_api_model_info{{{_labels(version=bundle.version, model_class=bundle.model_class, artifact_format=bundle.artifact_format, scoring_kernel='fused' if bundle.kernel.fused else 'sklearn')}}} 1",
+    ]
+    cache = PREDICTION_CACHE.stats()
+    extra += ["# TYPE heart_api_cache_events_total counter"]
+    extra += [
+        f"heart_api_cache_events_total{{{_labels(event=ev)}}} {cache[key]}"
+        for ev, key in (("hit", "hits"), ("miss", "misses"), ("eviction", "evictions"),
+                        ("expiration", "expirations"), ("invalidation", "invalidations"))
+    ]
+    extra += ["# TYPE heart_api_cache_size gauge", f"heart_api_cache_size {cache['size']}"]
+    if MICROBATCHER is not None:
+        extra += ["# TYPE heart_api_microbatch_size histogram"]
+        Metrics._render_histogram(extra, "heart_api_microbatch_size", _labels(route="/predict"), MICROBATCHER.batch_size)
+        extra += ["# TYPE heart_api_microbatch_queue_wait_ms histogram"]
+        Metrics._render_histogram(extra, "heart_api_microbatch_queue_wait_ms", _labels(route="/predict"), MICROBATCHER.queue_wait_ms)
+    if ADMISSION_ENABLED:
+        extra += ["# TYPE heart_api_admission_in_flight gauge"]
+        gates = {**LANES, **ROUTE_LIMITS}
+        extra += [f"heart_api_admission_in_flight{{{_labels(lane=n)}}} {lane.in_flight}" for n, lane in gates.items()]
+        extra += ["# TYPE heart_api_admission_waiting gauge"]
+        extra += [f"heart_api_admission_waiting{{{_labels(lane=n)}}} {lane.waiting}" for n, lane in gates.items()]
+    if DRIFT is not None:
+        report = DRIFT.report()
+        extra += ["# TYPE heart_api_drift_rows_total counter",
+                  f"heart_api_drift_rows_total {report['rows_observed']}",
+                  "# TYPE heart_api_drift_psi gauge"]
+        for kind in ("numeric", "categorical"):
+            extra += [f"heart_api_drift_psi{{{_labels(feature=f)}}} {v['psi']}" for f, v in report.get(kind, {}).items()]
+    if SHADOW is not None:
+        sh = SHADOW.stats()
+        shadow_labels = _labels(shadow_version=sh["shadow_version"], primary_version=sh["primary_version"])
+        extra += [
+            "# TYPE heart_api_shadow_rows_total counter",
+            f"heart_api_shadow_rows_total{{{shadow_labels}}} {sh['rows_scored']}",
+            "# TYPE heart_api_shadow_agreement_ratio gauge",
+            f"heart_api_shadow_agreement_ratio{{{shadow_labels}}} {sh['agreement_rate'] if sh['rows_scored'] else 'NaN'}",
+            "# TYPE heart_api_shadow_dropped_rows_total counter",
+            f"heart_api_shadow_dropped_rows_total {sh['dropped_rows']}",
+            "# TYPE heart_api_shadow_abs_delta histogram",
+        ]
+        Metrics._render_histogram(extra, "heart_api_shadow_abs_delta", shadow_labels, SHADOW.abs_delta)
+    return METRICS.render(extra)
+
+
+def _slim_one(result, request: Request) -> Response:
+    content = {"prediction": result["prediction"], "probability_positive": result["probability_positive"]}
+    if result.get("explanation") is not None:
+        content["explanation"] = result["explanation"]
+    return slim_response(content, request)
+
+
+@app.post("/predict", response_model=PredictResponse, dependencies=[Depends(validation_clock)])
+async def predict(request: Request, patient: Patient, explain: bool = False,
+                  top_k: int = Query(3, ge=1, le=20), slim: bool = False):
+    """
+    `?explain=true` inclui os `top_k` campos que mais pesaram no logit (modelos lineares).
+    `?slim=true` devolve só predição e probabilidade (JSON rápido ou MessagePack).
+    """
+    observe_validation(request)
+    result = await _predict_one(patient, explain, top_k)
+    return _slim_one(result, request) if slim else result
+
+
+@app.post("/predict-strict", response_model=PredictResponse, dependencies=[Depends(validation_clock)])
+async def predict_strict(request: Request, patient: StrictPatient, explain: bool = False,
+                         top_k: int = Query(3, ge=1, le=20), slim: bool = False):
+    """Mesma predição do /predict, para quem já envia códigos canônicos (sem normalização)."""
+    observe_validation(request)
+    result = await _predict_one(patient, explain, top_k)
+    return _slim_one(result, request) if slim else result
+
+
+# Com ADMISSION_MAX_BATCH_ROWS, o tamanho da lista é checado antes de validar cada item:
+# um lote acima do teto não chega a rodar um Patient por linha no event loop (413)
+_MAX_BATCH_ITEMS = ADMISSION_MAX_BATCH_ROWS or None
+
+
+class BatchRequest(BaseModel):
+    items: List[Patient] = Field(..., max_length=_MAX_BATCH_ITEMS)
+
+
+class StrictBatchRequest(BaseModel):
+    items: List[StrictPatient] = Field(..., max_length=_MAX_BATCH_ITEMS)
+
+
+def check_batch_rows(n: int) -> None:
+    """Recusa (413) lotes acima de ADMISSION_MAX_BATCH_ROWS, comum a todas as rotas em lote."""
+    if ADMISSION_MAX_BATCH_ROWS and n > ADMISSION_MAX_BATCH_ROWS:
+        METRICS.count_shed("bulk", "too_many_rows")
+        raise HTTPException(status_code=413, detail=f"Lote com {n} linhas; o máximo é {ADMISSION_MAX_BATCH_ROWS}.")
+
+
+async def _score_chunked(unique, bundle, weights, explain: bool, top_k: int):
+    """
+    Pontua em blocos de BATCH_CHUNK_ROWS: cada bloco é um job separado no executor,
+    então um lote enorme não monopoliza uma thread de escore enquanto há outras filas.
+    """
+    preds, probas, explanations = [], [], []
+    for start in range(0, len(unique), BATCH_CHUNK_ROWS):
+        part = unique[start:start + BATCH_CHUNK_ROWS]
+        w = None if weights is None else weights[start:start + BATCH_CHUNK_ROWS]
+        if explain:
+            p, q, e = await run_scoring(bundle.explain, part, top_k, w)
+            # Modelo não linear (e is None): sem explicações para o lote inteiro
+            if e is None:
+                explanations = None
+            elif explanations is not None:
+                explanations.extend(e)
+        else:
+            p, q = await score_patients_async(part, bundle, w)
+        preds.append(p)
+        probas.append(q)
+    return np.concatenate(preds), np.concatenate(probas), (explanations if explain else None)
+
+
+def _dedupe_batch(items):
+    """Deduplicação do lote: (únicos, inverso, pesos ou None, linhas colapsadas)."""
+    if not BATCH_DEDUP_ENABLED:
+        return items, np.arange(len(items)), None, 0
+    unique, inverse = dedupe_patients(items)
+    deduplicated = len(items) - len(unique)
+    weights = np.bincount(inverse, minlength=len(unique)) if deduplicated else None
+    return unique, inverse, weights, deduplicated
+
+
+def _batch_response(request: Request, items, bundle, preds, probas, explanations, inverse,
+                    deduplicated: int, explain: bool, slim: bool, serialize: bool):
+    """
+    Devolve os resultados à ordem original, grava a auditoria e monta a resposta.
+    `serialize` = já entregar bytes (lotes grandes, no executor); senão o dict segue
+    pelo caminho normal do FastAPI.
+    """
+    if explanations is not None:
+        explanations = [explanations[j] for j in inverse.tolist()]
+    preds, probas = preds[inverse], probas[inverse]
+    if AUDIT is not None:
+        AUDIT.record(items, preds, probas, bundle.version)
+    if slim:
+        # Arrays NumPy vão direto para o serializador (orjson) sem tolist()
+        out = {"predictions": preds, "probabilities_positive": probas}
+        if explain:
+            out["explanations"] = explanations
+        return slim_response(out, request)
+    preds, probas = preds.tolist(), probas.tolist()
+    labels = ["ALTO_RISCO" if p == 1 else "BAIXO_RISCO" for p in preds]
+    out = {
+        "predictions": preds,
+        "labels": labels,
+        "probabilities_positive": probas,
+        "model_version": bundle.version,
+        "deduplicated_rows": deduplicated,
+    }
+    if explain:
+        out["explanations"] = explanations
+        if explanations is None:
+            out["warnings"] = [f"Explicação indisponível para o modelo {bundle.model_class} (não linear)."]
+    return Response(dumps_json(out), media_type="application/json") if serialize else out
+
+
+async def _predict_many(request: Request, items, explain: bool = False, top_k: int = 3, slim: bool = False):
+    """
+    Lotes até ASYNC_INLINE_MAX_ROWS ficam inteiros no event loop; acima disso,
+    deduplicação, escore, montagem da resposta e serialização vão para o executor
+    (o loop só coordena os jobs).
+    """
+    bundle = REGISTRY.active
+    check_batch_rows(len(items))
+    METRICS.observe_rows(len(items))
+    large = len(items) > ASYNC_INLINE_MAX_ROWS
+    if slim and MSGPACK_MEDIA_TYPE in request.headers.get("accept", "") and msgpack is None:
+        raise HTTPException(status_code=406, detail="MessagePack indisponível (pip install msgpack).")
+    try:
+        # Cada vetor distinto é codificado/pontuado uma vez; os resultados voltam à ordem original
+        unique, inverse, weights, deduplicated = await run_scoring(_dedupe_batch, items) if large else _dedupe_batch(items)
+        if deduplicated:
+            METRICS.count_deduplicated(deduplicated)
+        explanations = None
+        if len(unique) > BATCH_CHUNK_ROWS:
+            preds, probas, explanations = await _score_chunked(unique, bundle, weights, explain, top_k)
+        elif explain:
+            if len(unique) <= ASYNC_INLINE_MAX_ROWS:
+                preds, probas, explanations = bundle.explain(unique, top_k, weights)
+            else:
+                preds, probas, explanations = await run_scoring(bundle.explain, unique, top_k, weights)
+        else:
+            preds, probas = await score_patients_async(unique, bundle, weights)
+        args = (request, items, bundle, preds, probas, explanations, inverse, deduplicated, explain, slim)
+        if large:
+            return await run_scoring(_batch_response, *args, True)
+        return _batch_response(*args, False)
+    except Exception as e:
+        METRICS.count_error(type(e).__name__)
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.post("/predict-batch", dependencies=[Depends(validation_clock)])
+async def predict_batch(request: Request, payload: BatchRequest, explain: bool = False,
+                        top_k: int = Query(3, ge=1, le=20), slim: bool = False):
+    observe_validation(request)
+    return await _predict_many(request, payload.items, explain, top_k, slim)
+
+
+@app.post("/predict-batch-strict", dependencies=[Depends(validation_clock)])
+async def predict_batch_strict(request: Request, payload: StrictBatchRequest, explain: bool = False,
+                               top_k: int = Query(3, ge=1, le=20), slim: bool = False):
+    observe_validation(request)
+    return await _predict_many(request, payload.items, explain, top_k, slim)
+
+
+def _ensemble_response(items, bundle, names, P, members: bool) -> bytes:
+    """Resume a matriz por membro, grava a auditoria e serializa a resposta."""
+    mean = P.mean(axis=1)
+    preds = (mean > 0.5).astype(int)
+    if AUDIT is not None:
+        AUDIT.record(items, preds, mean, bundle.version)
+    out = {
+        "predictions": preds,
+        "labels": ["ALTO_RISCO" if p == 1 else "BAIXO_RISCO" for p in preds.tolist()],
+        "probabilities_mean": mean,
+        # Dispersão entre membros: desvio padrão, extremos e fração que vota positivo
+        "probabilities_std": P.std(axis=1),
+        "probabilities_min": P.min(axis=1),
+        "probabilities_max": P.max(axis=1),
+        "positive_vote_share": (P > 0.5).mean(axis=1),
+        "members": names,
+        "model_version": bundle.version,
+    }
+    if members:
+        out["member_probabilities"] = P
+    # Arrays NumPy vão direto ao serializador, como nas respostas compactas
+    return dumps_json(out)
+
+
+async def _ensemble_many(items, members: bool) -> bytes:
+    """Mesmos limites do _predict_many: teto de linhas, blocos de BATCH_CHUNK_ROWS e auditoria."""
+    bundle = REGISTRY.active
+    check_batch_rows(len(items))
+    METRICS.observe_rows(len(items))
+    try:
+        parts = []
+        # Um bloco por job no executor; lote vazio = um bloco vazio (a resposta ainda lista os membros)
+        for start in range(0, max(1, len(items)), BATCH_CHUNK_ROWS):
+            part = items[start:start + BATCH_CHUNK_ROWS]
+            if len(part) <= ASYNC_INLINE_MAX_ROWS:
+                names, P = ENSEMBLE.score(bundle, part)
+            else:
+                names, P = await run_scoring(ENSEMBLE.score, bundle, part)
+            parts.append(P)
+        P = parts[0] if len(parts) == 1 else np.vstack(parts)
+        if len(items) <= ASYNC_INLINE_MAX_ROWS:
+            return _ensemble_response(items, bundle, names, P, members)
+        return await run_scoring(_ensemble_response, items, bundle, names, P, members)
+    except Exception as e:
+        METRICS.count_error(type(e).__name__)
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.post("/predict-ensemble", dependencies=[Depends(validation_clock)])
+async def predict_ensemble(request: Request, payload: BatchRequest, members: bool = False):
+    """
+    Média das probabilidades dos membros do ensemble (ENSEMBLE_DIR + modelo ativo)
+    e a dispersão entre eles. `?members=true` inclui a matriz por membro.
+    """
+    observe_validation(request)
+    if ENSEMBLE is None:
+        raise HTTPException(status_code=503, detail="Ensemble desligado: ENSEMBLE_DIR sem membros.")
+    return Response(await _ensemble_many(payload.items, members), media_type="application/json")
+
+
+# ------------------------------------------------------------------------------
+# Vetores pré-codificados em binário (chamadores internos de alto volume)
+# ------------------------------------------------------------------------------
+# Corpo: cabeçalho de 24 bytes + matriz (n, n_features) little-endian, linha a linha,
+# nas colunas/ordem do X_train.csv, sem escala (o scaler é aplicado aqui).
+#   magic "HRTV" | uint8 versão (1) | uint8 bytes por valor (4 = float32, 8 = float64)
+#   | uint16 n_features | uint32 n linhas | 8 bytes schema_hash(colunas) | 4 bytes zerados
+# Resposta: n probabilidades da classe positiva no mesmo dtype, sem cabeçalho.
+VECTOR_MAGIC = b"HRTV"
+VECTOR_HEADER = struct.Struct("<4sBBHI8s4x")
+VECTOR_DTYPES = MappingProxyType({4: np.dtype("<f4"), 8: np.dtype("<f8")})
+
+
+def pack_vectors(X: np.ndarray, columns: List[str]) -> bytes:
+    """Monta o corpo do /predict-vector (lado do cliente; float32 ou float64)."""
+    X = np.ascontiguousarray(X, dtype=np.dtype(X.dtype).newbyteorder("<"))
+    header = VECTOR_HEADER.pack(VECTOR_MAGIC, 1, X.dtype.itemsize, X.shape[1], X.shape[0], schema_hash(columns))
+    return header + X.tobytes()
+
+
+def parse_vectors(body: bytes, bundle: ModelBundle) -> np.ndarray:
+    """Valida o cabeçalho e devolve a matriz como view do corpo (np.frombuffer, sem cópia)."""
+    if len(body) < VECTOR_HEADER.size:
+        raise HTTPException(status_code=400, detail="Corpo menor que o cabeçalho (24 bytes).")
+    magic, version, itemsize, n_features, n_rows, digest = VECTOR_HEADER.unpack_from(body)
+    if magic != VECTOR_MAGIC or version != 1:
+        raise HTTPException(status_code=400, detail="Cabeçalho inválido (magic 'HRTV', versão 1).")
+    if digest != bundle.schema_hash or n_features != bundle.encoder.n_features:
+        raise HTTPException(status_code=409, detail=(
+            f"Esquema de colunas diferente do modelo {bundle.version} "
+            f"(esperado {bundle.schema_hash.hex()}, recebido {digest.hex()}); consulte GET /schema."
+        ))
+    dtype = VECTOR_DTYPES.get(itemsize)
+    if dtype is None:
+        raise HTTPException(status_code=400, detail="Tipo não suportado: use float32 (4) ou float64 (8).")
+    expected = VECTOR_HEADER.size + n_rows * n_features * itemsize
+    if len(body) != expected:
+        raise HTTPException(status_code=400, detail=f"Corpo com {len(body)} bytes; o cabeçalho indica {expected}.")
+    X = np.frombuffer(body, dtype=dtype, count=n_rows * n_features, offset=VECTOR_HEADER.size)
+    X = X.reshape(n_rows, n_features)
+    if not np.isfinite(X).all():
+        raise HTTPException(status_code=422, detail="Valores NaN/infinitos no vetor.")
+    return X
+
+
+@app.get("/schema")
+def vector_schema():
+    """Colunas esperadas pelo modelo ativo e o layout binário do /predict-vector."""
+    bundle = REGISTRY.active
+    return {
+        "model_version": bundle.version,
+        "columns": bundle.encoder.columns,
+        "n_features": bundle.encoder.n_features,
+        "schema_hash": bundle.schema_hash.hex(),
+        "header_format": VECTOR_HEADER.format,
+        "header_bytes": VECTOR_HEADER.size,
+        "magic": VECTOR_MAGIC.decode(),
+        "dtypes": {str(k): v.name for k, v in VECTOR_DTYPES.items()},
+    }
+
+
+@app.post("/predict-vector")
+async def predict_vector(request: Request):
+    """
+    Escore de vetores já codificados (ordem do X_train.csv, sem escala): sem JSON,
+    Pydantic nem encoder. Não há paciente para auditar; sombra e drift recebem a matriz.
+    """
+    bundle = REGISTRY.active
+    started = time.perf_counter()
+    X = parse_vectors(await request.body(), bundle)
+    METRICS.observe_stage("decode", time.perf_counter() - started)
+    check_batch_rows(len(X))
+    METRICS.observe_rows(len(X))
+    try:
+        if len(X) <= ASYNC_INLINE_MAX_ROWS:
+            preds, probas = bundle.score_encoded(X)
+        else:
+            preds, probas = await run_scoring(bundle.score_encoded, X)
+    except Exception as e:
+        METRICS.count_error(type(e).__name__)
+        raise HTTPException(status_code=400, detail=str(e))
+    return Response(
+        probas.astype(X.dtype, copy=False).tobytes(),
+        media_type="application/octet-stream",
+        headers={"X-Model-Version": bundle.version, "X-Schema-Hash": bundle.schema_hash.hex(), "X-Rows": str(len(X))},
+    )
+
+
+# ------------------------------------------------------------------------------
+# Lotes colunares: validação vetorizada com sucesso parcial por linha
+# ------------------------------------------------------------------------------
+# O caminho rápido só aceita o que sabe decidir exatamente como o Patient: números
+# (int/float) dentro de NUMERIC_RANGES e categorias/sinônimos dos tipos abaixo, que
+# passam pelos próprios validadores do Patient uma vez por valor distinto. Qualquer
+# outra linha (strings numéricas, bool, nulos, fora da faixa, campo ausente) é
+# validada pelo Patient, linha a linha: mesmo resultado e mesma mensagem de erro.
+COLUMNAR_INT_FIELDS = ("Age", "MaxHR")                  # anotados como int no Patient
+COLUMNAR_FLOAT_FIELDS = ("RestingBP", "Cholesterol", "Oldpeak")
+COLUMNAR_LOOKUPS = {
+    # campo: (validador do Patient, tipos aceitos no caminho rápido)
+    "Sex": (Patient.norm_sex, (str,)),
+    "ChestPainType": (Patient.norm_cpt, (str,)),
+    "RestingECG": (Patient.norm_ecg, (str,)),
+    "ST_Slope": (Patient.norm_slope, (str,)),
+    "FastingBS": (Patient.norm_fbs, (str, int)),
+    "ExerciseAngina": (Patient.norm_exang1, (str, int, type(None))),
+    "Exang": (Patient.norm_exang2, (str, int, type(None))),
+    "Thal": (Patient.norm_thal, (str, int, type(None))),
+}
+COLUMNAR_OPTIONAL = ("ExerciseAngina", "Exang", "Thal")
+_MISSING = object()
+
+# Linha canônica leve (mesmos atributos lidos por canonical_key) para a auditoria
+CanonicalRow = namedtuple("CanonicalRow", CANONICAL_FIELDS)
+
+
+def _type_mask(values, allowed) -> np.ndarray:
+    """Linhas cujo tipo está em `allowed`; colunas homogêneas (o caso comum) saem sem laço por linha."""
+    if set(map(type, values)) <= set(allowed):
+        return np.ones(len(values), dtype=bool)
+    return np.fromiter((t in allowed for t in map(type, values)), dtype=bool, count=len(values))
+
+
+def _float_or_nan(value) -> float:
+    try:
+        return float(value)
+    except (OverflowError, TypeError):
+        return math.nan
+
+
+def _numeric_column(values, field: str):
+    """(valores float64, máscara do caminho rápido) de uma coluna numérica."""
+    ok = _type_mask(values, (int,) if field in COLUMNAR_INT_FIELDS else (int, float))
+    try:
+        if ok.all():
+            arr = np.array(values, dtype=np.float64)
+        else:
+            arr = np.full(len(values), np.nan)
+            idx = np.flatnonzero(ok)
+            arr[idx] = [values[i] for i in idx.tolist()]
+    except (OverflowError, TypeError):
+        # Inteiro além do float64 (ex.: 10**400): NaN manda só essa linha ao Patient
+        arr = np.fromiter((_float_or_nan(v) if good else np.nan for v, good in zip(values, ok.tolist())),
+                          dtype=np.float64, count=len(values))
+    lo, hi = NUMERIC_RANGES[field]
+    ok &= (arr >= lo) & (arr <= hi)  # NaN cai fora
+    return arr, ok
+
+
+def _lookup_column(values, field: str):
+    """(valores canônicos, máscara) aplicando o validador do Patient uma vez por valor distinto."""
+    validator, allowed = COLUMNAR_LOOKUPS[field]
+    ok = _type_mask(values, allowed)
+    homogeneous = bool(ok.all())
+    mapping = {}
+    rejected = False
+    for v in dict.fromkeys(values if homogeneous else (v for v, good in zip(values, ok.tolist()) if good)):
+        try:
+            mapping[v] = validator(v)
+        except ValueError:
+            rejected = True
+    if homogeneous:
+        canon = list(map(mapping.get, values))
+    else:
+        canon = [mapping.get(v) if good else None for v, good in zip(values, ok.tolist())]
+    if rejected:
+        # Valores recusados pelo validador voltam ao Patient (que produz a mensagem)
+        ok &= np.fromiter((good and v in mapping for v, good in zip(values, ok.tolist())),
+                          dtype=bool, count=len(values))
+    return canon, ok
+
+
+def validate_columns(columns: Dict[str, list], n: int):
+    """
+    Valida um lote em colunas. Retorna (máscara do caminho rápido, colunas canônicas);
+    linhas fora da máscara devem passar pelo Patient.
+    """
+    ok = np.ones(n, dtype=bool)
+    canon: Dict[str, Any] = {}
+    for field in COLUMNAR_INT_FIELDS + COLUMNAR_FLOAT_FIELDS:
+        if field not in columns:
+            # Coluna obrigatória ausente: todas as linhas vão ao Patient (que aponta o campo);
+            # o placeholder só mantém encode_columns definido para a seleção vazia
+            ok[:] = False
+            canon[field] = np.zeros(n, dtype=np.int64 if field in COLUMNAR_INT_FIELDS else np.float64)
+            continue
+        arr, good = _numeric_column(columns[field], field)
+        canon[field] = np.where(good, arr, 0).astype(np.int64) if field in COLUMNAR_INT_FIELDS else arr
+        ok &= good
+    for field in COLUMNAR_LOOKUPS:
+        if field not in columns:
+            if field not in COLUMNAR_OPTIONAL:
+                ok[:] = False
+            canon[field] = [None] * n
+            continue
+        canon[field], good = _lookup_column(columns[field], field)
+        ok &= good
+    # combine_exang: ExerciseAngina prevalece; senão Exang (1 -> 'Y'); senão 'N'
+    canon["ExerciseAngina"] = [
+        a if a is not None else ("Y" if e is not None and int(e) == 1 else "N")
+        for a, e in zip(canon["ExerciseAngina"], canon["Exang"])
+    ]
+    return ok, canon
+
+
+def encode_columns(encoder: FeatureEncoder, canon: Dict[str, Any], rows: np.ndarray) -> np.ndarray:
+    """Codifica as linhas `rows` das colunas canônicas direto na matriz (sem objetos Patient)."""
+    X = np.zeros((len(rows), encoder.n_features), dtype=np.float64)
+    for field, idx in encoder.numeric:
+        X[:, idx] = np.asarray(canon[field], dtype=np.float64)[rows]
+    for field, levels in encoder.onehot.items():
+        values = np.asarray(canon[field], dtype=object)[rows]
+        for level, idx in levels.items():
+            X[:, idx] = values == level
+    return X
+
+
+class ColumnarRequest(BaseModel):
+    columns: Optional[Dict[str, Annotated[list, Field(max_length=_MAX_BATCH_ITEMS)]]] = None
+    items: Optional[List[Dict[str, Any]]] = Field(None, max_length=_MAX_BATCH_ITEMS)
+
+
+def score_columnar(columns: Optional[Dict[str, list]], items: Optional[List[dict]], bundle: ModelBundle):
+    """Valida (caminho rápido + Patient nas demais linhas), pontua as válidas e reporta erros por linha."""
+    if items is not None:
+        # Campo obrigatório ausente != null (o Patient distingue): o marcador manda a linha ao Patient.
+        # Opcionais ausentes equivalem a null (mesmo default None, sem validação).
+        n = len(items)
+        fields = set().union(*items) if items else set()
+        columns = {
+            f: [item.get(f) for item in items] if f in COLUMNAR_OPTIONAL else [item.get(f, _MISSING) for item in items]
+            for f in fields
+        }
+    else:
+        lengths = {len(v) for v in columns.values()}
+        if len(lengths) > 1:
+            raise HTTPException(status_code=400, detail="Todas as colunas devem ter o mesmo número de linhas.")
+        n = lengths.pop() if lengths else 0
+    check_batch_rows(n)
+    METRICS.observe_rows(n)
+
+    started = time.perf_counter()
+    ok, canon = validate_columns(columns, n)
+    METRICS.observe_stage("validate_columnar", time.perf_counter() - started)
+    fast = np.flatnonzero(ok)
+    slow_patients, slow_rows, errors = [], [], []
+    started = time.perf_counter()
+    for i in np.flatnonzero(~ok).tolist():
+        record = items[i] if items is not None else {f: col[i] for f, col in columns.items()}
+        try:
+            slow_patients.append(Patient.model_validate(record))
+            slow_rows.append(i)
+        except ValidationError as e:
+            errors.append({"row": i, "error": _format_validation_error(e)})
+    if len(fast) < n:
+        METRICS.observe_stage("validate", time.perf_counter() - started)
+
+    started = time.perf_counter()
+    rows = np.concatenate([fast, np.asarray(slow_rows, dtype=np.intp)])
+    X = np.empty((len(rows), bundle.encoder.n_features))
+    X[:len(fast)] = encode_columns(bundle.encoder, canon, fast)
+    if slow_patients:
+        X[len(fast):] = bundle.encoder.encode(slow_patients)
+    METRICS.observe_stage("encode", time.perf_counter() - started)
+
+    predictions, labels, probabilities = [None] * n, [None] * n, [None] * n
+    if len(rows):
+        preds, probas = bundle.score_encoded(X)
+        if AUDIT is not None:
+            plain = [canon[f].tolist() if isinstance(canon[f], np.ndarray) else canon[f] for f in CANONICAL_FIELDS]
+            audit_rows = [CanonicalRow._make(col[i] for col in plain) for i in fast.tolist()]
+            AUDIT.record(audit_rows + slow_patients, preds, probas, bundle.version)
+        for i, pred, proba in zip(rows.tolist(), preds.tolist(), probas.tolist()):
+            predictions[i] = pred
+            labels[i] = "ALTO_RISCO" if pred == 1 else "BAIXO_RISCO"
+            probabilities[i] = proba
+    if errors:
+        METRICS.count_error("validation")
+    return {
+        "predictions": predictions,
+        "labels": labels,
+        "probabilities_positive": probabilities,
+        "errors": errors,
+        "rows": n,
+        "scored": int(len(rows)),
+        "fast_path_rows": int(len(fast)),
+        "model_version": bundle.version,
+    }
+
+
+@app.post("/predict-columnar")
+async def predict_columnar(payload: ColumnarRequest):
+    """
+    Lote em colunas (`{"columns": {"Age": [...], ...}}`) ou em linhas (`{"items": [...]}`)
+    com sucesso parcial: linhas válidas são pontuadas, as demais voltam em `errors`
+    (`{"row", "error"}`) com `null` nas listas de resultado.
+    """
+    if (payload.columns is None) == (payload.items is None):
+        raise HTTPException(status_code=400, detail="Informe `columns` ou `items` (apenas um dos dois).")
+    bundle = REGISTRY.active
+    n = len(payload.items) if payload.items is not None else max(map(len, payload.columns.values()), default=0)
+    try:
+        if n <= ASYNC_INLINE_MAX_ROWS:
+            out = score_columnar(payload.columns, payload.items, bundle)
+        else:
+            out = await run_scoring(score_columnar, payload.columns, payload.items, bundle)
+    except HTTPException:
+        raise
+    except Exception as e:
+        METRICS.count_error(type(e).__name__)
+        raise HTTPException(status_code=400, detail=str(e))
+    return Response(dumps_json(out), media_type="application/json")
+
+
+# ------------------------------------------------------------------------------
+# Endpoint de debug para inspecionar o vetor alinhado/escalado
+# ------------------------------------------------------------------------------
+@app.post("/debug-vector")
+async def debug_vector(patient: Patient):
+    bundle = REGISTRY.active
+    try:
+        x_scaled, cols = encode_align_scale([patient], bundle)
+        # Retorna apenas uma amostra (primeiros 12 valores) para não poluir
+        sample = x_scaled[0][:min(12, x_scaled.shape[1])].tolist()
+        return {
+            "n_features": len(cols),
+            "cols_sample": cols[:min(12, len(cols))],
+            "vector_sample": sample,
+            "feature_columns_source": bundle.feature_columns_source,
+            "model_version": bundle.version,
+        }
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+# ------------------------------------------------------------------------------
+# Sensibilidade what-if: risco ao longo de uma ou duas grades de valores
+# ------------------------------------------------------------------------------
+# Campos contínuos: grade numérica (start/stop/steps ou values), validada nos extremos
+# (os validadores são checagens de faixa). Demais campos usados pelo modelo
+# (categóricos, FastingBS) aceitam `values`, cada um validado e normalizado pelo Patient.
+SWEEP_RANGE_FIELDS = ("Age", "RestingBP", "Cholesterol", "MaxHR", "Oldpeak")
+
+
+class SweepAxis(BaseModel):
+    feature: str
+    values: Optional[List[float | int | str]] = Field(None, min_length=1)
+    start: Optional[float] = None
+    stop: Optional[float] = None
+    steps: int = Field(25, ge=1, le=SWEEP_MAX_POINTS)
+
+
+class SweepRequest(BaseModel):
+    patient: Patient
+    grid: List[SweepAxis] = Field(..., min_length=1, max_length=2)
+
+
+def _sweep_variant(patient: Patient, field: str, value) -> Patient:
+    """Paciente com `field` trocado, passando de novo pelos validadores (422 se inválido)."""
+    try:
+        return Patient.model_validate({**patient.model_dump(), field: value})
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=f"Grade inválida: {_format_validation_error(e)}")
+
+
+def _sweep_axis(bundle, patient: Patient, axis: SweepAxis):
+    """Resolve um eixo em (colunas, tabela de valores das colunas, rótulos da grade)."""
+    field = axis.feature
+    cols = bundle.encoder.field_columns(field)
+    if not cols:
+        raise HTTPException(status_code=422, detail=f"Campo '{field}' não é usado pelo modelo {bundle.version}.")
+    if field in SWEEP_RANGE_FIELDS:
+        if axis.values is not None:
+            try:
+                values = np.asarray([_to_float(v) for v in axis.values], dtype=np.float64)
+            except ValueError:
+                raise HTTPException(status_code=422, detail=f"grid.{field}: valores devem ser numéricos.")
+        elif axis.start is not None and axis.stop is not None:
+            values = np.linspace(axis.start, axis.stop, axis.steps)
+        else:
+            raise HTTPException(status_code=422, detail=f"grid.{field}: informe `values` ou `start`/`stop`.")
+        if Patient.model_fields[field].annotation is int:
+            # Age/MaxHR são inteiros no Patient
+            values = np.unique(np.round(values))
+            _sweep_variant(patient, field, int(values[0]))
+            _sweep_variant(patient, field, int(values[-1]))
+            return cols, values[:, None], values.astype(int).tolist()
+        _sweep_variant(patient, field, float(values.min()))
+        _sweep_variant(patient, field, float(values.max()))
+        return cols, values[:, None], values.tolist()
+    if axis.values is None:
+        raise HTTPException(status_code=422, detail=f"grid.{field}: campo discreto, informe `values`.")
+    variants = [_sweep_variant(patient, field, v) for v in axis.values]
+    table = bundle.encoder.encode(variants)[:, cols]
+    return cols, table, [getattr(p, field) for p in variants]
+
+
+@app.post("/predict-sweep")
+async def predict_sweep(payload: SweepRequest):
+    """
+    Probabilidade do paciente ao variar um campo (curva) ou dois (superfície).
+    `probabilities[i][j]` corresponde a `values[0][i]` e `values[1][j]`.
+    """
+    bundle = REGISTRY.active
+    features = [axis.feature for axis in payload.grid]
+    if len(set(features)) != len(features):
+        raise HTTPException(status_code=422, detail="Cada campo pode aparecer uma única vez em `grid`.")
+    resolved = [_sweep_axis(bundle, payload.patient, axis) for axis in payload.grid]
+    points = math.prod(len(labels) for _, _, labels in resolved)
+    if points > SWEEP_MAX_POINTS:
+        raise HTTPException(status_code=422, detail=f"Grade com {points} pontos; o máximo é {SWEEP_MAX_POINTS}.")
+    try:
+        axes = [(cols, table) for cols, table, _ in resolved]
+        if points <= ASYNC_INLINE_MAX_ROWS:
+            probas, base = bundle.sweep(payload.patient, axes)
+        else:
+            probas, base = await run_scoring(bundle.sweep, payload.patient, axes)
+    except Exception as e:
+        METRICS.count_error(type(e).__name__)
+        raise HTTPException(status_code=400, detail=str(e))
+    # Serializado direto (orjson aceita a matriz NumPy), sem jsonable_encoder por ponto
+    return Response(dumps_json({
+        "features": features,
+        "values": [labels for _, _, labels in resolved],
+        "probabilities": probas,
+        "base_probability": base,
+        "points": points,
+        "model_version": bundle.version,
+    }), media_type="application/json")
+
+
+# ------------------------------------------------------------------------------
+# Registro de modelos: consulta, recarga e rollback
+# ------------------------------------------------------------------------------
+@app.get("/models")
+def list_models():
+    return REGISTRY.describe()
+
+
+@app.get("/drift")
+def drift_report():
+    """Desvio das entradas recebidas em relação ao treino (PSI por campo, deslocamento em DPs)."""
+    return DRIFT.report() if DRIFT is not None else {"enabled": False}
+
+
+@app.get("/audit")
+def audit_query(since: Optional[str] = None, until: Optional[str] = None,
+                model_version: Optional[str] = None, limit: int = Query(100, ge=1, le=10000)):
+    """
+    Predições gravadas no intervalo [since, until) (epoch em segundos ou ISO 8601),
+    mais recentes primeiro. Sem `since`, última hora.
+    """
+    if AUDIT is None:
+        raise HTTPException(status_code=404, detail="Auditoria desativada (defina AUDIT_BACKEND).")
+    try:
+        end = _parse_instant(until) if until else time.time()
+        start = _parse_instant(since) if since else end - 3600.0
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    rows = AUDIT.query(start, end, model_version, limit)
+    return {"since": start, "until": end, "count": len(rows), "predictions": rows, "log": AUDIT.stats()}
+
+
+def _parse_instant(value: str) -> float:
+    """Epoch em segundos ou ISO 8601 (sem fuso = UTC)."""
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        dt = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise ValueError(f"Instante inválido: {value!r} (use epoch ou ISO 8601).")
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=datetime.timezone.utc)
+    return dt.timestamp()
+
+
+@app.get("/shadow")
+def shadow_stats():
+    """Concordância e diferenças de probabilidade do modelo sombra em relação ao ativo."""
+    return SHADOW.stats() if SHADOW is not None else {"enabled": False}
+
+
+def require_admin(request: Request) -> None:
+    """
+    Rotas que mudam o modelo em produção exigem `X-Admin-Token` igual a
+    ADMIN_TOKEN. Sem ADMIN_TOKEN configurado, respondem 404 (desligadas).
+    """
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not hmac.compare_digest(request.headers.get("x-admin-token", ""), ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Token de administração inválido.")
+
+
+@app.post("/models/reload", dependencies=[Depends(require_admin)])
+async def reload_model():
+    """Carrega e valida MODEL_PATH/SCALER_PATH agora (sem esperar o watcher) e ativa se passar."""
+    try:
+        bundle = await run_scoring(REGISTRY.load)
+    except Exception as e:
+        raise HTTPException(status_code=409, detail=f"Nova versão rejeitada: {e}")
+    return {"active": bundle.version, "validation": bundle.validation}
+
+
+@app.post("/models/{version}/activate", dependencies=[Depends(require_admin)])
+def activate_model(version: str):
+    try:
+        bundle = REGISTRY.activate(version)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Versão {version} não está carregada.")
+    return {"active": bundle.version}
+
+
+# ------------------------------------------------------------------------------
+# Escore em streaming (NDJSON/CSV no layout do heart.csv)
+# ------------------------------------------------------------------------------
+def _format_validation_error(e: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(p) for p in err['loc']) or 'registro'}: {err['msg']}" for err in e.errors()
+    )
+
+
+def score_records(records, bundle=None):
+    """
+    Valida e pontua um bloco de registros [(índice, dict | mensagem de erro)].
+    Registros inválidos viram objetos de erro na própria linha; os válidos são
+    codificados e pontuados juntos em uma única chamada do kernel.
+    """
+    bundle = bundle or REGISTRY.active
+    results: List[Dict[str, Any]] = [None] * len(records)
+    valid, positions = [], []
+    started = time.perf_counter()
+    for i, (row, rec) in enumerate(records):
+        if isinstance(rec, str):
+            results[i] = {"row": row, "error": rec}
+            continue
+        try:
+            valid.append(Patient.model_validate(rec))
+            positions.append(i)
+        except ValidationError as e:
+            results[i] = {"row": row, "error": _format_validation_error(e)}
+    METRICS.observe_stage("validate", time.perf_counter() - started)
+
+    if valid:
+        preds, probas = bundle.score(valid)
+        if AUDIT is not None:
+            AUDIT.record(valid, preds, probas, bundle.version)
+        for i, pred, proba in zip(positions, preds.tolist(), probas.tolist()):
+            results[i] = {
+                "row": records[i][0],
+                "prediction": pred,
+                "label": "ALTO_RISCO" if pred == 1 else "BAIXO_RISCO",
+                "probability_positive": proba,
+                "model_version": bundle.version,
+            }
+    return results
+
+
+async def _iter_lines(stream):
+    """Divide o corpo em linhas à medida que chega, sem acumular o upload inteiro."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buf = ""
+    async for chunk in stream:
+        buf += decoder.decode(chunk)
+        *lines, buf = buf.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    buf += decoder.decode(b"", final=True)
+    if buf.strip():
+        yield buf.rstrip("\r")
+
+
+def parse_csv_record(header: List[str], values: List[str]):
+    """Linha CSV (layout do heart.csv) -> dict do registro, ou mensagem de erro."""
+    if len(values) != len(header):
+        return f"CSV: esperado {len(header)} campos, recebido {len(values)}."
+    # Células vazias = campo ausente (ex.: Thal opcional)
+    return {k: v for k, v in zip(header, values) if v.strip() != ""}
+
+
+async def _iter_records(request: Request):
+    """Gera (índice, registro) a partir de NDJSON (padrão) ou CSV com cabeçalho."""
+    is_csv = "csv" in request.headers.get("content-type", "")
+    header = None
+    row = 0
+    async for line in _iter_lines(request.stream()):
+        if not line.strip():
+            continue
+        if is_csv:
+            values = next(csv.reader([line]))
+            if header is None:
+                header = [h.strip() for h in values]
+                continue
+            rec = parse_csv_record(header, values)
+        else:
+            try:
+                rec = json.loads(line)
+                if not isinstance(rec, dict):
+                    rec = "NDJSON: cada linha deve ser um objeto JSON."
+            except json.JSONDecodeError as e:
+                rec = f"NDJSON inválido: {e.msg}."
+        yield row, rec
+        row += 1
+
+
+class _DuplexStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse sem o listener de desconexão concorrente: aqui o corpo da
+    requisição é lido pelo próprio gerador (request.stream()) enquanto a resposta
+    é enviada, e um segundo consumidor de receive() roubaria blocos do upload.
+    Uma desconexão do cliente interrompe a leitura com ClientDisconnect.
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+@app.post("/predict-stream")
+async def predict_stream(request: Request):
+    """
+    Recebe NDJSON (application/x-ndjson) ou CSV (text/csv, layout do heart.csv)
+    em streaming e devolve NDJSON, um resultado por linha, processando blocos de
+    STREAM_CHUNK_ROWS linhas. Erros de linha são reportados na própria linha.
+    """
+    async def results():
+        counts = {"rows": 0, "scored": 0, "errors": 0}
+
+        async def flush(chunk):
+            out = await run_scoring(score_records, chunk)
+            errors = sum(1 for r in out if "error" in r)
+            METRICS.observe_rows(len(out))
+            if errors:
+                METRICS.count_error("invalid_row")
+            counts["rows"] += len(out)
+            counts["errors"] += errors
+            counts["scored"] += len(out) - errors
+            return "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in out)
+
+        chunk = []
+        async for item in _iter_records(request):
+            chunk.append(item)
+            if len(chunk) >= STREAM_CHUNK_ROWS:
+                yield await flush(chunk)
+                chunk = []
+        if chunk:
+            yield await flush(chunk)
+        yield json.dumps({"summary": counts}) + "\n"
+
+    return _DuplexStreamingResponse(results(), media_type="application/x-ndjson")
+
+
+# ------------------------------------------------------------------------------
+# Profiler por amostragem sob demanda (admin)
+# ------------------------------------------------------------------------------
+class SamplingProfiler:
+    """
+    Amostra as pilhas de todas as threads (sys._current_frames) a cada `interval_s`
+    durante uma sessão e agrega no formato "collapsed" (thread;f1;f2;... contagem),
+    pronto para flamegraph.pl, inferno ou speedscope. Só entram pilhas que estão
+    executando código da API (este módulo, FastAPI ou Starlette): event loop e
+    executores ociosos não poluem o perfil. As threads de serviço do próprio módulo
+    (SERVICE_THREADS) ficam de fora: passam a vida paradas dentro de código da API e
+    só somariam amostras ociosas; as threads "scoring" do executor continuam entrando.
+    Fora de uma sessão não há thread nem gancho ativo; o middleware só consulta
+    `self._session`.
+    """
+
+    SERVICE_THREADS = frozenset({"profiler", "model-watcher", "microbatcher", "shadow-scorer", "audit-writer"})
+
+    def __init__(self, interval_s: float, max_seconds: float):
+        self.interval_s = max(0.001, interval_s)
+        self.max_seconds = max_seconds
+        self._lock = threading.Lock()
+        self._session: Optional[Dict[str, Any]] = None
+        self._packages = (os.sep + "fastapi" + os.sep, os.sep + "starlette" + os.sep)
+
+    def start(self, seconds: float, requests: int) -> Future:
+        """Inicia uma sessão (até `seconds` ou `requests` requisições de predição)."""
+        with self._lock:
+            if self._session is not None:
+                raise RuntimeError("Já existe uma sessão de profiling em andamento.")
+            done: Future = Future()
+            self._session = {
+                "deadline": time.monotonic() + min(seconds, self.max_seconds),
+                "requests_target": requests,
+                "requests": 0,
+                "stop": threading.Event(),
+                "done": done,
+            }
+            threading.Thread(target=self._run, args=(self._session,), name="profiler", daemon=True).start()
+        return done
+
+    def request_done(self) -> None:
+        session = self._session
+        if session is None:
+            return
+        session["requests"] += 1
+        if session["requests_target"] and session["requests"] >= session["requests_target"]:
+            session["stop"].set()
+
+    def _is_api_code(self, code) -> bool:
+        filename = code.co_filename
+        return filename == __file__ or any(p in filename for p in self._packages)
+
+    def _label(self, code) -> str:
+        return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+    def _run(self, session) -> None:
+        own = threading.get_ident()
+        counts: Dict[str, int] = {}
+        samples = 0
+        started = time.monotonic()
+        try:
+            while not session["stop"].is_set() and time.monotonic() < session["deadline"]:
+                names = {t.ident: t.name for t in threading.enumerate()}
+                for ident, frame in sys._current_frames().items():
+                    if ident == own or names.get(ident) in self.SERVICE_THREADS:
+                        continue
+                    codes = []
+                    while frame is not None:
+                        codes.append(frame.f_code)
+                        frame = frame.f_back
+                    if not any(map(self._is_api_code, codes)):
+                        continue
+                    key = ";".join([names.get(ident, str(ident))] + [self._label(c) for c in reversed(codes)])
+                    counts[key] = counts.get(key, 0) + 1
+                    samples += 1
+                session["stop"].wait(self.interval_s)
+        finally:
+            with self._lock:
+                self._session = None
+            session["done"].set_result({
+                "collapsed": "".join(f"{stack} {n}\n" for stack, n in sorted(counts.items())),
+                "samples": samples,
+                "requests": session["requests"],
+                "seconds": time.monotonic() - started,
+            })
+
+
+PROFILER = SamplingProfiler(PROFILER_INTERVAL_MS / 1000.0, PROFILER_MAX_SECONDS) if PROFILER_TOKEN else None
+
+
+@app.post("/admin/profile", response_class=PlainTextResponse)
+async def admin_profile(request: Request, seconds: float = Query(10.0, gt=0), requests: int = Query(0, ge=0)):
+    """
+    Perfila a API pelas próximas `requests` requisições de predição (0 = sem limite)
+    ou `seconds` segundos, o que vier primeiro, e devolve as pilhas no formato
+    collapsed. Exige o cabeçalho `X-Admin-Token` igual a PROFILER_TOKEN.
+    """
+    if PROFILER is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not hmac.compare_digest(request.headers.get("x-admin-token", ""), PROFILER_TOKEN):
+        raise HTTPException(status_code=403, detail="Token de administração inválido.")
+    try:
+        done = PROFILER.start(seconds, requests)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    result = await asyncio.wrap_future(done)
+    return PlainTextResponse(result["collapsed"], headers={
+        "X-Profile-Samples": str(result["samples"]),
+        "X-Profile-Requests": str(result["requests"]),
+        "X-Profile-Seconds": f"{result['seconds']:.3f}",
+    })
@@ -0,0 +1,134 @@
+# loadtest.py - Carga reprodutível contra a API (in-process via ASGI ou uvicorn local)
+# Execução (a partir de api-model-heart/):
+#   python bench/loadtest.py --in-process --endpoint /predict --concurrency 64 --requests 5000
+#   python bench/loadtest.py --url http://127.0.0.1:8000 --endpoint /predict-batch --batch-size 100
+# Requer httpx (pip install httpx).
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+# Pacientes sintéticos válidos (mesmos valores para a mesma --seed)
+CATEGORIES = {
+    "Sex": ["M", "F"],
+    "ChestPainType": ["ASY", "ATA", "NAP", "TA"],
+    "RestingECG": ["Normal", "ST", "LVH"],
+    "ExerciseAngina": ["Y", "N"],
+    "ST_Slope": ["Up", "Flat", "Down"],
+}
+
+
+def synthetic_patients(n: int, seed: int):
+    rng = random.Random(seed)
+    patients = []
+    for _ in range(n):
+        p = {k: rng.choice(v) for k, v in CATEGORIES.items()}
+        p.update({
+            "Age": rng.randint(28, 77),
+            "RestingBP": rng.randint(90, 200),
+            "Cholesterol": rng.randint(120, 560),
+            "FastingBS": rng.randint(0, 1),
+            "MaxHR": rng.randint(60, 202),
+            "Oldpeak": round(rng.uniform(0.0, 6.0), 1),
+        })
+        patients.append(p)
+    return patients
+
+
+def build_bodies(endpoint: str, n_requests: int, batch_size: int, seed: int):
+    pool = synthetic_patients(max(batch_size, 512), seed)
+    rng = random.Random(seed + 1)
+    if endpoint == "/predict-batch":
+        return [{"items": rng.sample(pool, batch_size)} for _ in range(n_requests)]
+    return [rng.choice(pool) for _ in range(n_requests)]
+
+
+def percentile(sorted_values, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, int(round(q / 100.0 * (len(sorted_values) - 1)))))
+    return sorted_values[idx]
+
+
+async def run_load(client, endpoint: str, bodies, concurrency: int):
+    """Dispara `bodies` com no máximo `concurrency` requisições em voo; retorna latências e falhas."""
+    latencies, failures = [], 0
+    it = iter(bodies)
+
+    async def worker():
+        nonlocal failures
+        for body in it:
+            t0 = time.perf_counter()
+            resp = await client.post(endpoint, json=body)
+            latencies.append(time.perf_counter() - t0)
+            if resp.status_code != 200:
+                failures += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, failures, time.perf_counter() - started
+
+
+def summarize(latencies, failures: int, elapsed: float, rows_per_request: int):
+    lat = sorted(latencies)
+    n = len(lat)
+    return {
+        "requests": n,
+        "failures": failures,
+        "elapsed_s": elapsed,
+        "requests_per_s": n / elapsed if elapsed else 0.0,
+        "rows_per_s": n * rows_per_request / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(lat, 50) * 1000.0,
+        "p95_ms": percentile(lat, 95) * 1000.0,
+        "p99_ms": percentile(lat, 99) * 1000.0,
+    }
+
+
+def make_client(url: str, in_process: bool, app_dir: str):
+    import httpx
+
+    if in_process:
+        # Artefatos (.pkl/.csv) são resolvidos relativos ao diretório do app
+        os.chdir(app_dir)
+        sys.path.insert(0, app_dir)
+        from api import app
+
+        return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://api", timeout=60)
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    return httpx.AsyncClient(base_url=url, timeout=60, limits=limits)
+
+
+async def main_async(args):
+    bodies = build_bodies(args.endpoint, args.requests, args.batch_size, args.seed)
+    rows = args.batch_size if args.endpoint == "/predict-batch" else 1
+    async with make_client(args.url, args.in_process, os.path.abspath(args.app_dir)) as client:
+        # Aquecimento (caches de import/JIT do event loop, conexões keep-alive)
+        await run_load(client, args.endpoint, bodies[: min(len(bodies), args.concurrency * 2)], args.concurrency)
+        latencies, failures, elapsed = await run_load(client, args.endpoint, bodies, args.concurrency)
+    return summarize(latencies, failures, elapsed, rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga reprodutível da API de predição.")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="URL base de um uvicorn já em execução")
+    parser.add_argument("--in-process", action="store_true", help="Usa o app via ASGI no mesmo processo")
+    parser.add_argument("--app-dir", default=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        help="Diretório com api.py e artefatos (modo --in-process); permite comparar versões")
+    parser.add_argument("--endpoint", default="/predict", choices=["/predict", "/predict-batch", "/debug-vector"])
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    result = asyncio.run(main_async(args))
+    print(f"{args.endpoint}  concurrency={args.concurrency}  requests={result['requests']}  failures={result['failures']}")
+    print(f"  {result['requests_per_s']:.1f} req/s  ({result['rows_per_s']:.1f} linhas/s)")
+    print(f"  p50={result['p50_ms']:.2f} ms  p95={result['p95_ms']:.2f} ms  p99={result['p99_ms']:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
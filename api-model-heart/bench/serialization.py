@@ -0,0 +1,118 @@
+# serialization.py - Tamanho e custo de serialização das respostas (completa vs ?slim=true)
+# Execução (a partir de api-model-heart/):
+#   python bench/serialization.py --batch-sizes 1,100,1000
+# Mede, para /predict e /predict-batch:
+#   - bytes por resposta e tempo de serialização isolado (sem HTTP) de cada formato;
+#   - latência ponta a ponta via ASGI (in-process) da resposta completa vs slim.
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.chdir(APP_DIR)
+sys.path.insert(0, APP_DIR)
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+
+import api  # noqa: E402
+from loadtest import run_load, summarize, synthetic_patients  # noqa: E402
+
+
+def timeit(fn, repeat: int) -> float:
+    """Melhor média (µs por chamada) entre 5 rodadas de `repeat` chamadas."""
+    best = float("inf")
+    for _ in range(5):
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        best = min(best, (time.perf_counter() - t0) / repeat)
+    return best * 1e6
+
+
+def single_formats(patient):
+    """Formatos do /predict: o caminho padrão do FastAPI (response_model + json.dumps) e os slim."""
+    full = asyncio.run(api._predict_one(patient))
+    slim = {"prediction": full["prediction"], "probability_positive": full["probability_positive"]}
+    formats = {
+        "completo (response_model + json)": lambda: json.dumps(
+            jsonable_encoder(api.PredictResponse.model_validate(full))).encode(),
+        "slim json (stdlib)": lambda: json.dumps(slim, separators=(",", ":")).encode(),
+    }
+    if api.orjson is not None:
+        formats["slim orjson"] = lambda: api.orjson.dumps(slim)
+    if api.msgpack is not None:
+        formats["slim msgpack"] = lambda: api.msgpack.packb(slim)
+    return formats
+
+
+def batch_formats(patients):
+    bundle = api.REGISTRY.active
+    preds, probas = bundle.score(patients)
+    full = {
+        "predictions": preds.tolist(),
+        "labels": ["ALTO_RISCO" if p == 1 else "BAIXO_RISCO" for p in preds.tolist()],
+        "probabilities_positive": probas.tolist(),
+        "model_version": bundle.version,
+    }
+    slim = {"predictions": preds, "probabilities_positive": probas}
+    formats = {
+        "completo (jsonable_encoder + json)": lambda: json.dumps(jsonable_encoder(full)).encode(),
+        "slim json (stdlib)": lambda: json.dumps(api._plain(slim), separators=(",", ":")).encode(),
+    }
+    if api.orjson is not None:
+        formats["slim orjson (numpy direto)"] = lambda: api.orjson.dumps(slim, option=api.orjson.OPT_SERIALIZE_NUMPY)
+    if api.msgpack is not None:
+        formats["slim msgpack"] = lambda: api.msgpack.packb(api._plain(slim))
+    return formats
+
+
+def report(title, formats, repeat):
+    print(f"\n{title}")
+    for name, fn in formats.items():
+        print(f"  {name:38s} {len(fn()):8d} bytes  {timeit(fn, repeat):9.1f} µs")
+
+
+async def end_to_end(patients, batch_sizes, requests: int):
+    import httpx
+
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://api", timeout=60) as client:
+        print("\nPonta a ponta (ASGI in-process, concorrência 8)")
+        for batch_size in batch_sizes:
+            endpoint = "/predict" if batch_size == 1 else "/predict-batch"
+            if batch_size == 1:
+                bodies = [patients[i % len(patients)] for i in range(requests)]
+            else:
+                bodies = [{"items": patients[:batch_size]} for _ in range(max(16, requests // batch_size))]
+            for suffix in ("", "?slim=true"):
+                await run_load(client, endpoint + suffix, bodies[:16], 8)  # aquecimento
+                r = summarize(*await run_load(client, endpoint + suffix, bodies, 8), batch_size)
+                print(f"  {endpoint + suffix:28s} batch={batch_size:<5d} {r['requests_per_s']:8.1f} req/s  "
+                      f"p50={r['p50_ms']:.2f} ms  p99={r['p99_ms']:.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de serialização das respostas de predição.")
+    parser.add_argument("--batch-sizes", default="1,100,1000")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    batch_sizes = [int(b) for b in args.batch_sizes.split(",")]
+
+    raw = synthetic_patients(max(batch_sizes + [16]), args.seed)
+    patients = [api.Patient.model_validate(p) for p in raw]
+    print(f"orjson: {'sim' if api.orjson is not None else 'não'}  msgpack: {'sim' if api.msgpack is not None else 'não'}")
+    report("/predict (1 paciente)", single_formats(patients[0]), 2000)
+    for b in batch_sizes:
+        if b > 1:
+            report(f"/predict-batch ({b} pacientes)", batch_formats(patients[:b]), max(10, 20000 // b))
+    asyncio.run(end_to_end(raw, batch_sizes, args.requests))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+# startup.py - Mede o cold start da API: tempo de import + carga de artefatos (npz vs pickle)
+# Execução (a partir de api-model-heart/):
+#   python bench/startup.py --runs 5
+# Cada medição roda em um processo Python novo, como um worker recém-criado.
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Executado no processo filho: importa a API do zero e reporta os tempos
+PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+import api
+t1 = time.perf_counter()
+bundle = api.REGISTRY.active
+print(json.dumps({
+    "import_s": t1 - t0,
+    "artifact_load_s": bundle.load_seconds,
+    "artifact_format": bundle.artifact_format,
+    "heavy_modules": [m for m in ("pandas", "sklearn", "joblib") if m in sys.modules],
+}))
+"""
+
+
+def measure(env_overrides, runs: int):
+    env = dict(os.environ, PYTHONWARNINGS="ignore", MODEL_WATCH_INTERVAL="0", **env_overrides)
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", PROBE], cwd=APP_DIR, env=env, capture_output=True, text=True, check=True
+        )
+        samples.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return {
+        "artifact_format": samples[0]["artifact_format"],
+        "heavy_modules": samples[0]["heavy_modules"],
+        "import_s_median": statistics.median(s["import_s"] for s in samples),
+        "artifact_load_s_median": statistics.median(s["artifact_load_s"] for s in samples),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de cold start da API (npz vs pickle).")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    results = {
+        "npz": measure({}, args.runs),
+        # SERVING_ARTIFACT_PATH vazio força o fallback via joblib/pickle
+        "pickle": measure({"SERVING_ARTIFACT_PATH": ""}, args.runs),
+    }
+    for name, r in results.items():
+        print(
+            f"{name:7s} import total={r['import_s_median'] * 1000:.0f} ms  "
+            f"carga artefatos={r['artifact_load_s_median'] * 1000:.1f} ms  "
+            f"formato={r['artifact_format']}  módulos pesados={r['heavy_modules'] or '-'}"
+        )
+
+
+if __name__ == "__main__":
+    main()
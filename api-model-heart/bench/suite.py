@@ -0,0 +1,310 @@
+# suite.py - Suíte de benchmark/regressão: replays de payloads + variações sintéticas
+# Execução (a partir de api-model-heart/):
+#   python bench/suite.py --in-process --out bench-results.json
+#   python bench/suite.py --uvicorn --concurrency 1,16,64 --batch-sizes 1,10,100,1000
+#   python bench/suite.py --in-process --payloads ../requests.jsonl --compare base.json
+# Mede p50/p95/p99 e req/s de /predict e /predict-batch para cada combinação de
+# concorrência x tamanho de lote e grava um JSON estável (chaves ordenadas) para diff
+# entre commits. Requer httpx (e uvicorn no modo --uvicorn).
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from loadtest import make_client, run_load, summarize, synthetic_patients  # noqa: E402
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Cabeçalho do exemplos.txt (português) -> campo da API
+EXEMPLOS_FIELDS = {"Idade": "Age", "Sexo": "Sex"}
+NUMERIC_FIELDS = ("Age", "RestingBP", "Cholesterol", "FastingBS", "MaxHR", "Oldpeak")
+PATIENT_KEYS = {"Age", "Idade", "idade"}
+
+
+# ------------------------------------------------------------------------------
+# Fontes de payload
+# ------------------------------------------------------------------------------
+def load_exemplos(path: str):
+    """Lê as tabelas do exemplos.txt (colunas separadas por espaço; Thal pode ter duas palavras)."""
+    patients, header = [], None
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            tokens = line.split()
+            if not tokens:
+                continue
+            if tokens[0] == "#":
+                header = [EXEMPLOS_FIELDS.get(t, t) for t in tokens[1:]]
+                continue
+            if header is None or not tokens[0].isdigit():
+                continue
+            values = tokens[1:]
+            # O último campo (Thal) absorve o que sobrar: "Fixed defect", "Reversible defect"
+            values = values[: len(header) - 1] + [" ".join(values[len(header) - 1:])]
+            p = {}
+            for k, v in zip(header, values):
+                try:
+                    p[k] = float(v) if "." in v else int(v)
+                except ValueError:
+                    p[k] = v
+            patients.append(p)
+    return patients
+
+
+def load_payloads(path: str):
+    """
+    Lê um JSONL de payloads. Aceita pacientes (objetos com Age/Idade) e lotes
+    ({"items": [...]}); demais linhas (ex.: o backlog requests.jsonl) são ignoradas.
+    Retorna (pacientes, linhas_ignoradas).
+    """
+    patients, skipped = [], 0
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                obj = json.loads(line)
+            except json.JSONDecodeError:
+                skipped += 1
+                continue
+            if isinstance(obj, dict) and isinstance(obj.get("items"), list):
+                patients.extend(p for p in obj["items"] if isinstance(p, dict) and PATIENT_KEYS & p.keys())
+            elif isinstance(obj, dict) and PATIENT_KEYS & obj.keys():
+                patients.append(obj)
+            else:
+                skipped += 1
+    return patients, skipped
+
+
+def variants(base, n: int, seed: int):
+    """Variações sintéticas dos casos reais: pequenas perturbações nos campos numéricos."""
+    rng = random.Random(seed)
+    out = []
+    for _ in range(n):
+        p = dict(rng.choice(base))
+        for k in NUMERIC_FIELDS:
+            if k in p and k != "FastingBS":
+                v = float(p[k]) * rng.uniform(0.95, 1.05)
+                p[k] = round(v, 1) if k == "Oldpeak" else int(round(v))
+        out.append(p)
+    return out
+
+
+def build_pool(args):
+    """Casos reais (exemplos + JSONL) + variações + sintéticos, determinísticos por --seed."""
+    sources = {}
+    replay = []
+    if args.exemplos and os.path.exists(args.exemplos):
+        ex = load_exemplos(args.exemplos)
+        replay += ex
+        sources["exemplos"] = len(ex)
+    for path in args.payloads:
+        ps, skipped = load_payloads(path)
+        replay += ps
+        sources[os.path.basename(path)] = {"payloads": len(ps), "skipped_lines": skipped}
+    pool = list(replay)
+    if replay:
+        pool += variants(replay, args.variants, args.seed)
+    pool += synthetic_patients(args.synthetic, args.seed)
+    sources.update({"replayed": len(replay), "pool": len(pool)})
+    return pool, sources
+
+
+def bodies_for(pool, endpoint: str, batch_size: int, n_requests: int, seed: int):
+    rng = random.Random(seed)
+    if endpoint == "/predict-batch":
+        return [{"items": [rng.choice(pool) for _ in range(batch_size)]} for _ in range(n_requests)]
+    return [rng.choice(pool) for _ in range(n_requests)]
+
+
+# ------------------------------------------------------------------------------
+# Alvo: in-process (ASGI) ou uvicorn local
+# ------------------------------------------------------------------------------
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_uvicorn(app_dir: str, env_overrides, workers: int):
+    """Sobe `uvicorn api:app` em uma porta livre e espera o /health responder."""
+    import httpx
+
+    port = _free_port()
+    env = dict(os.environ, PYTHONWARNINGS="ignore", **env_overrides)
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=app_dir, env=env,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"uvicorn terminou com código {proc.returncode}.")
+        try:
+            if httpx.get(url + "/health", timeout=1).status_code == 200:
+                return proc, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("uvicorn não respondeu ao /health em 60 s.")
+
+
+# ------------------------------------------------------------------------------
+# Execução e comparação
+# ------------------------------------------------------------------------------
+def scenarios(args):
+    for endpoint in args.endpoints:
+        sizes = args.batch_sizes if endpoint == "/predict-batch" else [1]
+        for batch_size in sizes:
+            for concurrency in args.concurrency:
+                yield endpoint, batch_size, concurrency
+
+
+async def run_suite(client, pool, args):
+    results = []
+    for endpoint, batch_size, concurrency in scenarios(args):
+        # Mantém o total de linhas por cenário aproximadamente constante
+        n = max(concurrency * 2, args.rows // batch_size) if endpoint == "/predict-batch" else args.requests
+        bodies = bodies_for(pool, endpoint, batch_size, n, args.seed)
+        await run_load(client, endpoint, bodies[: min(len(bodies), concurrency * 2)], concurrency)  # aquecimento
+        latencies, failures, elapsed = await run_load(client, endpoint, bodies, concurrency)
+        r = summarize(latencies, failures, elapsed, batch_size)
+        r.update({"endpoint": endpoint, "batch_size": batch_size, "concurrency": concurrency})
+        results.append(r)
+        print(
+            f"{endpoint:15s} batch={batch_size:<5d} conc={concurrency:<4d} "
+            f"{r['requests_per_s']:9.1f} req/s {r['rows_per_s']:10.1f} linhas/s  "
+            f"p50={r['p50_ms']:.2f} p95={r['p95_ms']:.2f} p99={r['p99_ms']:.2f} ms  falhas={failures}",
+            flush=True,
+        )
+    return results
+
+
+def _scenario_key(r):
+    return f"{r['endpoint']} batch={r['batch_size']} conc={r['concurrency']}"
+
+
+def compare(baseline_path: str, report, max_regression: float) -> int:
+    """Compara com um JSON anterior; retorna o número de cenários que regrediram além do limite."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    base = {_scenario_key(r): r for r in baseline["results"]}
+    regressions = 0
+    print(f"\nComparação com {baseline_path} (limite {max_regression:.0%}):")
+    for key in ("target", "env", "cpus"):
+        if baseline["meta"].get(key) != report["meta"].get(key):
+            print(f"  aviso: '{key}' difere da execução base; os números não são comparáveis diretamente")
+    results = report["results"]
+    for r in results:
+        b = base.get(_scenario_key(r))
+        if b is None:
+            continue
+        rps = r["requests_per_s"] / b["requests_per_s"] - 1 if b["requests_per_s"] else 0.0
+        p99 = r["p99_ms"] / b["p99_ms"] - 1 if b["p99_ms"] else 0.0
+        bad = rps < -max_regression or p99 > max_regression
+        regressions += bad
+        print(f"  {'REGRESSÃO' if bad else 'ok':9s} {_scenario_key(r):35s} req/s {rps:+.1%}  p99 {p99:+.1%}")
+    return regressions
+
+
+def _git_commit(app_dir: str):
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=app_dir,
+                             capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _csv_ints(value: str):
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Suíte de benchmark/regressão da API de predição.")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--in-process", action="store_true", help="Usa o app via ASGI no mesmo processo (padrão)")
+    mode.add_argument("--uvicorn", action="store_true", help="Sobe um uvicorn local em porta livre")
+    mode.add_argument("--url", help="URL base de uma API já em execução")
+    parser.add_argument("--app-dir", default=APP_DIR, help="Diretório com api.py e artefatos")
+    parser.add_argument("--workers", type=int, default=1, help="Workers do uvicorn (modo --uvicorn)")
+    parser.add_argument("--env", action="append", default=[], metavar="CHAVE=VALOR",
+                        help="Variável de ambiente da API (ex.: PREDICTION_CACHE_SIZE=0); repetível")
+    parser.add_argument("--exemplos", default=os.path.join(APP_DIR, "exemplos.txt"))
+    parser.add_argument("--payloads", action="append", default=[], help="JSONL de payloads para replay; repetível")
+    parser.add_argument("--variants", type=int, default=500, help="Variações sintéticas dos casos reais")
+    parser.add_argument("--synthetic", type=int, default=500, help="Pacientes sintéticos adicionais")
+    parser.add_argument("--endpoints", default="/predict,/predict-batch")
+    parser.add_argument("--concurrency", type=_csv_ints, default=[1, 8, 32])
+    parser.add_argument("--batch-sizes", type=_csv_ints, default=[1, 10, 100, 1000])
+    parser.add_argument("--requests", type=int, default=2000, help="Requisições por cenário de /predict")
+    parser.add_argument("--rows", type=int, default=20000, help="Linhas por cenário de /predict-batch")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default="bench-results.json")
+    parser.add_argument("--compare", help="JSON de uma execução anterior para comparar")
+    parser.add_argument("--max-regression", type=float, default=0.15,
+                        help="Queda de req/s ou alta de p99 tolerada na comparação (fração)")
+    args = parser.parse_args()
+    args.endpoints = [e.strip() for e in args.endpoints.split(",") if e.strip()]
+    env_overrides = dict(kv.split("=", 1) for kv in args.env)
+    app_dir = os.path.abspath(args.app_dir)
+    args.out = os.path.abspath(args.out)  # o modo in-process faz chdir para o app
+
+    pool, sources = build_pool(args)
+    proc = None
+    if args.uvicorn:
+        proc, url = start_uvicorn(app_dir, env_overrides, args.workers)
+        target = {"mode": "uvicorn", "workers": args.workers}
+    elif args.url:
+        url, target = args.url, {"mode": "url", "url": args.url}
+    else:
+        os.environ.update(env_overrides)  # antes do import da API
+        url, target = None, {"mode": "in-process"}
+
+    async def go():
+        async with make_client(url, url is None, app_dir) as client:
+            return await run_suite(client, pool, args)
+
+    try:
+        results = asyncio.run(go())
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=10)
+
+    report = {
+        "meta": {
+            "commit": _git_commit(app_dir),
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "seed": args.seed,
+            "env": env_overrides,
+            "target": target,
+            "sources": sources,
+        },
+        "results": results,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+        f.write("\n")
+    print(f"\nResultados gravados em {args.out}")
+
+    if args.compare and compare(args.compare, report, args.max_regression):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
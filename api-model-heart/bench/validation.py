@@ -0,0 +1,221 @@
+# validation.py - Micro-benchmark da validação: Patient anterior x Patient com tabelas x StrictPatient
+# Execução (a partir de api-model-heart/):
+#   python bench/validation.py --number 20000
+
+import argparse
+import os
+import sys
+import timeit
+from typing import Optional
+
+from pydantic import BaseModel, Field, field_validator, model_validator
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("MODEL_WATCH_INTERVAL", "0")
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api import Patient, StrictPatient  # noqa: E402
+
+
+# Cópia do Patient anterior às tabelas compartilhadas (dicionários recriados a cada chamada),
+# mantida aqui apenas como linha de base do benchmark
+class LegacyPatient(BaseModel):
+    # 12 entradas (com normalização PT/EN via validadores)
+    Age: int = Field(..., ge=0, le=120)
+    Sex: str  # M/F ou masculino/feminino
+    ChestPainType: str  # TA/ATA/NAP/ASY + sinônimos
+    RestingBP: float  # 70–250
+    Cholesterol: float  # 100–600
+    FastingBS: int | str | bool  # sim/não, 1/0
+    RestingECG: str  # Normal/ST/LVH + sinônimos
+    MaxHR: int  # 40–250
+    # Aceita Exang e ExerciseAngina; será normalizado para ExerciseAngina ('Y'/'N')
+    ExerciseAngina: Optional[str] = None
+    Exang: Optional[int | str | bool] = None
+    Oldpeak: float | str  # aceita vírgula
+    ST_Slope: str  # Up/Flat/Down + sinônimos
+    # Extra do chatbot
+    Thal: Optional[str] = None
+
+    # ---- Validadores (Pydantic v2) ----
+    @field_validator('Sex')
+    @classmethod
+    def norm_sex(cls, v: str) -> str:
+        s = str(v).strip().lower()
+        if s in {'m','masc','masculino','male','homem'}: return 'M'
+        if s in {'f','fem','feminino','female','mulher'}: return 'F'
+        raise ValueError("Sexo inválido. Use M/F ou masculino/feminino.")
+
+    @field_validator('ChestPainType')
+    @classmethod
+    def norm_cpt(cls, v: str) -> str:
+        s = str(v).strip().lower()
+        mapping = {
+            'ta':'TA','típica':'TA','tipica':'TA','typical angina':'TA',
+            'ata':'ATA','atípica':'ATA','atipica':'ATA','atypical angina':'ATA',
+            'nap':'NAP','não anginosa':'NAP','nao anginosa':'NAP','non-anginal pain':'NAP',
+            'asy':'ASY','assintomática':'ASY','assintomatica':'ASY','asymptomatic':'ASY'
+        }
+        return mapping.get(s, s.upper())
+
+    @field_validator('RestingBP')
+    @classmethod
+    def check_bp(cls, v) -> float:
+        try:
+            bp = float(str(v).replace(',', '.'))
+        except Exception:
+            raise ValueError("RestingBP inválido.")
+        if not (70 <= bp <= 250):
+            raise ValueError("RestingBP fora do intervalo recomendado (70–250 mmHg).")
+        return bp
+
+    @field_validator('Cholesterol')
+    @classmethod
+    def check_chol(cls, v) -> float:
+        try:
+            c = float(str(v).replace(',', '.'))
+        except Exception:
+            raise ValueError("Cholesterol inválido.")
+        if not (100 <= c <= 600):
+            raise ValueError("Cholesterol fora do intervalo recomendado (100–600 mg/dL).")
+        return c
+
+    @field_validator('FastingBS')
+    @classmethod
+    def norm_fbs(cls, v) -> int:
+        s = str(v).strip().lower()
+        if s in {'1','true','sim','yes'}: return 1
+        if s in {'0','false','nao','não','no'}: return 0
+        try:
+            n = int(float(s))
+            return 1 if n >= 1 else 0
+        except Exception:
+            raise ValueError("FastingBS inválido (use 1/0, sim/não).")
+
+    @field_validator('RestingECG')
+    @classmethod
+    def norm_ecg(cls, v: str) -> str:
+        s = str(v).strip().lower()
+        mapping = {
+            'normal':'Normal',
+            'st':'ST','st-t wave abnormality':'ST','anormalidade st-t':'ST',
+            'lvh':'LVH','left ventricular hypertrophy':'LVH','hipertrofia ventricular esquerda':'LVH'
+        }
+        return mapping.get(s, s.capitalize())
+
+    @field_validator('MaxHR')
+    @classmethod
+    def check_hr(cls, v) -> int:
+        try:
+            hr = int(float(str(v).replace(',', '.')))
+        except Exception:
+            raise ValueError("MaxHR inválido.")
+        if not (40 <= hr <= 250):
+            raise ValueError("MaxHR fora do intervalo recomendado (40–250 bpm).")
+        return hr
+
+    @field_validator('Oldpeak')
+    @classmethod
+    def norm_oldpeak(cls, v) -> float:
+        try:
+            op = float(str(v).replace(',', '.'))
+        except Exception:
+            raise ValueError("Oldpeak inválido (use número, aceita vírgula).")
+        if not (0.0 <= op <= 10.0):
+            raise ValueError("Oldpeak fora do intervalo (0.0–10.0).")
+        return op
+
+    @field_validator('ST_Slope')
+    @classmethod
+    def norm_slope(cls, v: str) -> str:
+        s = str(v).strip().lower()
+        mapping = {
+            'up':'Up','ascendente':'Up','asc':'Up',
+            'flat':'Flat','plano':'Flat',
+            'down':'Down','descendente':'Down','desc':'Down'
+        }
+        return mapping.get(s, s.capitalize())
+
+    @field_validator('ExerciseAngina', mode='before')
+    @classmethod
+    def norm_exang1(cls, v):
+        if v is None: return None
+        s = str(v).strip().lower()
+        if s in {'y','yes','sim'}: return 'Y'
+        if s in {'n','no','nao','não'}: return 'N'
+        return s.upper()
+
+    @field_validator('Exang', mode='before')
+    @classmethod
+    def norm_exang2(cls, v):
+        if v is None: return None
+        s = str(v).strip().lower()
+        if s in {'1','true','yes','sim'}: return 1
+        if s in {'0','false','no','nao','não'}: return 0
+        try:
+            return 1 if int(float(s))>=1 else 0
+        except Exception:
+            raise ValueError("Exang inválido (use 1/0, sim/não).")
+
+    @field_validator('Thal', mode='before')
+    @classmethod
+    def norm_thal(cls, v):
+        if v is None: return None
+        s = str(v).strip().lower()
+        mapping = {
+            'normal':'Normal',
+            'fixed defect':'Fixed defect','defeito fixo':'Fixed defect',
+            'reversible defect':'Reversible defect','defeito reversível':'Reversible defect','defeito reversivel':'Reversible defect'
+        }
+        return mapping.get(s, s.title())
+
+    @model_validator(mode='after')
+    def combine_exang(self):
+        # Se Exang foi informado e ExerciseAngina não, convertê-lo (1->'Y', 0->'N')
+        if self.Exang is not None and self.ExerciseAngina is None:
+            self.ExerciseAngina = 'Y' if int(self.Exang)==1 else 'N'
+        # Se ainda ausente, default conservador 'N'
+        if self.ExerciseAngina is None:
+            self.ExerciseAngina = 'N'
+        return self
+
+
+# Payload com sinônimos (caminho normalizado) e o equivalente canônico (caminho estrito)
+SYNONYMS = {
+    "Age": 65, "Sex": "masculino", "ChestPainType": "assintomática", "RestingBP": "150", "Cholesterol": 280,
+    "FastingBS": "sim", "RestingECG": "hipertrofia ventricular esquerda", "MaxHR": 85, "Exang": "sim",
+    "Oldpeak": "2,8", "ST_Slope": "plano", "Thal": "defeito fixo",
+}
+CANONICAL = {
+    "Age": 65, "Sex": "M", "ChestPainType": "ASY", "RestingBP": 150.0, "Cholesterol": 280.0,
+    "FastingBS": 1, "RestingECG": "LVH", "MaxHR": 85, "ExerciseAngina": "Y",
+    "Oldpeak": 2.8, "ST_Slope": "Flat", "Thal": "Fixed defect",
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark da validação do Patient.")
+    parser.add_argument("--number", type=int, default=20000)
+    args = parser.parse_args()
+
+    # As duas versões do Patient precisam produzir exatamente o mesmo paciente
+    for payload in (SYNONYMS, CANONICAL):
+        assert LegacyPatient.model_validate(payload).model_dump() == Patient.model_validate(payload).model_dump()
+
+    cases = [
+        ("LegacyPatient (sinônimos)", LegacyPatient, SYNONYMS),
+        ("Patient       (sinônimos)", Patient, SYNONYMS),
+        ("LegacyPatient (canônico)", LegacyPatient, CANONICAL),
+        ("Patient       (canônico)", Patient, CANONICAL),
+        ("StrictPatient (canônico)", StrictPatient, CANONICAL),
+    ]
+    baseline = None
+    print("Tempo por validação (melhor de 3); fator relativo à primeira linha")
+    for name, schema, payload in cases:
+        best = min(timeit.repeat(lambda: schema.model_validate(payload), number=args.number, repeat=3))
+        per_call_us = best / args.number * 1e6
+        baseline = baseline or per_call_us
+        print(f"{name}: {per_call_us:7.2f} µs/validação  ({baseline / per_call_us:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
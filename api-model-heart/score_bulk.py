@@ -0,0 +1,211 @@
+# score_bulk.py - Re-escore offline de CSVs grandes (layout do heart.csv) em vários processos
+# Execução (a partir de api-model-heart/):
+#   python score_bulk.py historico.csv predicoes.csv --workers 4 --chunk-rows 50000
+#   python score_bulk.py historico.csv predicoes_parquet/ --format parquet
+#   python score_bulk.py historico.csv predicoes.csv --resume      # continua de onde parou
+# Cada bloco passa pelo mesmo caminho da API (Patient -> encoder -> kernel, via
+# api.score_records). A memória fica limitada a ~2 blocos por worker, qualquer que
+# seja o tamanho da entrada; a saída é gravada em ordem, bloco a bloco, e o
+# progresso vai para `<saida>.progress.json` para permitir --resume.
+# Limitação: campos CSV entre aspas com quebra de linha não são suportados.
+
+import argparse
+import csv
+import io
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+
+OUTPUT_FIELDS = ["row", "prediction", "label", "probability_positive", "model_version", "error"]
+
+_api = None  # módulo da API, importado uma vez por processo do pool
+
+
+def _init_worker(app_dir: str) -> None:
+    global _api
+    os.chdir(app_dir)
+    sys.path.insert(0, app_dir)
+    import api
+
+    _api = api
+
+
+def score_chunk(header, first_row: int, raw: bytes):
+    """Executado no pool: decodifica um bloco de linhas CSV e pontua pelo caminho da API."""
+    records = []
+    for i, values in enumerate(csv.reader(io.StringIO(raw.decode("utf-8")))):
+        if not values:
+            continue
+        records.append((first_row + i, _api.parse_csv_record(header, values)))
+    return _api.score_records(records)
+
+
+def read_chunks(path: str, chunk_rows: int, skip_chunks: int):
+    """Gera (índice, primeira linha, bytes) a partir do arquivo, sem carregá-lo inteiro."""
+    with open(path, "rb") as f:
+        header = next(csv.reader([f.readline().decode("utf-8-sig")]))
+        header = [h.strip() for h in header]
+        yield header
+        index, row = 0, 0
+        while True:
+            lines = []
+            for line in f:
+                lines.append(line)
+                if len(lines) >= chunk_rows:
+                    break
+            if not lines:
+                return
+            if index >= skip_chunks:
+                yield index, row, b"".join(lines)
+            index += 1
+            row += len(lines)
+
+
+# ------------------------------------------------------------------------------
+# Saída (CSV único ou diretório de partes Parquet) + progresso
+# ------------------------------------------------------------------------------
+class CsvSink:
+    def __init__(self, path: str, resume_bytes: int):
+        exists = resume_bytes > 0 and os.path.exists(path)
+        self.f = open(path, "r+b" if exists else "wb")
+        if exists:
+            self.f.truncate(resume_bytes)  # descarta um bloco gravado pela metade
+            self.f.seek(resume_bytes)
+        self.text = io.TextIOWrapper(self.f, encoding="utf-8", newline="")
+        self.writer = csv.DictWriter(self.text, fieldnames=OUTPUT_FIELDS, extrasaction="ignore")
+        if not exists:
+            self.writer.writeheader()
+
+    def write(self, index: int, rows) -> int:
+        self.writer.writerows(rows)
+        self.text.flush()
+        return self.f.tell()
+
+    def close(self) -> None:
+        self.text.close()
+
+
+class ParquetSink:
+    def __init__(self, path: str, resume_bytes: int):
+        try:
+            import pyarrow  # noqa: F401
+            import pyarrow.parquet  # noqa: F401
+        except ImportError as e:
+            raise SystemExit("Saída Parquet requer pyarrow (pip install pyarrow).") from e
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+
+    def write(self, index: int, rows) -> int:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pylist([{k: r.get(k) for k in OUTPUT_FIELDS} for r in rows])
+        final = os.path.join(self.path, f"part-{index:06d}.parquet")
+        pq.write_table(table, final + ".tmp")
+        os.replace(final + ".tmp", final)
+        return 0
+
+    def close(self) -> None:
+        pass
+
+
+def _load_progress(path: str, identity) -> dict:
+    try:
+        with open(path, encoding="utf-8") as f:
+            progress = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if progress.get("identity") != identity:
+        raise SystemExit(
+            f"{path} foi gerado com outra entrada/modelo/--chunk-rows; remova-o ou rode sem --resume."
+        )
+    return progress
+
+
+def _save_progress(path: str, progress: dict) -> None:
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(progress, f)
+    os.replace(path + ".tmp", path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Escore offline em lote (CSV no layout do heart.csv).")
+    parser.add_argument("input")
+    parser.add_argument("output", help="Arquivo .csv ou diretório (com --format parquet)")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-rows", type=int, default=50000)
+    parser.add_argument("--resume", action="store_true", help="Continua a partir de <saida>.progress.json")
+    parser.add_argument("--app-dir", default=os.path.dirname(os.path.abspath(__file__)))
+    args = parser.parse_args()
+
+    app_dir = os.path.abspath(args.app_dir)
+    input_path, output_path = os.path.abspath(args.input), os.path.abspath(args.output)
+    progress_path = output_path.rstrip("/") + ".progress.json"
+
+    # Versão do modelo no processo pai: um --resume com outro modelo misturaria predições
+    _init_worker(app_dir)
+    st = os.stat(input_path)
+    identity = {
+        "input": input_path, "size": st.st_size, "mtime_ns": st.st_mtime_ns,
+        "chunk_rows": args.chunk_rows, "model_version": _api.REGISTRY.active.version, "format": args.format,
+    }
+    progress = _load_progress(progress_path, identity) if args.resume else {}
+    chunks_done = progress.get("chunks_done", 0)
+    counts = progress.get("counts", {"rows": 0, "scored": 0, "errors": 0})
+    sink_cls = CsvSink if args.format == "csv" else ParquetSink
+    sink = sink_cls(output_path, progress.get("output_bytes", 0))
+    if chunks_done:
+        print(f"Retomando após {chunks_done} blocos ({counts['rows']} linhas).", file=sys.stderr)
+
+    chunks = read_chunks(input_path, args.chunk_rows, chunks_done)
+    header = next(chunks)
+    ctx = multiprocessing.get_context("spawn")
+    window = max(1, args.workers) * 2  # blocos em voo (limita a memória)
+    started, rows_this_run, last_report = time.perf_counter(), 0, 0.0
+
+    with ctx.Pool(args.workers, initializer=_init_worker, initargs=(app_dir,)) as pool:
+        pending = deque()
+
+        def drain_one():
+            nonlocal rows_this_run, last_report
+            index, result = pending.popleft()
+            rows = result.get()
+            errors = sum(1 for r in rows if "error" in r)
+            counts["rows"] += len(rows)
+            counts["errors"] += errors
+            counts["scored"] += len(rows) - errors
+            output_bytes = sink.write(index, rows)
+            _save_progress(progress_path, {
+                "identity": identity, "chunks_done": index + 1, "output_bytes": output_bytes, "counts": counts,
+            })
+            rows_this_run += len(rows)
+            elapsed = time.perf_counter() - started
+            if elapsed - last_report >= 2.0:
+                last_report = elapsed
+                print(f"{counts['rows']} linhas  {rows_this_run / elapsed:,.0f} linhas/s", file=sys.stderr)
+
+        for index, first_row, raw in chunks:
+            pending.append((index, pool.apply_async(score_chunk, (header, first_row, raw))))
+            if len(pending) >= window:
+                drain_one()
+        while pending:
+            drain_one()
+    sink.close()
+
+    elapsed = time.perf_counter() - started
+    print(json.dumps({
+        **counts,
+        "rows_this_run": rows_this_run,
+        "elapsed_s": round(elapsed, 3),
+        "rows_per_s": round(rows_this_run / elapsed, 1) if elapsed else None,
+        "model_version": identity["model_version"],
+        "output": output_path,
+    }, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# serve.py - Sobe a API com N workers compartilhando um único segmento de pesos
+# Execução (a partir de api-model-heart/):
+#   python serve.py --workers 4 --port 8000
+# O processo pai carrega e valida os artefatos uma vez, publica os pesos em um
+# arquivo mapeado em memória (/dev/shm por padrão) e sobe o uvicorn; cada worker
+# só mapeia o segmento (sem joblib/pickle). Quando os artefatos mudam, o pai
+# valida a nova versão, publica outro segmento e troca o ponteiro `current`:
+# todos os workers passam a usá-la em até SHARED_WEIGHTS_POLL segundos.
+
+import argparse
+import glob
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import uvicorn
+
+import api
+
+
+def _default_dir() -> str:
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else None
+    return tempfile.mkdtemp(prefix="heart_api-", dir=base)
+
+
+def publish(directory: str, keep: int) -> None:
+    path = api.write_shared_segment(directory, api.REGISTRY.active)
+    api.logger.info("Pesos %s publicados em %s.", api.REGISTRY.active.version, path)
+    # Remove segmentos antigos; workers que ainda os mapeiam continuam válidos (unlink POSIX)
+    segments = sorted(glob.glob(os.path.join(directory, "weights-*.bin")), key=os.path.getmtime)
+    for old in segments[:-keep]:
+        os.remove(old)
+
+
+def watch(directory: str, interval: float, keep: int) -> None:
+    while True:
+        time.sleep(interval)
+        if api.REGISTRY.check_for_updates():
+            publish(directory, keep)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API com pesos compartilhados entre workers.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--shm-dir", help="Diretório do segmento (padrão: novo diretório em /dev/shm)")
+    args = parser.parse_args()
+
+    directory = args.shm_dir or _default_dir()
+    os.makedirs(directory, exist_ok=True)
+    publish(directory, api.MODEL_REGISTRY_KEEP)
+
+    # Herdado pelos workers: passam a carregar do segmento compartilhado
+    os.environ["SHARED_WEIGHTS_DIR"] = directory
+    if api.MODEL_WATCH_INTERVAL > 0:
+        threading.Thread(
+            target=watch, args=(directory, api.MODEL_WATCH_INTERVAL, api.MODEL_REGISTRY_KEEP),
+            name="shared-weights-publisher", daemon=True,
+        ).start()
+    try:
+        uvicorn.run("api:app", host=args.host, port=args.port, workers=args.workers)
+    finally:
+        if not args.shm_dir:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
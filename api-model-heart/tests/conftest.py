@@ -0,0 +1,52 @@
+"""
+Fixtures comuns: a API é importada a partir de api-model-heart/ (os artefatos
+são resolvidos por caminhos relativos) com watcher, cache e auditoria sob controle.
+"""
+import os
+import sys
+
+import pytest
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(API_DIR)
+sys.path.insert(0, API_DIR)
+os.environ.setdefault("MODEL_WATCH_INTERVAL", "0")
+os.environ.setdefault("AUDIT_BACKEND", "")
+
+import api as api_module  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def api():
+    return api_module
+
+
+@pytest.fixture(scope="session")
+def client():
+    return TestClient(api_module.app)
+
+
+@pytest.fixture
+def drift(monkeypatch):
+    """Monitor de drift novo por teste (flush a cada linha, para ver o efeito na hora)."""
+    monitor = api_module.DriftMonitor(1)
+    monkeypatch.setattr(api_module, "DRIFT", monitor)
+    return monitor
+
+
+@pytest.fixture
+def patient_payload():
+    return {
+        "Age": 54, "Sex": "M", "ChestPainType": "ASY", "RestingBP": 140, "Cholesterol": 239,
+        "FastingBS": 0, "RestingECG": "Normal", "MaxHR": 160, "ExerciseAngina": "N",
+        "Oldpeak": 1.2, "ST_Slope": "Flat",
+    }
+
+
+@pytest.fixture
+def audit(monkeypatch, tmp_path):
+    """Auditoria real em SQLite temporário (flush manual via audit.flush())."""
+    log = api_module.AuditLog(api_module._SqliteAuditStore(str(tmp_path / "audit.db"), "off"), 3600, 100000)
+    monkeypatch.setattr(api_module, "AUDIT", log)
+    return log
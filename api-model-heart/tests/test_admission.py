@@ -0,0 +1,52 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import API_DIR
+
+
+def test_route_limits_parse(api):
+    limits = api._route_limits("/predict-ensemble=1, /predict-stream=2")
+    assert {r: g.limit for r, g in limits.items()} == {"/predict-ensemble": 1, "/predict-stream": 2}
+    assert limits["/predict-ensemble"].reject_status == api.LANES["bulk"].reject_status
+    with pytest.raises(RuntimeError):
+        api._route_limits("/nao-existe=1")
+
+
+# Roda em outro processo: o teto entra no max_length dos modelos quando o módulo é importado
+ROW_CAP_SCRIPT = """
+import json, sys
+import api
+from fastapi.testclient import TestClient
+
+client = TestClient(api.app)
+patient = json.loads(sys.argv[1])
+out = {}
+for path, body in [
+    ("/predict-batch", {"items": [patient] * 50}),
+    ("/predict-batch-strict", {"items": [patient] * 50}),
+    ("/predict-ensemble", {"items": [patient] * 50}),
+    ("/predict-columnar", {"items": [patient] * 50}),
+    ("/predict-columnar", {"columns": {"Age": [54] * 50}}),
+    ("/predict-batch", {"items": [patient] * 5}),
+]:
+    out.setdefault(path, []).append(client.post(path, json=body).status_code)
+print(json.dumps(out))
+"""
+
+
+def test_row_cap_rejects_before_item_validation(patient_payload):
+    env = dict(os.environ, ADMISSION_MAX_BATCH_ROWS="5", MODEL_WATCH_INTERVAL="0")
+    proc = subprocess.run([sys.executable, "-c", ROW_CAP_SCRIPT, json.dumps(patient_payload)],
+                          cwd=API_DIR, env=env, capture_output=True, text=True, timeout=120)
+    assert proc.returncode == 0, proc.stderr
+    codes = json.loads(proc.stdout.strip().splitlines()[-1])
+    assert codes == {
+        "/predict-batch": [413, 200],
+        "/predict-batch-strict": [413],
+        "/predict-ensemble": [413],
+        "/predict-columnar": [413, 413],
+    }
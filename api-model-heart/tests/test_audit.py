@@ -0,0 +1,9 @@
+def test_jsonl_store_ignores_foreign_files(api, client, patient_payload, monkeypatch, tmp_path):
+    (tmp_path / "audit-old.jsonl").write_text("{}\n")
+    (tmp_path / "audit-1.jsonl.bak").write_text("{}\n")
+    log = api.AuditLog(api._JsonlAuditStore(str(tmp_path), "off", 1 << 20), 3600, 100000)
+    monkeypatch.setattr(api, "AUDIT", log)
+    assert client.post("/predict-batch", json={"items": [patient_payload, dict(patient_payload, Age=60)]}).status_code == 200
+    log.flush()
+    rows = log.query(0, float("inf"), None, 100)
+    assert len(rows) == 2 and {r["route"] for r in rows} == {"/predict-batch"}
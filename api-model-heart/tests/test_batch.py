@@ -0,0 +1,52 @@
+import pytest
+
+
+@pytest.fixture
+def batch(patient_payload):
+    # Repetições de propósito: a deduplicação precisa colapsar e devolver na ordem original
+    distinct = [dict(patient_payload, Age=40 + i, Sex="F" if i % 2 else "M") for i in range(12)]
+    return [distinct[(7 * i) % len(distinct)] for i in range(60)]
+
+
+@pytest.mark.parametrize("params", [{}, {"explain": "true", "top_k": 2}, {"slim": "true"}])
+@pytest.mark.parametrize("route", ["/predict-batch", "/predict-batch-strict"])
+def test_executor_path_matches_inline(api, client, batch, monkeypatch, params, route):
+    inline = client.post(route, json={"items": batch}, params=params)
+    monkeypatch.setattr(api, "ASYNC_INLINE_MAX_ROWS", 4)
+    monkeypatch.setattr(api, "BATCH_CHUNK_ROWS", 5)
+    offloaded = client.post(route, json={"items": batch}, params=params)
+    assert inline.status_code == offloaded.status_code == 200
+    a, b = inline.json(), offloaded.json()
+    # Blocos menores mudam a soma da GEMM na última casa: probabilidades com tolerância
+    probs_a, probs_b = a.pop("probabilities_positive"), b.pop("probabilities_positive")
+    assert probs_b == pytest.approx(probs_a, rel=0, abs=1e-12)
+    for expl in (a.get("explanations") or []) + (b.get("explanations") or []):
+        for feat in expl["top_features"]:
+            feat["contribution"] = round(feat["contribution"], 9)
+    assert b == a
+    if not params:
+        assert inline.json()["deduplicated_rows"] == 48
+
+
+@pytest.mark.parametrize("params", [{}, {"explain": "true"}, {"slim": "true"}])
+@pytest.mark.parametrize("route", ["/predict-batch", "/predict-batch-strict"])
+def test_empty_batch(client, drift, params, route):
+    resp = client.post(route, json={"items": []}, params=params)
+    assert resp.status_code == 200, resp.text
+    assert resp.json()["predictions"] == []
+    assert client.get("/drift").status_code == 200
+    assert client.get("/metrics").status_code == 200
+
+
+@pytest.mark.parametrize("n", [1, 25])
+def test_all_duplicate_batch(client, drift, patient_payload, n):
+    single = client.post("/predict", json=patient_payload).json()["probability_positive"]
+    out = client.post("/predict-batch", json={"items": [patient_payload] * n}).json()
+    assert out["probabilities_positive"] == [single] * n
+    assert out["deduplicated_rows"] == n - 1
+    assert client.get("/drift").json()["rows_observed"] == 1 + n
+
+
+def test_invalid_item_rejects_whole_batch(client, patient_payload):
+    items = [patient_payload, dict(patient_payload, Age=-1)]
+    assert client.post("/predict-batch", json={"items": items}).status_code == 422
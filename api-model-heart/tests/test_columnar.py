@@ -0,0 +1,118 @@
+import numpy as np
+import pytest
+from pydantic import ValidationError
+
+
+@pytest.mark.parametrize("body", [{"items": []}, {"columns": {}}, {"columns": {"Age": []}}])
+def test_empty_batches(client, body):
+    resp = client.post("/predict-columnar", json=body)
+    assert resp.status_code == 200, resp.text
+    out = resp.json()
+    assert (out["rows"], out["scored"], out["predictions"], out["errors"]) == (0, 0, [], [])
+
+
+def test_missing_required_column_is_a_row_error(client, patient_payload):
+    columns = {f: [v, v] for f, v in patient_payload.items() if f != "Age"}
+    resp = client.post("/predict-columnar", json={"columns": columns})
+    assert resp.status_code == 200, resp.text
+    out = resp.json()
+    assert out["scored"] == 0
+    assert [e["row"] for e in out["errors"]] == [0, 1]
+    assert all(e["error"].startswith("Age: Field required") for e in out["errors"])
+
+
+# Equivalência com a validação linha a linha (user-024): registros bagunçados de propósito
+FUZZ_VALUES = {
+    "Age": [54, 54.0, 54.5, "54", " 61 ", -1, 130, True, None, "abc", 0, 120, 10**400, -(10**400)],
+    "Sex": ["M", "F", "masculino", " Feminino ", "x", 1, None],
+    "ChestPainType": ["ASY", "atípica", "Non-Anginal Pain", "ta", "zzz", None, 3],
+    "RestingBP": [140, 140.5, "140", "139,5", 69, 250, 251, False, None],
+    "Cholesterol": [239, 100, 600, 99, "240", 0, None, 10**400],
+    "FastingBS": [0, 1, "sim", "não", "true", 2, None, True, 1.0],
+    "RestingECG": ["Normal", "st", "LVH", "hipertrofia ventricular esquerda", "?", None],
+    "MaxHR": [160, 40, 250, 39, "150", 150.0, 150.2, None],
+    "ExerciseAngina": ["Y", "N", "sim", "no", 1, 0, None, "talvez"],
+    "Exang": [1, 0, "sim", "não", None, "x"],
+    "Oldpeak": [1.2, 0, "1,5", -0.1, 10, 10.5, None, "2"],
+    "ST_Slope": ["Up", "plano", "DESC", "x", None],
+    "Thal": ["Normal", "defeito fixo", "Reversible defect", None, "?", 3],
+}
+MISSING = object()
+
+
+def _fuzz_records(n, seed=7, allow_missing=True):
+    rng = np.random.default_rng(seed)
+    records = []
+    for _ in range(n):
+        record = {}
+        for field, values in FUZZ_VALUES.items():
+            # Maioria das linhas válidas, para exercitar o caminho rápido também
+            value = values[0] if rng.random() < 0.7 else values[rng.integers(len(values))]
+            if allow_missing and rng.random() < 0.03:
+                value = MISSING
+            if value is not MISSING:
+                record[field] = value
+        records.append(record)
+    return records
+
+
+def _per_row(api, records):
+    bundle = api.REGISTRY.active
+    out = []
+    for record in records:
+        try:
+            patient = api.Patient.model_validate(record)
+        except ValidationError as e:
+            out.append(("error", api._format_validation_error(e)))
+            continue
+        preds, probas = bundle.kernel.score(bundle.encoder.encode([patient]))
+        out.append(("ok", int(preds[0]), float(probas[0])))
+    return out
+
+
+def _columnar(out):
+    errors = {e["row"]: e["error"] for e in out["errors"]}
+    return [
+        ("error", errors[i]) if i in errors else ("ok", out["predictions"][i], out["probabilities_positive"][i])
+        for i in range(out["rows"])
+    ]
+
+
+def _assert_same(got, expected):
+    assert len(got) == len(expected)
+    for g, e in zip(got, expected):
+        assert g[:2] == e[:2]
+        if g[0] == "ok":
+            assert g[2] == pytest.approx(e[2], rel=0, abs=1e-12)
+
+
+def test_items_match_per_row_patient(api, client):
+    records = _fuzz_records(800)
+    resp = client.post("/predict-columnar", json={"items": records})
+    assert resp.status_code == 200, resp.text
+    out = resp.json()
+    expected = _per_row(api, records)
+    _assert_same(_columnar(out), expected)
+    assert 0 < out["fast_path_rows"] < out["scored"] < out["rows"]
+
+
+def test_columns_match_per_row_patient(api, client):
+    records = _fuzz_records(400, seed=11, allow_missing=False)
+    columns = {f: [r[f] for r in records] for f in FUZZ_VALUES}
+    resp = client.post("/predict-columnar", json={"columns": columns})
+    assert resp.status_code == 200, resp.text
+    _assert_same(_columnar(resp.json()), _per_row(api, records))
+
+
+def test_all_duplicate_items(client, patient_payload):
+    single = client.post("/predict", json=patient_payload).json()["probability_positive"]
+    out = client.post("/predict-columnar", json={"items": [patient_payload] * 25}).json()
+    assert out["errors"] == []
+    assert out["probabilities_positive"] == pytest.approx([single] * 25, rel=0, abs=1e-12)
+
+
+def test_huge_int_only_fails_its_row(client, patient_payload):
+    items = [patient_payload, dict(patient_payload, Age=10**400), patient_payload]
+    out = client.post("/predict-columnar", json={"items": items}).json()
+    assert [e["row"] for e in out["errors"]] == [1]
+    assert out["scored"] == 2
@@ -0,0 +1,50 @@
+import math
+
+import numpy as np
+
+
+def test_empty_batch_before_any_data(client, drift):
+    assert client.post("/predict-batch", json={"items": []}).status_code == 200
+    resp = client.get("/drift")
+    assert resp.status_code == 200
+    assert resp.json()["rows_observed"] == 0
+    assert client.get("/metrics").status_code == 200
+
+
+def test_empty_batch_after_data_keeps_stats_finite(client, drift, patient_payload):
+    assert client.post("/predict-batch", json={"items": [patient_payload] * 3}).status_code == 200
+    assert client.post("/predict-batch", json={"items": []}).status_code == 200
+    resp = client.get("/drift")
+    assert resp.status_code == 200
+    report = resp.json()
+    assert report["rows_observed"] == 3
+    assert all(math.isfinite(v["mean"]) for v in report["numeric"].values())
+
+
+def test_zero_weights_are_ignored(api, drift):
+    bundle = api.REGISTRY.active
+    X = np.zeros((2, bundle.encoder.n_features))
+    drift.observe(bundle, X, np.zeros(2))
+    assert drift.report()["rows_observed"] == 0
+
+
+def test_cache_hits_are_observed(api, client, drift, patient_payload, monkeypatch):
+    monkeypatch.setattr(api, "PREDICTION_CACHE", api.PredictionCache(16, 300))
+    for _ in range(5):
+        assert client.post("/predict", json=patient_payload).status_code == 200
+    assert api.PREDICTION_CACHE.stats()["hits"] == 4
+    assert client.get("/drift").json()["rows_observed"] == 5
+
+
+def test_reference_bins_ready_before_first_request(api, drift, monkeypatch):
+    bundle = api.REGISTRY.active
+    assert bundle.drift_reference is not None and bundle.drift_reference[1] == "X_train.csv"
+
+    def no_io(*args, **kwargs):
+        raise AssertionError("referência de drift lida no caminho da requisição")
+
+    monkeypatch.setattr(api, "_read_csv_matrix", no_io)
+    drift.observe(bundle, np.zeros((1, bundle.encoder.n_features)))
+    report = drift.report()
+    assert report["histogram_reference"] == "X_train.csv"
+    assert report["rows_observed"] == 1
@@ -0,0 +1,48 @@
+"""Paridade do FeatureEncoder (user-001) com o get_dummies(drop_first=True) do main.py."""
+import numpy as np
+import pandas as pd
+import pytest
+from pydantic import ValidationError
+
+HEART_CSV = "../heart.csv"
+
+
+@pytest.fixture(scope="module")
+def heart():
+    df = pd.read_csv(HEART_CSV)
+    return df.drop(columns="HeartDisease")
+
+
+def _valid_patients(api, df):
+    rows, patients = [], []
+    for i, record in enumerate(df.to_dict(orient="records")):
+        try:
+            patients.append(api.Patient.model_validate(record))
+            rows.append(i)
+        except ValidationError:
+            pass  # ex.: Cholesterol = 0 no heart.csv, rejeitado pelo Patient
+    return rows, patients
+
+
+def test_encoder_matches_get_dummies_bytes(api, heart):
+    encoder = api.REGISTRY.active.encoder
+    expected = pd.get_dummies(heart, drop_first=True).reindex(columns=encoder.columns, fill_value=0)
+    rows, patients = _valid_patients(api, heart)
+    assert len(rows) > 700
+    X = encoder.encode(patients)
+    reference = expected.iloc[rows].to_numpy(dtype=np.float64)
+    assert X.dtype == reference.dtype and X.shape == reference.shape
+    assert X.tobytes() == reference.tobytes()
+
+
+def test_encoder_matches_raw_holdout_columns(api):
+    cols, _ = api._read_csv_matrix(api.VALIDATION_X_PATH)
+    assert cols == api.REGISTRY.active.encoder.columns
+
+
+def test_single_row_encoding_matches_batch(api, heart):
+    encoder = api.REGISTRY.active.encoder
+    _, patients = _valid_patients(api, heart.head(50))
+    batch = encoder.encode(patients)
+    for i, patient in enumerate(patients):
+        assert encoder.encode([patient]).tobytes() == batch[i:i + 1].tobytes()
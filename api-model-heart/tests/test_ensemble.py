@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def items(patient_payload):
+    rows = []
+    for i in range(40):
+        row = dict(patient_payload, Age=30 + i, MaxHR=100 + 2 * i)
+        rows.append(row)
+    return rows
+
+
+def _ensemble(client, items, **params):
+    resp = client.post("/predict-ensemble", json={"items": items}, params=params)
+    assert resp.status_code == 200, resp.text
+    return resp.json()
+
+
+def test_chunked_matches_single_block(api, client, items, monkeypatch):
+    whole = _ensemble(client, items, members=True)
+    monkeypatch.setattr(api, "BATCH_CHUNK_ROWS", 7)
+    monkeypatch.setattr(api, "ASYNC_INLINE_MAX_ROWS", 3)
+    chunked = _ensemble(client, items, members=True)
+    assert chunked["predictions"] == whole["predictions"]
+    np.testing.assert_allclose(chunked["member_probabilities"], whole["member_probabilities"], rtol=0, atol=1e-15)
+
+
+def test_row_cap(api, client, items, monkeypatch):
+    monkeypatch.setattr(api, "ADMISSION_MAX_BATCH_ROWS", 10)
+    assert client.post("/predict-ensemble", json={"items": items}).status_code == 413
+
+
+def test_predictions_are_audited(client, items, audit):
+    out = _ensemble(client, items)
+    audit.flush()
+    assert audit.stats()["written_rows"] == len(items)
+    rows = audit.query(0, float("inf"), None, 1000)
+    assert {r["route"] for r in rows} == {"/predict-ensemble"}
+    assert sorted(r["probability_positive"] for r in rows) == pytest.approx(sorted(out["probabilities_mean"]))
+
+
+def test_empty_batch(client, drift):
+    out = _ensemble(client, [], members=True)
+    assert out["predictions"] == []
+    assert client.get("/drift").status_code == 200
+    assert client.get("/metrics").status_code == 200
+
+
+@pytest.mark.parametrize("n", [1, 25])
+def test_all_duplicate_batch(client, patient_payload, n):
+    out = _ensemble(client, [patient_payload] * n)
+    assert len(out["predictions"]) == len(out["probabilities_mean"]) == n
+    assert len(set(out["probabilities_mean"])) == 1
@@ -0,0 +1,34 @@
+import pytest
+
+
+@pytest.fixture
+def cache(api, monkeypatch):
+    cache = api.PredictionCache(16, 300)
+    monkeypatch.setattr(api, "PREDICTION_CACHE", cache)
+    return cache
+
+
+def _explain(client, payload, top_k):
+    resp = client.post("/predict", json=payload, params={"explain": "true", "top_k": top_k})
+    assert resp.status_code == 200, resp.text
+    return resp.json()
+
+
+def test_explanations_are_cached_per_top_k(client, cache, drift, patient_payload):
+    first = _explain(client, patient_payload, 4)
+    again = _explain(client, patient_payload, 4)
+    assert cache.stats()["hits"] == 1
+    assert again == first
+    assert len(first["explanation"]["top_features"]) == 4
+
+    other = _explain(client, patient_payload, 2)
+    assert cache.stats()["hits"] == 1  # top_k diferente = outra entrada
+    assert other["explanation"]["top_features"] == first["explanation"]["top_features"][:2]
+    assert client.get("/drift").json()["rows_observed"] == 3
+
+
+def test_explained_matches_plain_prediction(client, cache, patient_payload):
+    plain = client.post("/predict", json=patient_payload).json()
+    explained = _explain(client, patient_payload, 3)
+    assert explained["probability_positive"] == plain["probability_positive"]
+    assert explained["prediction"] == plain["prediction"]
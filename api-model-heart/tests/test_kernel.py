@@ -0,0 +1,44 @@
+"""Paridade do kernel fundido (user-002) com o par sklearn do .pkl."""
+import numpy as np
+import pandas as pd
+import pytest
+
+
+@pytest.fixture(scope="module")
+def X(api):
+    df = pd.read_csv("../heart.csv").drop(columns="HeartDisease")
+    columns = api.REGISTRY.active.encoder.columns
+    return pd.get_dummies(df, drop_first=True).reindex(columns=columns, fill_value=0).to_numpy(np.float64)
+
+
+@pytest.fixture(scope="module")
+def pickle_pair(api):
+    return api._load_artifacts(api.MODEL_PATH, api.SCALER_PATH)
+
+
+def test_active_kernel_matches_pickle(api, X, pickle_pair):
+    model, scaler = pickle_pair
+    kernel = api.REGISTRY.active.kernel
+    assert kernel.fused
+    preds, probas = kernel.score(X)
+    Z = scaler.transform(X)
+    np.testing.assert_array_equal(preds, model.predict(Z))
+    np.testing.assert_allclose(probas, model.predict_proba(Z)[:, 1], rtol=0, atol=api.KERNEL_PARITY_ATOL)
+
+
+def test_folded_pickle_matches_sklearn_kernel(api, X, pickle_pair):
+    model, scaler = pickle_pair
+    fused = api.build_kernel(model, scaler, X.shape[1])
+    reference = api.SklearnKernel(model, scaler)
+    assert fused.fused and not reference.fused
+    p_fused, q_fused = fused.score(X)
+    p_ref, q_ref = reference.score(X)
+    np.testing.assert_array_equal(p_fused, p_ref)
+    np.testing.assert_allclose(q_fused, q_ref, rtol=0, atol=api.KERNEL_PARITY_ATOL)
+
+
+def test_contributions_sum_to_logit(api, X, pickle_pair):
+    model, scaler = pickle_pair
+    contrib = api.REGISTRY.active.kernel.contributions(X)
+    logit = model.decision_function(scaler.transform(X))
+    np.testing.assert_allclose(contrib.sum(axis=1) + model.intercept_[0], logit, rtol=0, atol=1e-9)
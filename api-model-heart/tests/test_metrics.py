@@ -0,0 +1,19 @@
+import pytest
+
+
+def _validate_count(api, route):
+    h = api.METRICS.stages.get((route, "validate"))
+    return h.snapshot()["count"] if h is not None else 0
+
+
+@pytest.mark.parametrize("route", ["/predict-batch", "/predict-batch-strict", "/predict-ensemble"])
+def test_validation_timed_once_per_batch(api, client, patient_payload, route):
+    before = _validate_count(api, route)
+    client.post(route, json={"items": [patient_payload] * 30})
+    assert _validate_count(api, route) == before + 1
+
+
+def test_rejected_request_is_timed(api, client, patient_payload):
+    before = _validate_count(api, "/predict")
+    assert client.post("/predict", json=dict(patient_payload, Age=-1)).status_code == 422
+    assert _validate_count(api, "/predict") == before + 1
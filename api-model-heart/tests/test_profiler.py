@@ -0,0 +1,31 @@
+import threading
+
+import numpy as np
+
+
+def test_idle_service_threads_are_not_sampled(api, audit):
+    bundle = api.REGISTRY.active
+    # Uma instância de cada thread de serviço do módulo, todas ociosas
+    registry = api.ModelRegistry(api.SERVING_ARTIFACT_PATH, api.MODEL_PATH, api.SCALER_PATH, 1)
+    registry.start_watcher(3600)
+    api.MicroBatcher(lambda: bundle, 0.001, 8)
+    api.ShadowScorer(bundle, 4, 4)
+
+    # Pontuação no executor "scoring" enquanto a sessão roda: essa precisa aparecer
+    stop = threading.Event()
+    X = np.zeros((64, bundle.encoder.n_features))
+
+    def busy():
+        while not stop.is_set():
+            bundle.score_encoded(X)
+
+    worker = api.SCORING_EXECUTOR.submit(busy)
+    try:
+        result = api.SamplingProfiler(0.002, 5).start(0.3, 0).result(timeout=5)
+    finally:
+        stop.set()
+        worker.result(timeout=5)
+
+    threads = {line.split(";", 1)[0] for line in result["collapsed"].splitlines()}
+    assert not threads & api.SamplingProfiler.SERVICE_THREADS
+    assert any(name.startswith("scoring") for name in threads)
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+from sklearn.linear_model import LogisticRegression
+from sklearn.preprocessing import StandardScaler
+
+
+def _raw_training_data(api):
+    """Treino sem escala, reconstruído com o scaler que gerou o X_train.csv."""
+    cols, Z = api._read_csv_matrix("X_train.csv")
+    scaler = api._load_artifacts()[1]
+    y = np.loadtxt("../y_train.csv", skiprows=1)
+    return cols, scaler.inverse_transform(Z), y
+
+
+def _candidate(api, scaler, model):
+    return api.ModelBundle("candidata", model, scaler, "pickle", [])
+
+
+def test_validation_uses_candidate_scaler(api):
+    # Retreino com um scaler bem diferente do original (ajustado só nas linhas com
+    # Cholesterol = 0): revertendo o X_test.csv com ele, a acurácia caía para ~0,70
+    cols, X, y = _raw_training_data(api)
+    scaler = StandardScaler().fit(X[X[:, cols.index("Cholesterol")] == 0])
+    model = LogisticRegression(random_state=0, solver="liblinear").fit(scaler.transform(X), y)
+    model.feature_names_in_ = np.array(cols, dtype=object)
+    result = api.validate_bundle(_candidate(api, scaler, model))
+    _, X_test = api._read_csv_matrix(api.VALIDATION_X_PATH)
+    _, y_test = api._read_csv_matrix(api.VALIDATION_Y_PATH)
+    expected = np.mean(model.predict(scaler.transform(X_test)) == y_test.ravel())
+    assert result["status"] == "passed"
+    assert result["accuracy"] == pytest.approx(expected)
+
+
+def test_validation_rejects_bad_model(api):
+    cols, X, y = _raw_training_data(api)
+    scaler = StandardScaler().fit(X)
+    model = LogisticRegression(random_state=0, solver="liblinear").fit(scaler.transform(X), 1 - y)
+    model.feature_names_in_ = np.array(cols, dtype=object)
+    with pytest.raises(RuntimeError, match="acurácia"):
+        api.validate_bundle(_candidate(api, scaler, model))
+
+
+@pytest.mark.parametrize("path", ["/models/reload", "/models/qualquer/activate"])
+def test_model_admin_routes_require_token(api, client, monkeypatch, path):
+    monkeypatch.setattr(api, "ADMIN_TOKEN", "")
+    assert client.post(path).status_code == 404
+    monkeypatch.setattr(api, "ADMIN_TOKEN", "segredo")
+    assert client.post(path).status_code == 403
+    assert client.post(path, headers={"X-Admin-Token": "errado"}).status_code == 403
+
+
+def test_activate_with_token(api, client, monkeypatch):
+    monkeypatch.setattr(api, "ADMIN_TOKEN", "segredo")
+    version = api.REGISTRY.active.version
+    resp = client.post(f"/models/{version}/activate", headers={"X-Admin-Token": "segredo"})
+    assert resp.status_code == 200
+    assert resp.json() == {"active": version}
@@ -0,0 +1,29 @@
+import json
+
+import pytest
+
+
+def _lines(resp):
+    return [json.loads(line) for line in resp.text.splitlines()]
+
+
+@pytest.mark.parametrize("content, headers", [
+    (b"", {}),
+    (b"\n\n", {"content-type": "application/x-ndjson"}),
+    (b"Age,Sex,ChestPainType\n", {"content-type": "text/csv"}),
+])
+def test_empty_streams(client, drift, content, headers):
+    resp = client.post("/predict-stream", content=content, headers=headers)
+    assert resp.status_code == 200, resp.text
+    assert _lines(resp) == [{"summary": {"rows": 0, "scored": 0, "errors": 0}}]
+    assert client.get("/drift").status_code == 200
+
+
+def test_ndjson_matches_predict_and_reports_bad_lines(client, patient_payload):
+    single = client.post("/predict", json=patient_payload).json()["probability_positive"]
+    body = "\n".join([json.dumps(patient_payload), "{nao e json", json.dumps(dict(patient_payload, Age=-1)),
+                      json.dumps(patient_payload)]).encode()
+    lines = _lines(client.post("/predict-stream", content=body, headers={"content-type": "application/x-ndjson"}))
+    assert lines[-1] == {"summary": {"rows": 4, "scored": 2, "errors": 2}}
+    assert [("error" in line) for line in lines[:-1]] == [False, True, True, False]
+    assert lines[0]["probability_positive"] == pytest.approx(single, rel=0, abs=1e-12)
@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+
+def _body(api, X):
+    return api.pack_vectors(X, api.REGISTRY.active.encoder.columns)
+
+
+def _encoded(api, payload):
+    bundle = api.REGISTRY.active
+    return bundle.encoder.encode([api.Patient(**payload)])
+
+
+def test_empty_body(api, client, drift):
+    n_features = api.REGISTRY.active.encoder.n_features
+    resp = client.post("/predict-vector", content=_body(api, np.zeros((0, n_features))))
+    assert resp.status_code == 200, resp.text
+    assert resp.content == b""
+    assert resp.headers["X-Rows"] == "0"
+    assert client.get("/drift").status_code == 200
+    assert client.get("/metrics").status_code == 200
+
+
+def test_matches_predict(api, client, patient_payload):
+    single = client.post("/predict", json=patient_payload).json()["probability_positive"]
+    X = np.repeat(np.asarray(_encoded(api, patient_payload), dtype=np.float64), 3, axis=0)
+    resp = client.post("/predict-vector", content=_body(api, X))
+    assert resp.status_code == 200, resp.text
+    assert len(resp.content) == 24
+    assert np.frombuffer(resp.content, dtype="<f8") == pytest.approx([single] * 3, rel=0, abs=1e-12)
+
+
+def test_schema_mismatch(api, client):
+    n_features = api.REGISTRY.active.encoder.n_features
+    body = api.pack_vectors(np.zeros((2, n_features)), ["outra"] * n_features)
+    assert client.post("/predict-vector", content=body).status_code == 409
@@ -58,18 +58,43 @@ def _build_api_payload(session):
 
 def _call_predict_api(payload: dict):
     try:
-        resp = requests.post(API_PREDICT_URL, json=payload, timeout=10)
+        # explain=true: a API devolve os campos que mais pesaram na predição
+        resp = requests.post(API_PREDICT_URL, json=payload, params={"explain": "true", "top_k": 4}, timeout=10)
         resp.raise_for_status()
         return True, resp.json()
     except Exception as e:
         return False, f"Falha ao chamar a API em {API_PREDICT_URL}: {e}"
 
 
-def gerar_explicacao(payload: dict, label: str) -> str:
+# Rótulos legíveis dos campos da API (explicação vinda do modelo)
+NOMES_CAMPOS = {
+    "Age": "idade", "Sex": "sexo", "ChestPainType": "tipo de dor no peito",
+    "RestingBP": "pressão em repouso", "Cholesterol": "colesterol", "FastingBS": "glicemia em jejum",
+    "RestingECG": "ECG em repouso", "MaxHR": "frequência cardíaca máxima",
+    "ExerciseAngina": "angina ao esforço", "Oldpeak": "oldpeak", "ST_Slope": "inclinação do ST",
+}
+
+
+def _explicacao_do_modelo(explanation: dict) -> str:
+    """Formata os campos que mais pesaram no logit (contribuição > 0 aumenta o risco)."""
+    partes = []
+    for item in explanation.get("top_features") or []:
+        nome = NOMES_CAMPOS.get(item.get("feature"), item.get("feature"))
+        sentido = "↑ risco" if item.get("contribution", 0) > 0 else "↓ risco"
+        partes.append(f"{nome} = {item.get('value')} ({sentido})")
+    return "\n➡️ Explicação (pesos do modelo):\n" + "; ".join(partes) + "\n\n"
+
+
+def gerar_explicacao(payload: dict, label: str, explanation: dict = None) -> str:
     """
     Gera uma explicação legível com base nos valores coletados e na classe prevista.
-    Não altera nenhum outro comportamento do app.
+    O frontend chama a API com `explain=true&top_k=4`; quando a resposta traz
+    `explanation` (modelos lineares), o texto mostrado ao usuário passa a ser o de
+    `_explicacao_do_modelo` (os 4 campos que mais pesaram e o sentido de cada um),
+    no lugar das regras de limiar abaixo, que ficam só como fallback.
     """
+    if explanation and explanation.get("top_features"):
+        return _explicacao_do_modelo(explanation)
     try:
         idade  = payload.get("Age") or 0
         hr     = payload.get("MaxHR") or 0
@@ -406,7 +431,7 @@ def chat():
                 )
                 if warnings:
                     linhas.append("\n⚠️ Avisos:\n " + "; ".join(warnings))
-                linhas.append(gerar_explicacao(payload, label))
+                linhas.append(gerar_explicacao(payload, label, result.get("explanation")))
                 linhas.append("Digite 'sim' para iniciar novo atendimento ou 'não' para encerrar.")
                 return {
                         "msg": "\n".join(linhas),
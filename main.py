@@ -4,6 +4,8 @@ from sklearn.preprocessing import StandardScaler
 from sklearn.linear_model import LogisticRegression
 from sklearn.metrics import accuracy_score, classification_report
 import joblib # Para salvar o modelo
+import numpy as np
+import os
 
 # Carregar dataset
 df = pd.read_csv("heart.csv")
@@ -36,8 +38,10 @@ pd.DataFrame(X_train_scaled, columns=X_train.columns).to_csv("X_train.csv", inde
 pd.DataFrame(X_test_scaled, columns=X_test.columns).to_csv("X_test.csv", index=False)
 y_train.to_csv("y_train.csv", index=False)
 y_test.to_csv("y_test.csv", index=False)
+# Teste sem escala: a API valida cada versão nova com o scaler da própria versão
+X_test.astype(np.float64).to_csv("X_test_raw.csv", index=False)
 
-print("Arquivos CSV criados: X_train.csv, X_test.csv, y_train.csv, y_test.csv")
+print("Arquivos CSV criados: X_train.csv, X_test.csv, X_test_raw.csv, y_train.csv, y_test.csv")
 
 # 1️⃣ Carregar os dados já separados e escalonados
 X_train_scaled = pd.read_csv("X_train.csv")
@@ -67,4 +71,36 @@ print(classification_report(y_test, y_pred))
 joblib.dump(model, 'modelo_insuficiencia_cardiaca.pkl')
 joblib.dump(scaler, 'scaler_dados.pkl')
 
-print("\nModelo e Scaler salvos com sucesso!")
\ No newline at end of file
+print("\nModelo e Scaler salvos com sucesso!")
+
+# Artefato de serviço (.npz sem pickle): a API carrega só arrays NumPy, sem pandas/sklearn
+def exportar_artefato_servico(model, scaler, columns, path="modelo_insuficiencia_cardiaca.npz"):
+    """Salva ordem das colunas, média/escala do scaler e coeficientes do modelo linear."""
+    np.savez(
+        path,
+        format_version=np.array(1),
+        model_class=np.array(type(model).__name__),
+        columns=np.array(list(columns), dtype=str),
+        scaler_mean=np.asarray(scaler.mean_, dtype=np.float64),
+        scaler_scale=np.asarray(scaler.scale_, dtype=np.float64),
+        coef=np.asarray(model.coef_, dtype=np.float64).ravel(),
+        intercept=np.asarray(model.intercept_, dtype=np.float64).ravel(),
+        classes=np.asarray(model.classes_),
+    )
+
+exportar_artefato_servico(model, scaler, X_train.columns)
+print("Artefato de serviço salvo: modelo_insuficiencia_cardiaca.npz")
+
+# Ensemble: regressões logísticas em reamostragens (bootstrap) do treino, uma por semente.
+# A API (ENSEMBLE_DIR) empilha os coeficientes e pontua todos os membros de uma vez.
+ENSEMBLE_DIR = "ensemble"
+N_MEMBROS = 5
+os.makedirs(ENSEMBLE_DIR, exist_ok=True)
+for semente in range(1, N_MEMBROS + 1):
+    idx = np.random.default_rng(semente).choice(len(X_train_scaled), size=len(X_train_scaled), replace=True)
+    membro = LogisticRegression(random_state=semente, solver='liblinear')
+    membro.fit(X_train_scaled.iloc[idx], y_train.iloc[idx])
+    acuracia = accuracy_score(y_test, membro.predict(X_test_scaled))
+    caminho = os.path.join(ENSEMBLE_DIR, f"membro_{semente:02d}.npz")
+    exportar_artefato_servico(membro, scaler, X_train.columns, caminho)
+    print(f"Membro do ensemble salvo: {caminho} (acurácia {acuracia:.4f})")